@@ -0,0 +1,352 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import numpy as np
+from .throughput import experiment_args, write_config
+
+BASELINE_FILE = 'micro_baselines.json'
+THRESHOLD = 0.2  # Allowed slowdown relative to the baseline
+
+SCALAR_REPLIES = [
+    "Reasoning: The others are at 40 and 62, so I move to the middle.\n"
+    "Position: 51.0",
+    "Reasoning: Moving halfway towards the average of 35.5, 47 and 80.\n"
+    "Position: 54.25",
+    '{"reasoning": "closer to the group", "position": 48.5}',
+    "I think we should meet around 45, so my position is 45.5.",
+    "Reasoning: stay close. Position: -3.5 (meters)",
+]
+VECTOR_REPLIES = [
+    "Reasoning: The centroid of (40, 62) and (55, 30) is (47.5, 46).\n"
+    "Position: (47.5, 46.0)",
+    "Reasoning: I move halfway to the others.\nPosition: [51.2, 38.75]",
+    '{"reasoning": "towards the center", "position": [44.0, 52.5]}',
+    "My next position is (50, 50) since it is in the middle.",
+    "Reasoning: (30, 70) and (60, 20) are far. Position: (45.5, 45.5)",
+]
+
+def _experiment(kind, **overrides):
+    """
+    Create a debate without running it.
+
+    Args:
+        kind (str): Debate type of debate_factory.
+        overrides (dict): Arguments of run.py.
+
+    Returns:
+        Template: The debate.
+    """
+    from ..experiment.debate_factory import debate_factory
+    args = experiment_args(**overrides)
+    m = np.ones((args.agents, args.agents), dtype=bool)
+    np.fill_diagonal(m, False)
+    return debate_factory(kind, args, connectivity_matrix=m)
+
+def _record(n_sims, n_agents, n_rounds):
+    """
+    Build a scalar debate record of the size of a large sweep.
+
+    Args:
+        n_sims (int): Number of simulations.
+        n_agents (int): Number of agents.
+        n_rounds (int): Number of rounds.
+
+    Returns:
+        dict: Mapping from initial positions to agent histories.
+    """
+    rng = np.random.default_rng(0)
+    record = {}
+    for sim in range(n_sims):
+        key = tuple(rng.integers(0, 100, n_agents).tolist())
+        contexts = []
+        for agent in range(n_agents):
+            context = [{"role": "system", "content": "You are an agent."}]
+            for round in range(n_rounds):
+                context.append({"role": "user", "content": 
+                                f"Round {round}: the others are at "
+                                f"{rng.uniform(0, 100, n_agents - 1).round(1)}"
+                                ". Where do you move?"})
+                context.append({"role": "assistant", "content": 
+                                SCALAR_REPLIES[round % len(SCALAR_REPLIES)]})
+            contexts.append(context)
+        record[key] = contexts
+    return record
+
+def bench_parse_scalar():
+    """Agent.parse_output on every kind of reply."""
+    from ..llm.agent import Agent
+    agent = Agent(position=50, other_position=[], key="")
+    def run():
+        for reply in SCALAR_REPLIES:
+            agent.parse_output(reply)
+    return run, len(SCALAR_REPLIES)
+
+def bench_parse_2d():
+    """Agent2D.parse_output on every kind of reply."""
+    from ..llm.agent_2d import Agent2D
+    agent = Agent2D(position=(50, 50), other_position=[], key="")
+    def run():
+        for reply in VECTOR_REPLIES:
+            agent.parse_output(reply)
+    return run, len(VECTOR_REPLIES)
+
+def bench_move_2d():
+    """One Agent2D.move step towards a target 30 m away."""
+    from ..llm.agent_2d import Agent2D
+    agent = Agent2D(position=(20, 20), other_position=[], key="")
+    agent._target_position[:] = (50, 50)
+    def run():
+        agent._position[:] = (20, 20)
+        agent._velocity[:] = 0
+        agent.move(0.1)
+    return run, 1
+
+def bench_round_2d():
+    """Vector2dDebate._round_postprocess: one round of physics of one
+    simulation of 3 robots, from rest to their targets."""
+    exp = _experiment("2d", agents=3, n_exp=4, rounds=2)
+    exp._open_trajectory()
+    agents = exp._generate_agents(0)
+    store = exp._store
+    start = store.positions[0].copy()
+    store.targets[0] = start[::-1]
+    results = [(ind, tuple(target)) for ind, target 
+               in enumerate(store.targets[0])]
+    def run():
+        store.positions[0] = start
+        store.velocities[0] = 0
+        store.errors[0] = 0
+        store.integrals[0] = 0
+        exp._round_postprocess(0, 0, results, agents)
+    return run, 1
+
+def bench_round_scalar():
+    """ScalarDebate._round_postprocess: the gather of the other agents'
+    answers for 10 agents."""
+    exp = _experiment("scalar", agents=10, n_exp=1, rounds=2)
+    agents = exp._generate_agents(0)
+    results = [(ind, float(50 + ind)) for ind in range(len(agents))]
+    def run():
+        exp._round_postprocess(0, 0, results, agents)
+    return run, 1
+
+def bench_read_cold(directory):
+    """read_data.read_from_file on 200 simulations x 6 agents x 10 rounds,
+    parsing the transcripts."""
+    from ..llm.record_file import write_record
+    from ..visual.read_data import index_path, read_from_file
+    filename = os.path.join(directory, 'large.p')
+    write_record(filename, _record(200, 6, 10))
+    def run():
+        if os.path.exists(index_path(filename)):
+            os.remove(index_path(filename))
+        read_from_file(filename)
+    return run, 1
+
+def bench_read_indexed(directory):
+    """read_data.read_from_file on the same record, from its index."""
+    from ..llm.record_file import write_record
+    from ..visual.read_data import read_from_file
+    filename = os.path.join(directory, 'large_indexed.p')
+    write_record(filename, _record(200, 6, 10))
+    read_from_file(filename)
+    return (lambda: read_from_file(filename)), 1
+
+def bench_render_html(directory):
+    """util.render_conversations_to_html of one simulation of 6 agents x
+    10 rounds."""
+    from ..visual.util import render_conversations_to_html
+    (conversations,) = _record(1, 6, 10).values()
+    output_file = os.path.join(directory, 'simulation.html')
+    return (lambda: render_conversations_to_html(conversations, 
+                                                 output_file, 0)), 1
+
+# Name -> setup returning (callable, number of operations per call); the
+# setups taking a directory get a scratch directory
+BENCHMARKS = {
+    "parse_scalar": bench_parse_scalar,
+    "parse_2d": bench_parse_2d,
+    "move_2d": bench_move_2d,
+    "round_2d": bench_round_2d,
+    "round_scalar": bench_round_scalar,
+    "read_cold": bench_read_cold,
+    "read_indexed": bench_read_indexed,
+    "render_html": bench_render_html,
+}
+NEEDS_DIRECTORY = {"read_cold", "read_indexed", "render_html"}
+
+def measure(fn, repeat=5, min_time=0.2):
+    """
+    Time a callable.
+
+    The number of calls per measurement is chosen so that a measurement
+    lasts at least min_time, and the best of repeat measurements is kept.
+
+    Args:
+        fn (callable): The code to time.
+        repeat (int): Number of measurements.
+        min_time (float): Minimum duration of a measurement (s).
+
+    Returns:
+        float: Best time per call (s).
+    """
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat, number)) / number
+
+def run(names=None, repeat=5, min_time=0.2):
+    """
+    Run the micro-benchmarks.
+
+    The debates read config/keys.yml from the working directory when
+    imported, so the benchmarks run in a scratch directory holding dummy
+    keys.
+
+    Args:
+        names (list): Benchmarks to run (default is all of BENCHMARKS).
+        repeat (int): Number of measurements of each benchmark.
+        min_time (float): Minimum duration of a measurement (s).
+
+    Returns:
+        dict: Best time per operation of every benchmark (s).
+
+    Raises:
+        ValueError: If a benchmark is unknown.
+    """
+    names = names or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {sorted(unknown)}")
+    cwd = os.getcwd()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        write_config(directory, "http://127.0.0.1:9/v1", 64)
+        os.chdir(directory)
+        try:
+            for name in names:
+                setup = BENCHMARKS[name]
+                fn, ops = (setup(directory) if name in NEEDS_DIRECTORY 
+                           else setup())
+                results[name] = measure(fn, repeat, min_time) / ops
+                print(f"{name:>14}: {results[name] * 1e6:12.2f} us")
+        finally:
+            os.chdir(cwd)
+    return results
+
+def save_baselines(results, filename=BASELINE_FILE):
+    """
+    Save benchmark results as baselines.
+
+    Baselines of other benchmarks already in the file are kept.
+
+    Args:
+        results (dict): Return value of run.
+        filename (str): Path of the baseline file.
+    """
+    baselines = load_baselines(filename)
+    baselines.update(results)
+    with open(filename, 'w') as f:
+        json.dump({"machine": platform.platform(), 
+                   "python": platform.python_version(),
+                   "results": baselines}, f, indent=2, sort_keys=True)
+
+def load_baselines(filename=BASELINE_FILE):
+    """
+    Load baselines.
+
+    Args:
+        filename (str): Path of the baseline file.
+
+    Returns:
+        dict: Time per operation of every benchmark (s), empty if there is
+        no baseline file.
+    """
+    if not os.path.exists(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)["results"]
+
+def compare(results, baselines, threshold=THRESHOLD):
+    """
+    Compare benchmark results to their baselines.
+
+    Args:
+        results (dict): Return value of run.
+        baselines (dict): Return value of load_baselines.
+        threshold (float): Allowed relative slowdown.
+
+    Returns:
+        list: Names of the benchmarks slower than their baseline by more
+        than the threshold.
+    """
+    regressions = []
+    for name, value in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"{name:>14}: no baseline")
+            continue
+        ratio = value / baseline
+        regressed = ratio > 1 + threshold
+        print(f"{name:>14}: {ratio:6.2f}x baseline"
+              + ("  REGRESSION" if regressed else ""))
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmarks of the CPU-side hot paths')
+    parser.add_argument('names', type=str, nargs='*', 
+                        help=f'benchmarks to run: {", ".join(BENCHMARKS)}')
+    parser.add_argument('--baselines', type=str, default=BASELINE_FILE,
+                        help='baseline file')
+    parser.add_argument('--save', action="store_true",
+                        help='store the results as the new baselines')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='allowed slowdown relative to the baselines')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='measurements per benchmark, the best is kept')
+    args = parser.parse_args()
+    baselines_file = os.path.abspath(args.baselines)
+    results = run(args.names, args.repeat)
+    if args.save:
+        save_baselines(results, baselines_file)
+        print(f"Baselines written to {baselines_file}")
+        sys.exit(0)
+    regressions = compare(results, load_baselines(baselines_file), 
+                          args.threshold)
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
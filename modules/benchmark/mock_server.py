@@ -0,0 +1,346 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ..llm.output_parser import NUMBER_PATTERN, PARENTHESES_PATTERN
+
+DISTRIBUTIONS = ("fixed", "exponential", "lognormal")
+ERROR_CODES = (429, 500, 503)
+
+class MockServer:
+    """
+    Local stand-in for the OpenAI chat-completions endpoint.
+
+    Every request is answered after a random latency with a canned 
+    "Reasoning: ... Position: ..." reply (or a function call in structured
+    output mode) that moves halfway from the agent's position towards the
+    mean of the positions quoted in the prompt, so debates converge as
+    with a real model. A fraction of the requests fails with a 429 or 5xx
+    error instead. The server runs in a background thread and serves
+    requests concurrently.
+
+    Attributes:
+        _latency (float): Median latency of a reply (s).
+        _sigma (float): Spread of the latency: the standard deviation of
+            its logarithm for "lognormal".
+        _distribution (str): "fixed", "exponential" or "lognormal".
+        _error_rate (float): Probability that a request fails.
+        _error_codes (tuple): HTTP status codes of the failures.
+        _completion_tokens (int): Tokens counted per reply.
+        _noise (float): Standard deviation of the noise on the positions.
+        _stats (dict): Number of requests, errors and tokens served.
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0.5, sigma=0.5,
+                 distribution="lognormal", error_rate=0.0, 
+                 error_codes=ERROR_CODES, completion_tokens=40, noise=1.0,
+                 seed=None):
+        """
+        Initialize the server, without starting it.
+
+        Args:
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 for any free port.
+            latency (float): Median latency of a reply (s).
+            sigma (float): Spread of the latency (see the attributes).
+            distribution (str): "fixed", "exponential" or "lognormal".
+            error_rate (float): Probability that a request fails.
+            error_codes (tuple): HTTP status codes of the failures.
+            completion_tokens (int): Tokens counted per reply.
+            noise (float): Standard deviation of the noise on the positions.
+            seed (int): Seed of the latencies, errors and noise.
+
+        Raises:
+            ValueError: If the distribution is unknown or the error rate is
+            not a probability.
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        if not 0 <= error_rate <= 1:
+            raise ValueError(f"Error rate must be within [0, 1]: {error_rate}")
+        self._host = host
+        self._port = port
+        self._latency = latency
+        self._sigma = sigma
+        self._distribution = distribution
+        self._error_rate = error_rate
+        self._error_codes = tuple(error_codes)
+        self._completion_tokens = completion_tokens
+        self._noise = noise
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "tokens": 0}
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL of the API, to be used as openai.api_base."""
+        return f"http://{self._host}:{self._port}/v1"
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"requests": 0, "errors": 0, "tokens": 0}
+
+    def sample_latency(self):
+        """
+        Draw the latency of one reply.
+
+        Returns:
+            float: Latency (s).
+        """
+        with self._lock:
+            if self._distribution == "fixed":
+                return self._latency
+            if self._distribution == "exponential":
+                return self._random.expovariate(1 / self._latency)
+            return self._random.lognormvariate(0, self._sigma) * self._latency
+
+    def _draw(self):
+        """Draw whether a request fails, and its status code if it does."""
+        with self._lock:
+            if self._random.random() < self._error_rate:
+                return self._random.choice(self._error_codes)
+            return None
+
+    def _position(self, messages, dim=None):
+        """
+        Choose the position of a canned reply.
+
+        Args:
+            messages (list): Messages of the request.
+            dim (int): Dimension of the position, if known from the
+                function definition.
+
+        Returns:
+            float or list: The position, halfway between the first position
+            of the last user message (the agent's own) and the mean of all
+            the positions in it.
+        """
+        prompt = next((str(m.get("content")) for m in reversed(messages)
+                       if m.get("role") == "user"), "")
+        tuples = [[float(x) for x in NUMBER_PATTERN.findall(group)]
+                  for group in PARENTHESES_PATTERN.findall(prompt)]
+        tuples = [t for t in tuples if len(t) > 1]
+        if dim is None and tuples:
+            dim = len(tuples[0])
+        if dim is not None:
+            points = [t for t in tuples if len(t) == dim]
+        else:
+            points = [[float(x)] for x in NUMBER_PATTERN.findall(
+                prompt[prompt.lower().find("position"):])]
+        with self._lock:
+            if not points:
+                position = [round(self._random.uniform(0, 100), 1)
+                            for _ in range(dim or 1)]
+            else:
+                mean = [sum(c) / len(points) for c in zip(*points)]
+                position = [round((own + center) / 2
+                                  + self._random.gauss(0, self._noise), 1)
+                            for own, center in zip(points[0], mean)]
+        return position[0] if dim is None else position
+
+    def reply(self, request):
+        """
+        Build the response to a chat-completion request.
+
+        Args:
+            request (dict): The JSON body of the request.
+
+        Returns:
+            dict: The chat-completion response.
+        """
+        messages = request.get("messages", [])
+        functions = request.get("functions")
+        dim = None
+        if functions:
+            schema = functions[0]["parameters"]["properties"]["position"]
+            dim = schema.get("minItems") if schema.get("type") == "array" else None
+        position = self._position(messages, dim)
+        reasoning = "I move halfway towards the others."
+        if isinstance(position, list):
+            text = "(" + ", ".join(str(x) for x in position) + ")"
+        else:
+            text = str(position)
+        message = {"role": "assistant", 
+                   "content": f"Reasoning: {reasoning}\nPosition: {text}"}
+        if functions:
+            message = {"role": "assistant", "content": None, 
+                       "function_call": {
+                           "name": functions[0]["name"],
+                           "arguments": json.dumps({"reasoning": reasoning,
+                                                    "position": position})}}
+        prompt_tokens = sum(len(str(m.get("content") or "")) 
+                            for m in messages) // 4
+        return {
+            "id": "chatcmpl-mock", "object": "chat.completion",
+            "created": int(time.time()), "model": request.get("model", ""),
+            "choices": [{"index": 0, "message": message, 
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, 
+                      "completion_tokens": self._completion_tokens,
+                      "total_tokens": prompt_tokens + self._completion_tokens},
+        }
+
+    def _handler(self):
+        """Build the request handler class bound to this server."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, code, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._send(400, {"error": {"message": "Invalid JSON",
+                                               "type": "invalid_request"}})
+                    return
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send(404, {"error": {"message": "Not found",
+                                               "type": "invalid_request"}})
+                    return
+                time.sleep(server.sample_latency())
+                code = server._draw()
+                if code is not None:
+                    with server._lock:
+                        server._stats["requests"] += 1
+                        server._stats["errors"] += 1
+                    self._send(code, {"error": {
+                        "message": f"Mock error {code}", 
+                        "type": "rate_limit_error" if code == 429 
+                                else "server_error"}})
+                    return
+                response = server.reply(request)
+                with server._lock:
+                    server._stats["requests"] += 1
+                    server._stats["tokens"] += response["usage"]["total_tokens"]
+                self._send(200, response)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """
+        Start serving in a background thread.
+
+        Returns:
+            MockServer: The server itself.
+        """
+        self._server = ThreadingHTTPServer((self._host, self._port), 
+                                           self._handler())
+        self._server.daemon_threads = True
+        self._port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def add_server_arguments(parser):
+    """
+    Add the options of the mock server to an argument parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser.
+    """
+    parser.add_argument('--latency', type=float, default=0.5,
+                        help='median latency of a reply (s)')
+    parser.add_argument('--sigma', type=float, default=0.5,
+                        help='spread of the lognormal latency')
+    parser.add_argument('--distribution', type=str, default="lognormal",
+                        help='fixed, exponential or lognormal latency')
+    parser.add_argument('--error_rate', type=float, default=0.0,
+                        help='fraction of requests failing with 429 or 5xx')
+    parser.add_argument('--completion_tokens', type=int, default=40,
+                        help='tokens counted per reply')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed of the latencies, errors and replies')
+
+def server_from_args(args, port=0):
+    """
+    Build a mock server from parsed arguments.
+
+    Args:
+        args (argparse.Namespace): Arguments of add_server_arguments.
+        port (int): Port to listen on, 0 for any free port.
+
+    Returns:
+        MockServer: The server, not started.
+    """
+    return MockServer(port=port, latency=args.latency, sigma=args.sigma,
+                      distribution=args.distribution, 
+                      error_rate=args.error_rate,
+                      completion_tokens=args.completion_tokens, 
+                      seed=args.seed)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Local OpenAI-compatible chat-completions server')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='port to listen on')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    server = server_from_args(args, args.port).start()
+    print(f"Serving mock chat completions at {server.url}, set api_base "
+          "in config/keys.yml to this URL")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
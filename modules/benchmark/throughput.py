@@ -0,0 +1,290 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from .mock_server import add_server_arguments, server_from_args
+
+# Repository root, put on the path of the worker processes
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+METRICS = ("sims_per_min", "calls_per_s", "round_p50", "round_p99", 
+           "peak_rss_mb", "run_s", "total_s", "calls", "errors", "tokens")
+
+def write_config(directory, api_base, n_keys, user_id=2, user_count=3):
+    """
+    Write a config/keys.yml pointing at the mock server.
+
+    llm.api_key gives every user a slice of the keys; enough dummy keys are
+    written for the slice of user_id to hold n_keys of them.
+
+    Args:
+        directory (str): Working directory of the experiments.
+        api_base (str): Base URL of the API.
+        n_keys (int): Number of keys the experiments need (agents * n_exp).
+        user_id (int): User of llm.api_key.
+        user_count (int): Number of users of llm.api_key.
+
+    Returns:
+        str: Path of the configuration file.
+    """
+    os.makedirs(os.path.join(directory, 'config'), exist_ok=True)
+    path = os.path.join(directory, 'config', 'keys.yml')
+    with open(path, 'w') as f:
+        f.write(f'api_base: "{api_base}"\napi_keys:\n')
+        for i in range(n_keys * user_count):
+            f.write(f'  key{i}: "sk-mock-{i}"\n')
+    return path
+
+def experiment_args(**overrides):
+    """
+    Build the arguments of an experiment as run.py parses them.
+
+    Options that are not overridden take the defaults of run.py's parser.
+    Importing run.py imports the experiments, so the working directory must
+    hold a config/keys.yml (see write_config).
+
+    Args:
+        overrides: Arguments of run.py to set.
+
+    Returns:
+        argparse.Namespace: The arguments.
+    """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from run import build_parser
+    args = build_parser().parse_args([])
+    for name, value in overrides.items():
+        setattr(args, name, value)
+    return args
+
+def round_latencies(progress_file):
+    """
+    Get the wall time of every round from a progress log.
+
+    Args:
+        progress_file (str): Path of progress.jsonl (see Template.run).
+
+    Returns:
+        numpy.ndarray: Duration of every round of every simulation (s); the
+        first round of a simulation is timed from the start of the run.
+    """
+    start, last, latencies = None, {}, []
+    with open(progress_file) as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get("event") == "start":
+                start = entry["time"]
+            elif "sim" in entry:
+                previous = last.get(entry["sim"], start)
+                if previous is not None:
+                    latencies.append(entry["time"] - previous)
+                last[entry["sim"]] = entry["time"]
+    return np.array(latencies)
+
+def run_case(kind, agents, n_exp, rounds, out_dir, overrides=None):
+    """
+    Run one experiment and measure it, in this process.
+
+    The working directory must hold a config/keys.yml pointing at a mock
+    server (see write_config), as llm.api_key reads it when imported.
+
+    Args:
+        kind (str): Debate type of debate_factory ("scalar" or "2d").
+        agents (int): Number of agents.
+        n_exp (int): Number of simulations.
+        rounds (int): Number of rounds.
+        out_dir (str): Output directory of the experiment.
+        overrides (dict): Other arguments of run.py.
+
+    Returns:
+        dict: Wall times, simulations per minute, round latency 
+        percentiles and peak RSS of the experiment.
+    """
+    from ..experiment.debate_factory import debate_factory
+    from ..visual import figure_engine
+    args = experiment_args(**dict(overrides or {}, agents=agents, 
+                                  n_exp=n_exp, rounds=rounds, 
+                                  out_file=out_dir))
+    m = np.ones((agents, agents), dtype=bool)
+    np.fill_diagonal(m, False)
+    exp = debate_factory(kind, args, connectivity_matrix=m)
+    start = time.perf_counter()
+    exp.run()
+    run_s = time.perf_counter() - start
+    figure_engine.wait()
+    total_s = time.perf_counter() - start
+    latencies = round_latencies(os.path.join(out_dir, 'progress.jsonl'))
+    return {
+        "run_s": run_s, "total_s": total_s, 
+        "sims_per_min": n_exp / run_s * 60,
+        "round_p50": (float(np.percentile(latencies, 50)) 
+                      if len(latencies) else None),
+        "round_p99": (float(np.percentile(latencies, 99)) 
+                      if len(latencies) else None),
+        # ru_maxrss is in kB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss 
+                       / 1024,
+    }
+
+def benchmark(server, kinds=("scalar", "2d"), agents=(3,), n_exp=(3,), 
+              rounds=(3,), work_dir=None, overrides=None):
+    """
+    Run a grid of experiments against a mock server.
+
+    Every experiment runs in a fresh worker process, so that its peak RSS
+    is its own and the API configuration can point at the server.
+
+    Args:
+        server (MockServer): The running mock server.
+        kinds (tuple): Debate types.
+        agents (tuple): Numbers of agents.
+        n_exp (tuple): Numbers of simulations.
+        rounds (tuple): Numbers of rounds.
+        work_dir (str): Working directory of the experiments (default is a
+            temporary directory).
+        overrides (dict): Other arguments of run.py.
+
+    Returns:
+        list: One dict per experiment with its settings and METRICS, or
+        its "error".
+    """
+    grid = list(itertools.product(kinds, agents, n_exp, rounds))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = work_dir or tmp_dir
+        write_config(work_dir, server.url, 
+                     max(a * n for _, a, n, _ in grid))
+        env = dict(os.environ, MPLBACKEND="Agg",
+                   PYTHONPATH=os.pathsep.join(
+                       filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        rows = []
+        for case_ind, (kind, n_agents, n_sims, n_rounds) in enumerate(grid):
+            row = {"kind": kind, "agents": n_agents, "n_exp": n_sims, 
+                   "rounds": n_rounds}
+            spec = dict(row, out_dir=os.path.join(work_dir, f'case{case_ind}'),
+                        overrides=overrides or {})
+            result_file = os.path.join(work_dir, f'case{case_ind}.json')
+            server.reset_stats()
+            process = subprocess.run(
+                [sys.executable, '-m', 'modules.benchmark.throughput',
+                 '--worker', json.dumps(spec), '--result', result_file],
+                cwd=work_dir, env=env, stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE, text=True)
+            stats = server.stats
+            if process.returncode != 0 or not os.path.exists(result_file):
+                row["error"] = process.stderr.strip().splitlines()[-1:] 
+                rows.append(row)
+                print(f"{row}: failed")
+                continue
+            with open(result_file) as f:
+                row.update(json.load(f))
+            row.update(calls=stats["requests"], errors=stats["errors"],
+                       tokens=stats["tokens"],
+                       calls_per_s=stats["requests"] / row["run_s"])
+            rows.append(row)
+            print(format_row(row))
+    return rows
+
+def format_row(row):
+    """Format the metrics of one experiment on one line."""
+    return (f'{row["kind"]:>6} agents={row["agents"]:<3} '
+            f'n_exp={row["n_exp"]:<3} rounds={row["rounds"]:<3} '
+            f'{row["sims_per_min"]:8.2f} sims/min '
+            f'{row["calls_per_s"]:7.2f} calls/s '
+            f'round p50/p99 {row["round_p50"] or 0:6.2f}/'
+            f'{row["round_p99"] or 0:6.2f} s '
+            f'peak RSS {row["peak_rss_mb"]:7.1f} MB '
+            f'({row["errors"]} errors)')
+
+def write_csv(rows, filename):
+    """
+    Write benchmark results as a CSV table, one row per experiment.
+
+    Args:
+        rows (list): Return value of benchmark.
+        filename (str): Path of the CSV file.
+    """
+    names = ["kind", "agents", "n_exp", "rounds"]
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(names + list(METRICS) + ["error"])
+        for row in rows:
+            writer.writerow([row.get(name) for name in names + list(METRICS)]
+                            + [row.get("error", "")])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='End-to-end throughput of the debates against a local '
+                    'mock chat-completions server')
+    parser.add_argument('--kinds', type=str, nargs='+', 
+                        default=["scalar", "2d"], help='debate types')
+    parser.add_argument('--agents', type=int, nargs='+', default=[3],
+                        help='numbers of agents')
+    parser.add_argument('--n_exp', type=int, nargs='+', default=[3],
+                        help='numbers of simulations')
+    parser.add_argument('--rounds', type=int, nargs='+', default=[3],
+                        help='numbers of rounds')
+    parser.add_argument('--set', type=str, nargs='*', default=[],
+                        help='other arguments of run.py, as name=value '
+                             '(values are parsed as JSON when possible)')
+    parser.add_argument('--work_dir', type=str, default='',
+                        help='keep the outputs of the experiments here')
+    parser.add_argument('--output', type=str, default='',
+                        help='CSV file for the results')
+    parser.add_argument('--worker', type=str, default='',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--result', type=str, default='',
+                        help=argparse.SUPPRESS)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    if args.worker:
+        spec = json.loads(args.worker)
+        result = run_case(spec["kind"], spec["agents"], spec["n_exp"], 
+                          spec["rounds"], spec["out_dir"], spec["overrides"])
+        with open(args.result, 'w') as f:
+            json.dump(result, f)
+        sys.exit(0)
+    overrides = {}
+    for item in args.set:
+        name, value = item.split('=', 1)
+        try:
+            overrides[name] = json.loads(value)
+        except ValueError:
+            overrides[name] = value
+    with server_from_args(args) as server:
+        rows = benchmark(server, args.kinds, args.agents, args.n_exp, 
+                         args.rounds, args.work_dir or None, overrides)
+    if args.output:
+        write_csv(rows, args.output)
+        print(f"Results written to {args.output}")
@@ -0,0 +1,267 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import contextlib
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+CATALOG_FILE = 'catalog.db'
+
+# Columns of the runs table that can be filtered on directly; any other
+# filter is looked up in the JSON configuration of the run
+RUN_COLUMNS = ("id", "path", "experiment", "created", "seed", "tokens", 
+               "requests", "latency_mean", "latency_p50", "latency_p99")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    experiment TEXT,
+    created REAL,
+    seed INTEGER,
+    tokens INTEGER,
+    requests INTEGER,
+    latency_mean REAL,
+    latency_p50 REAL,
+    latency_p99 REAL,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+"""
+
+def _to_blob(array):
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(array), allow_pickle=False)
+    return buffer.getvalue()
+
+def _from_blob(blob):
+    return np.load(io.BytesIO(blob), allow_pickle=False)
+
+def stack_arrays(arrays):
+    """
+    Concatenate arrays along their first axis, padding ragged trailing
+    dimensions with NaN.
+
+    Args:
+        arrays (list): Arrays with the same number of dimensions.
+
+    Returns:
+        numpy.ndarray: The stacked array.
+    """
+    if not arrays:
+        return np.empty((0,))
+    shape = np.max([array.shape[1:] for array in arrays], axis=0)
+    if all(array.shape[1:] == tuple(shape) for array in arrays):
+        return np.concatenate(arrays)
+    padded = []
+    for array in arrays:
+        out = np.full((len(array),) + tuple(shape), np.nan)
+        out[(slice(None),) + tuple(slice(n) for n in array.shape[1:])] = array
+        padded.append(out)
+    return np.concatenate(padded)
+
+class Catalog:
+    """
+    An SQLite catalog of experiment runs across output directories.
+
+    Every run is one row with its configuration, seed and token and latency
+    statistics; its numeric results (e.g. the answers of a scalar debate or
+    the targets of a vector debate) are stored as named arrays. Runs can be
+    selected by any configuration value and their results stacked without
+    opening the pickles.
+
+    Args:
+        path (str): Path of the SQLite database, created if needed.
+    """
+    def __init__(self, path):
+        self._path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @property
+    def path(self):
+        return self._path
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection that commits on success and is then closed."""
+        conn = sqlite3.connect(self._path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def register(self, path, config, experiment=None, seed=None, tokens=0, 
+                 latencies=(), results=None):
+        """
+        Add a run to the catalog, replacing an earlier entry for its path.
+
+        Args:
+            path (str): Output directory (or data file) of the run.
+            config (dict): Configuration of the run, e.g. vars(args).
+            experiment (str): Type of the experiment.
+            seed (int): Random seed of the run.
+            tokens (int): Total tokens used.
+            latencies (list): Wall time of every LLM request (s).
+            results (dict): Named numeric result arrays.
+
+        Returns:
+            int: The id of the run.
+        """
+        latencies = np.asarray(latencies, dtype=float)
+        stats = (None, None, None)
+        if len(latencies):
+            stats = (float(latencies.mean()), 
+                     float(np.percentile(latencies, 50)),
+                     float(np.percentile(latencies, 99)))
+        with self._connect() as conn:
+            conn.execute("DELETE FROM runs WHERE path = ?", 
+                         (os.path.abspath(path),))
+            cursor = conn.execute(
+                "INSERT INTO runs (path, experiment, created, seed, tokens, "
+                "requests, latency_mean, latency_p50, latency_p99, config) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), experiment, time.time(), seed, 
+                 int(tokens), len(latencies)) + stats 
+                + (json.dumps(config, default=str),))
+            run_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO results (run_id, name, data) VALUES (?, ?, ?)",
+                [(run_id, name, _to_blob(array)) 
+                 for name, array in (results or {}).items()])
+        return run_id
+
+    def _where(self, filters):
+        """Build the WHERE clause of a query on the runs table."""
+        clauses, values = [], []
+        for key, value in filters.items():
+            if key in RUN_COLUMNS:
+                column = key
+            elif re.fullmatch(r"\w+", key):
+                column = f"json_extract(config, '$.{key}')"
+            else:
+                raise ValueError(f"invalid filter: {key}")
+            if value is None:
+                clauses.append(f"{column} IS NULL")
+                continue
+            if isinstance(value, bool):
+                value = int(value)
+            clauses.append(f"{column} = ?")
+            values.append(value)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, values
+
+    def query(self, **filters):
+        """
+        Select runs by column or configuration value.
+
+        Example: catalog.query(agents=4, n_stubborn=1)
+
+        Args:
+            **filters: Required values, keyed by run column (see 
+                RUN_COLUMNS) or configuration key.
+
+        Returns:
+            list: One dict per run, with the configuration decoded under
+            "config", in order of registration.
+        """
+        where, values = self._where(filters)
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT * FROM runs{where} ORDER BY id", 
+                                values).fetchall()
+        runs = [dict(row) for row in rows]
+        for run in runs:
+            run["config"] = json.loads(run["config"] or "{}")
+        return runs
+
+    def load(self, name, **filters):
+        """
+        Load one named result of every selected run.
+
+        Args:
+            name (str): Name of the result.
+            **filters: See query.
+
+        Returns:
+            list: (run id, array) pairs of the runs that have the result.
+        """
+        where, values = self._where(filters)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT results.run_id, results.data FROM results "
+                f"JOIN runs ON runs.id = results.run_id{where}"
+                f"{' AND' if where else ' WHERE'} results.name = ? "
+                "ORDER BY runs.id", values + [name]).fetchall()
+        return [(row["run_id"], _from_blob(row["data"])) for row in rows]
+
+    def stack(self, name, **filters):
+        """
+        Stack one named result of every selected run along its first axis.
+
+        Example: catalog.stack("values", agents=4, n_stubborn=1) gives the
+        answers of all simulations of all matching runs in one array.
+
+        Args:
+            name (str): Name of the result.
+            **filters: See query.
+
+        Returns:
+            numpy.ndarray: The stacked results, NaN-padded where runs have 
+            different trailing shapes (e.g. numbers of rounds).
+        """
+        return stack_arrays([array for _, array in self.load(name, **filters)])
+
+if __name__ == '__main__':
+    # python -m modules.experiment.catalog catalog.db agents=4 n_stubborn=1
+    catalog = Catalog(sys.argv[1])
+    filters = {}
+    for argument in sys.argv[2:]:
+        key, value = argument.split('=', 1)
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+        filters[key] = value
+    for run in catalog.query(**filters):
+        print(f"{run['id']:5d}  {run['path']}  {run['experiment']}  "
+              f"tokens={run['tokens']}  requests={run['requests']}  "
+              f"latency p50={run['latency_p50']} p99={run['latency_p99']}")
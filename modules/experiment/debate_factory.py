@@ -25,18 +25,20 @@ THE SOFTWARE.
 
 from .scalar_debate import ScalarDebate
 from .vector2d_debate import Vector2dDebate
+from .vector_nd_debate import VectorNdDebate
 
 def debate_factory(name, args, connectivity_matrix):
     """
     Create a debate instance based on the given name and arguments.
 
     Args:
-        name (str): The name of the debate type (either "scalar" or "2d").
+        name (str): The name of the debate type ("scalar", "2d" or "nd").
         args (dict): A dictionary of arguments to initialize the debate.
         connectivity_matrix (list): The connectivity matrix for the debate.
 
     Returns:
-        Debate: An instance of the appropriate debate class (ScalarDebate or Vector2dDebate).
+        Debate: An instance of the appropriate debate class (ScalarDebate, 
+        Vector2dDebate or VectorNdDebate).
 
     Note:
         If the 'name' argument is not recognized, the function returns None.
@@ -47,10 +49,15 @@ def debate_factory(name, args, connectivity_matrix):
 
         To create a Vector2dDebate:
         debate_factory("2d", args, connectivity_matrix)
+
+        To create a VectorNdDebate in args.dim dimensions:
+        debate_factory("nd", args, connectivity_matrix)
     """
     if name == "scalar":
         return ScalarDebate(args, connectivity_matrix)
     elif name == "2d":
         return Vector2dDebate(args, connectivity_matrix)
+    elif name == "nd":
+        return VectorNdDebate(args, connectivity_matrix)
     else:
         return None
\ No newline at end of file
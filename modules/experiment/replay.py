@@ -0,0 +1,227 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import argparse
+import os
+
+import numpy as np
+
+from ..llm.message import round_answers
+from ..llm.output_parser import parse_scalar, parse_vector
+from ..physics.engine import PhysicsEngine
+from ..physics.integrator import integrator_factory
+from ..physics.params import RobotParams
+from ..physics.repulsion import RepulsionField
+from ..physics.state_store import StateStore
+from ..physics.trajectory import (TARGET_STEP_FILE, TrajectoryBuffer, 
+                                  load_trajectory)
+from ..visual.read_data import parse_p_file
+
+def read_decisions(filename):
+    """
+    Reconstruct the decisions of every agent from a finished run.
+
+    The initial positions are the keys of the record and the decisions are
+    the assistant answers of the transcripts (the last one after every user
+    message), parsed the same way the agents parsed them. A round without
+    an answer or with an answer that cannot be parsed keeps the previous
+    decision, as the agents do; simulations that stopped early are padded
+    with their last decision.
+
+    Args:
+        filename (str): Path to data.p, or the output directory holding it.
+
+    Returns:
+        tuple: (initial, decisions). For vector debates initial has shape
+        (n_sims, n_agents, dim) and decisions (n_sims, n_agents, rounds,
+        dim) hold the per-round targets; for scalar debates the shapes are
+        (n_sims, n_agents) and (n_sims, n_agents, rounds) and decisions are
+        the positions.
+    """
+    if os.path.isdir(filename):
+        filename = os.path.join(filename, 'data.p')
+    record = parse_p_file(filename)
+    initial = np.array([np.array(key, dtype=float) for key in record])
+    is_vector = initial.ndim == 3
+    dim = initial.shape[-1] if is_vector else None
+    answers = [[round_answers(context) for context in contexts] 
+               for contexts in record.values()]
+    n_rounds = max(len(agent) for sim in answers for agent in sim)
+    decisions = np.full(initial.shape[:2] + (n_rounds,) + initial.shape[2:],
+                        np.nan)
+    for sim_ind, sim in enumerate(answers):
+        for agent_ind, agent in enumerate(sim):
+            # Start from the initial position, as an agent without an 
+            # answer stays where it is
+            decision = initial[sim_ind, agent_ind] if not is_vector else None
+            for round in range(n_rounds):
+                if round < len(agent) and agent[round] is not None:
+                    try:
+                        decision = (parse_vector(str(agent[round]), dim) 
+                                    if is_vector 
+                                    else parse_scalar(str(agent[round])))
+                    except ValueError:
+                        pass
+                if decision is not None:
+                    decisions[sim_ind, agent_ind, round] = decision
+    return initial, decisions
+
+def is_asynchronous(filename):
+    """
+    Check whether a run was recorded in asynchronous mode.
+
+    Args:
+        filename (str): Path to data.p, or the output directory holding it.
+
+    Returns:
+        bool: True if some target of the recorded trajectories was set
+        between round boundaries.
+    """
+    directory = (filename if os.path.isdir(filename) 
+                 else os.path.dirname(filename))
+    if not os.path.exists(os.path.join(directory, TARGET_STEP_FILE)):
+        return False
+    data = load_trajectory(directory)
+    steps = data["target_step"]
+    boundaries = np.arange(steps.shape[2]) * data["steps_per_round"]
+    return bool(((steps != boundaries) & (steps >= 0)).any())
+
+def replay(filename, dt=0.1, horizon=2.0, params=None, integrator="fixed", 
+           interaction=None, settle_tolerance=1e-3, decimals=2, 
+           output_dir=None):
+    """
+    Re-run the motion of a finished vector debate without any API calls.
+
+    The recorded per-round targets are replayed round by round, with all
+    recorded simulations integrated together as one batch. Every parameter
+    of the motion can differ from the recorded run; the decisions of the
+    agents cannot, so the communication graph, which only shapes the
+    prompts, has no effect on a replay.
+
+    Args:
+        filename (str): Path to data.p, or the output directory holding it.
+        dt (float): Physics time step (s).
+        horizon (float): Motion time per round (s).
+        params (RobotParams): Robot parameters (default RobotParams()).
+        integrator (str): Name of the integration scheme.
+        interaction: Optional inter-robot force field, e.g. RepulsionField.
+        settle_tolerance (float): See PhysicsEngine.
+        decimals (int): See PhysicsEngine.
+        output_dir (str): 
+            Directory to write the replayed trajectories to, in memory if
+            None.
+
+    Returns:
+        TrajectoryBuffer: The replayed trajectories.
+
+    Raises:
+        ValueError: If the record is not a vector debate, or was recorded in
+        asynchronous mode (--async_mode), whose targets took effect at the
+        recorded steps rather than at round boundaries.
+
+    Note:
+        Simulations are numbered in the order of the record, which is the
+        order in which they finished, not their index in the original run.
+    """
+    if is_asynchronous(filename):
+        raise ValueError(f"{filename} was recorded in asynchronous mode, its "
+                         "targets cannot be replayed round by round")
+    initial, targets = read_decisions(filename)
+    if initial.ndim != 3:
+        raise ValueError(f"{filename} is not a vector debate, only vector "
+                         "debates have motion to replay")
+    n_sims, n_agents, n_rounds, dim = targets.shape
+    n_steps = int(round(horizon / dt))
+    store = StateStore(n_sims, n_agents, dim)
+    store.positions[...] = initial
+    engine = PhysicsEngine(store, params, integrator_factory(integrator), 
+                           settle_tolerance, decimals, interaction)
+    trajectory = TrajectoryBuffer(n_sims, n_agents, n_rounds, n_steps, dim,
+                                  dt, output_dir=output_dir)
+    for round_ind in range(n_rounds):
+        store.targets[...] = targets[:, :, round_ind]
+        engine.run(n_steps, dt, out=trajectory.round_steps(None, round_ind))
+        trajectory.end_round(None, round_ind, store.targets)
+    return trajectory
+
+def replay_positions(filename):
+    """
+    Reconstruct the positions of a finished scalar debate.
+
+    Args:
+        filename (str): Path to data.p, or the output directory holding it.
+
+    Returns:
+        numpy.ndarray: Positions of shape (n_sims, n_agents, rounds + 1),
+        starting with the initial positions.
+    """
+    initial, positions = read_decisions(filename)
+    return np.concatenate([initial[..., None], positions], axis=-1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Re-run the motion of a finished vector debate from its "
+                    "recorded decisions.")
+    parser.add_argument('data_path', type=str, 
+                        help='data.p or the output directory holding it')
+    parser.add_argument('--out_dir', type=str, default='',
+                        help='directory of the replayed trajectories, '
+                             'default is <data dir>/replay')
+    parser.add_argument('--dt', type=float, default=0.1,
+                        help='physics time step (s)')
+    parser.add_argument('--horizon', type=float, default=2.0,
+                        help='motion time per round (s)')
+    parser.add_argument('--integrator', type=str, default="fixed",
+                        help='fixed, semi_implicit or rk: motion integrator')
+    parser.add_argument('--kp', type=float, default=1.2)
+    parser.add_argument('--ki', type=float, default=0.0)
+    parser.add_argument('--kd', type=float, default=6.0)
+    parser.add_argument('--max_traction_force', type=float, default=50,
+                        help='maximum traction force of the robots (N)')
+    parser.add_argument('--max_velocity', type=float, default=3,
+                        help='maximum velocity of the robots (m/s)')
+    parser.add_argument('--mass', type=float, default=15,
+                        help='mass of the robots (kg)')
+    parser.add_argument('--settle_tol', type=float, default=1e-3,
+                        help='stop the motion of a round once all robots '
+                             'have settled, 0 to disable')
+    parser.add_argument('--collision_radius', type=float, default=0,
+                        help='radius of the repulsion between robots (m), '
+                             '0 disables collision avoidance')
+    parser.add_argument('--collision_gain', type=float, default=50,
+                        help='repulsive force between touching robots (N)')
+    args = parser.parse_args()
+
+    data_dir = (args.data_path if os.path.isdir(args.data_path) 
+                else os.path.dirname(args.data_path))
+    out_dir = args.out_dir or os.path.join(data_dir, 'replay')
+    interaction = None
+    if args.collision_radius > 0:
+        interaction = RepulsionField(args.collision_radius, 
+                                     args.collision_gain)
+    params = RobotParams(args.kp, args.ki, args.kd, args.max_traction_force,
+                         args.max_velocity, args.mass)
+    replay(args.data_path, args.dt, args.horizon, params, args.integrator, 
+           interaction, args.settle_tol, output_dir=out_dir)
+    print(f"Replayed trajectories have been written to {out_dir}")
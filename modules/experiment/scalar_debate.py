@@ -28,10 +28,12 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from .template import Template
 from ..llm.agent import Agent, GPT
 from ..llm.api_key import api_keys
+from ..llm.message import Prompt
 from ..llm.role import names
 from ..prompt.scenario import agent_role, game_description, round_description
 from ..prompt.form import agent_output_form
 from ..prompt.personality import stubborn, suggestible
+from ..visual import figure_engine
 from ..visual.gen_html import gen_html
 from ..visual.plot import plot_result
 
@@ -59,7 +61,7 @@ class ScalarDebate(Template):
         self._output_file = args.out_file
         self._n_suggestible = args.n_suggestible
         self._n_stubborn = args.n_stubborn
-        np.random.seed(0)
+        self._structured_output = args.structured_output
 
         # Define the connectivity matrix for agent knowledge
         # m(i, j) = 1 means agent i knows the position of agent j
@@ -90,7 +92,8 @@ class ScalarDebate(Template):
             List of generated agents.
         """
         agents = []
-        position = np.random.randint(0, 100, size=self._n_agents)
+        position = self._rng(simulation_ind).integers(0, 100, 
+                                                      size=self._n_agents)
         for idx in range(self._n_agents):
             position_others = position[self._m[idx, :]]
 
@@ -99,7 +102,8 @@ class ScalarDebate(Template):
                           other_position=position_others,
                           key=api_keys[simulation_ind * self._n_agents + idx],
                           model="gpt-3.5-turbo-0613",
-                          name=names[idx])
+                          name=names[idx],
+                          structured_output=self._structured_output)
 
             # Add personality, neutral by default
             personality = ""
@@ -115,7 +119,7 @@ class ScalarDebate(Template):
         self._positions[simulation_ind] = position
         return agents
 
-    def  _generate_question(self, agent, round) -> str:
+    def  _generate_question(self, agent, round) -> Prompt:
         """
         Generate a question for an agent in a given round.
 
@@ -124,14 +128,14 @@ class ScalarDebate(Template):
             round: The current round number.
 
         Returns:
-            A formatted question for the agent.
+            A question for the agent, referencing the shared template.
         """
         if round == 0:
-            input = self._init_input.format(agent.position, 
-                                            agent.other_position)
+            input = Prompt(self._init_input, agent.position, 
+                           agent.other_position)
         else:
-            input = self._round_description.format(agent.position, 
-                                                   agent.other_position)
+            input = Prompt(self._round_description, agent.position, 
+                           agent.other_position)
         return input
 
     def _exp_postprocess(self):
@@ -141,8 +145,8 @@ class ScalarDebate(Template):
         """
         is_success, filename = self.save_record(self._output_file)
         if is_success:
-            # Call functions to plot and generate HTML
-            plot_result(filename, self._output_file)
+            # Plots are rendered in the background by the figure engine
+            figure_engine.submit(plot_result, filename, self._output_file)
             gen_html(filename, self._output_file)
 
     def _round_postprocess(self, simulation_ind, round, results, agents):
@@ -0,0 +1,229 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import argparse
+import csv
+import itertools
+
+import numpy as np
+
+from .replay import is_asynchronous, read_decisions
+from ..physics.engine import PhysicsEngine
+from ..physics.integrator import integrator_factory
+from ..physics.params import RobotParams
+from ..physics.state_store import StateStore
+
+METRICS = ("settling_time", "settled_fraction", "overshoot", "path_length")
+
+def parameter_grid(**values):
+    """
+    Build every combination of the given robot parameter values.
+
+    Args:
+        **values: Lists of values keyed by RobotParams field, e.g.
+            kp=[0.6, 1.2], kd=[3, 6].
+
+    Returns:
+        list: One dict per combination, e.g. {"kp": 0.6, "kd": 3.0}.
+
+    Raises:
+        ValueError: If a key is not a RobotParams field.
+    """
+    fields = vars(RobotParams())
+    for name in values:
+        if name not in fields:
+            raise ValueError(f"unknown robot parameter: {name}")
+    names = list(values)
+    return [dict(zip(names, map(float, combination))) for combination 
+            in itertools.product(*(np.atleast_1d(values[name]) 
+                                   for name in names))]
+
+def _batch_params(settings, n_sims):
+    """RobotParams with one (n_settings * n_sims, 1, 1) array per field."""
+    defaults = RobotParams()
+    fields = {}
+    for name, default in vars(defaults).items():
+        value = np.array([setting.get(name, default) for setting in settings],
+                         dtype=float)
+        fields[name] = np.repeat(value, n_sims)[:, None, None]
+    return RobotParams(**fields)
+
+def sweep(initial, targets, settings, dt=0.1, horizon=2.0, 
+          integrator="fixed", settle_tolerance=1e-3, decimals=2, band=0.02):
+    """
+    Evaluate many robot parameter settings on recorded target sequences.
+
+    Every setting is run on every recorded simulation in one batch: the
+    settings form the leading part of the simulation axis of a single
+    StateStore, and the parameters are arrays over that axis, so one
+    PhysicsEngine step advances the whole grid. The targets of each round
+    are applied for one horizon, as in the recorded run.
+
+    Per agent and round, the metrics are:
+        settling_time: Time (s) after which the robot stays within the 
+            band around its target until the end of the round, NaN if it
+            never does.
+        overshoot: Largest travel past the target along the direction of
+            the move, relative to the length of the move.
+        path_length: Distance travelled (m), summed over the rounds.
+
+    Args:
+        initial (numpy.ndarray): Initial positions (n_sims, n_agents, dim).
+        targets (numpy.ndarray): Targets (n_sims, n_agents, rounds, dim).
+        settings (list): Parameter settings, see parameter_grid. Fields
+            that are missing keep the RobotParams defaults.
+        dt (float): Physics time step (s).
+        horizon (float): Motion time per round (s).
+        integrator (str): Name of the integration scheme.
+        settle_tolerance (float): See PhysicsEngine.
+        decimals (int): See PhysicsEngine.
+        band (float): Settling band, relative to the length of the move
+            (at least the position resolution).
+
+    Returns:
+        dict: {"settings": settings, "settling_time", "settled_fraction",
+        "overshoot", "path_length": arrays of shape (n_settings,)}, the
+        means over simulations, agents and rounds (settled_fraction is the
+        fraction of moves that settled; settling_time averages the moves 
+        that did).
+    """
+    n_settings = len(settings)
+    n_sims, n_agents, n_rounds, dim = targets.shape
+    batch = n_settings * n_sims
+    n_steps = int(round(horizon / dt))
+    resolution = 10.0 ** -decimals if decimals is not None else 0.0
+
+    store = StateStore(batch, n_agents, dim)
+    store.positions[...] = np.tile(initial, (n_settings, 1, 1))
+    engine = PhysicsEngine(store, _batch_params(settings, n_sims), 
+                           integrator_factory(integrator), settle_tolerance,
+                           decimals)
+    batch_targets = np.tile(targets, (n_settings, 1, 1, 1))
+    out = np.empty((n_steps + 1, batch, n_agents, dim))
+    settling_time = np.full((batch, n_agents, n_rounds), np.nan)
+    overshoot = np.full((batch, n_agents, n_rounds), np.nan)
+    valid = np.zeros((batch, n_agents, n_rounds), dtype=bool)
+    path_length = np.zeros((batch, n_agents))
+    for round_ind in range(n_rounds):
+        target = batch_targets[:, :, round_ind]
+        store.targets[...] = target
+        out[0] = store.positions
+        engine.run(n_steps, dt, out=out[1:])
+
+        offset = out - target
+        distance = np.linalg.norm(offset, axis=-1)  # (steps + 1, batch, N)
+        length = distance[0]
+        moved = ~np.isnan(length) & (length > resolution)
+        valid[..., round_ind] = moved
+        # Index of the first sample after the last one outside the band
+        outside = distance > np.maximum(band * length, resolution)
+        last_outside = n_steps - np.argmax(outside[::-1], axis=0)
+        settle_index = np.where(outside.any(axis=0), last_outside + 1, 0)
+        settling_time[..., round_ind] = np.where(
+            moved & (settle_index <= n_steps), settle_index * dt, np.nan)
+        # Travel past the target along the direction of the move
+        direction = -offset[0] / np.where(moved, length, 1.0)[..., None]
+        beyond = np.einsum('tbnd,bnd->tbn', offset, direction).max(axis=0)
+        overshoot[..., round_ind] = np.where(
+            moved, np.maximum(beyond, 0.0) / np.where(moved, length, 1.0),
+            np.nan)
+        path_length += np.linalg.norm(np.diff(out, axis=0), axis=-1).sum(axis=0)
+
+    def per_setting(values):
+        return values.reshape(n_settings, -1)
+
+    settled = per_setting(~np.isnan(settling_time))
+    n_valid = per_setting(valid).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {
+            "settings": settings,
+            "settling_time": (np.nansum(per_setting(settling_time), axis=1) 
+                              / settled.sum(axis=1)),
+            "settled_fraction": settled.sum(axis=1) / n_valid,
+            "overshoot": (np.nansum(per_setting(overshoot), axis=1) 
+                          / n_valid),
+            "path_length": per_setting(path_length).mean(axis=1),
+        }
+
+def write_csv(result, filename):
+    """
+    Write a sweep result as a CSV table, one row per setting.
+
+    Args:
+        result (dict): Return value of sweep.
+        filename (str): Path of the CSV file.
+    """
+    names = list(result["settings"][0]) if result["settings"] else []
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(names + list(METRICS))
+        for i, setting in enumerate(result["settings"]):
+            writer.writerow([setting[name] for name in names] 
+                            + [result[metric][i] for metric in METRICS])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Sweep robot parameters over the recorded targets of a "
+                    "finished vector debate.")
+    parser.add_argument('data_path', type=str, 
+                        help='data.p or the output directory holding it')
+    for name, default in vars(RobotParams()).items():
+        parser.add_argument(f'--{name}', type=float, nargs='+', 
+                            default=[default], 
+                            help=f'values of {name} (default {default})')
+    parser.add_argument('--dt', type=float, default=0.1,
+                        help='physics time step (s)')
+    parser.add_argument('--horizon', type=float, default=2.0,
+                        help='motion time per round (s)')
+    parser.add_argument('--integrator', type=str, default="fixed",
+                        help='fixed, semi_implicit or rk: motion integrator')
+    parser.add_argument('--band', type=float, default=0.02,
+                        help='settling band relative to the move length')
+    parser.add_argument('--out_file', type=str, default='',
+                        help='CSV file to write the results to')
+    args = parser.parse_args()
+
+    if is_asynchronous(args.data_path):
+        raise ValueError(f"{args.data_path} was recorded in asynchronous "
+                         "mode, its targets cannot be replayed round by round")
+    initial, targets = read_decisions(args.data_path)
+    if initial.ndim != 3:
+        raise ValueError(f"{args.data_path} is not a vector debate")
+    settings = parameter_grid(**{name: getattr(args, name) 
+                                 for name in vars(RobotParams())})
+    result = sweep(initial, targets, settings, args.dt, args.horizon, 
+                   args.integrator, band=args.band)
+    names = [name for name in vars(RobotParams()) 
+             if len(getattr(args, name)) > 1]
+    columns = names + list(METRICS)
+    widths = [max(8, len(column)) for column in columns]
+    print("  ".join(f"{column:>{width}}" 
+                    for column, width in zip(columns, widths)))
+    for i, setting in enumerate(settings):
+        values = ([setting[name] for name in names] 
+                  + [result[metric][i] for metric in METRICS])
+        print("  ".join(f"{value:{width}.3g}" 
+                        for value, width in zip(values, widths)))
+    if args.out_file:
+        write_csv(result, args.out_file)
@@ -27,9 +27,18 @@ from abc import ABC, abstractmethod
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 import queue
-import pickle
+import json
 import os
+import random
+import time
+import numpy as np
 from tqdm import tqdm
+from .catalog import CATALOG_FILE, Catalog
+from ..profiling import profiler, trace
+from ..llm.record_file import write_record
+from ..visual.read_data import read_index
+
+PROGRESS_FILE = 'progress.jsonl'
 
 class Template(ABC):
     """
@@ -75,9 +84,21 @@ class Template(ABC):
         self._n_round = args.rounds  # Number of rounds
         self._n_experiment = args.n_exp  # Number of experiments
         self._lock = threading.Lock()  # Lock for thread safety
+        self._config = vars(args).copy()  # Registered in the catalog
+        self._catalog = args.catalog  # Path of the results catalog
+        # Seed of the random initial positions, drawn if not given. Every
+        # simulation draws from its own generator, see _rng
+        self._seed = (args.seed if args.seed is not None 
+                      else random.SystemRandom().randrange(2 ** 31))
+        self._tokens = 0  # Tokens used by all agents
+        self._latencies = []  # Wall time of every LLM request (s)
+        # Per-round results, appended while the experiment runs
+        self._progress_file = (os.path.join(args.out_file, PROGRESS_FILE)
+                               if args.out_file else None)
+        self._progress = None
 
     @abstractmethod
-    def  _generate_question(self, agent, round) -> str:
+    def  _generate_question(self, agent, round):
         """
         Generate a question for an agent in a specific round.
 
@@ -86,7 +107,8 @@ class Template(ABC):
             round: The current round of the experiment.
 
         Returns:
-            str: The generated question.
+            str or Prompt: The generated question. Returning a Prompt keeps
+            the template text shared between all agents.
         """
         pass
 
@@ -139,9 +161,16 @@ class Template(ABC):
     def run(self):
         """
         Run the experiment using a thread pool for concurrency.
+
+        The results of every round are appended to progress.jsonl in the
+        output directory as the rounds finish (see visual.dashboard).
         """
         try:
-            with ThreadPoolExecutor(max_workers=self._n_experiment) as executor:
+            self._open_progress()
+            with (trace.span("experiment", "experiment", 
+                             type=type(self).__name__),
+                  ThreadPoolExecutor(max_workers=self._n_experiment) 
+                  as executor):
                 progress = tqdm(total=self._n_experiment * self._n_round, 
                                 desc="Processing", dynamic_ncols=True)
                 futures = {executor.submit(self._run_once, sim_ind, progress) 
@@ -155,7 +184,101 @@ class Template(ABC):
         except Exception as e:
             print(f"An exception occurred: {e}")
         finally:
-            self._exp_postprocess()
+            self._close_progress()
+            with trace.span("exp_postprocess", "postprocess"):
+                self._exp_postprocess()
+
+    def _open_progress(self):
+        """
+        Start the progress log of the experiment with a header line.
+        """
+        if not self._progress_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._progress_file), exist_ok=True)
+            self._progress = open(self._progress_file, 'w', buffering=1)
+            self._write_progress({
+                "event": "start", "type": type(self).__name__, 
+                "agents": self._n_agent, "rounds": self._n_round, 
+                "n_exp": self._n_experiment, "seed": self._seed, 
+                "time": time.time()})
+        except OSError as e:
+            print(f"An exception occurred while opening the progress log: {e}")
+            self._progress = None
+
+    def _close_progress(self):
+        """
+        End the progress log of the experiment.
+        """
+        if self._progress is None:
+            return
+        with self._lock:
+            self._write_progress({"event": "end", "time": time.time()})
+            self._progress.close()
+            self._progress = None
+
+    def _write_progress(self, entry):
+        """
+        Append one line to the progress log.
+
+        Args:
+            entry (dict): JSON-serializable entry.
+        """
+        self._progress.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def _rng(self, simulation_ind):
+        """
+        Get the random generator of a simulation.
+
+        It is seeded from the experiment seed and the simulation index, so
+        the draws of a simulation do not depend on the order in which the
+        pool threads run.
+
+        Args:
+            simulation_ind: Index of the current simulation.
+
+        Returns:
+            numpy.random.Generator: A new generator.
+        """
+        return np.random.default_rng((self._seed, simulation_ind))
+
+    def _progress_state(self, simulation_ind, round, results):
+        """
+        Get the state of a simulation logged after a round.
+
+        By default this is the answer of every agent.
+
+        Args:
+            simulation_ind: Index of the current simulation.
+            round: The round that just ended.
+            results: List of (agent index, answer) of the round.
+
+        Returns:
+            dict: JSON-serializable state, {"state": [...]}.
+        """
+        answers = dict(results)
+        return {"state": [answers.get(ind) for ind in range(self._n_agent)]}
+
+    def _log_progress(self, simulation_ind, round, results):
+        """
+        Log the state of a simulation after a round.
+
+        Args:
+            simulation_ind: Index of the current simulation.
+            round: The round that just ended.
+            results: List of (agent index, answer) of the round.
+        """
+        if self._progress is None:
+            return
+        try:
+            entry = {"sim": simulation_ind, "round": round, 
+                     "time": time.time()}
+            entry.update(self._progress_state(simulation_ind, round, results))
+            with self._lock:
+                if self._progress is not None:
+                    self._write_progress(entry)
+        except Exception as e:
+            print(f"An exception occurred while logging the progress: {e}")
 
     def _run_once(self, simulation_ind, progress):
         """
@@ -165,44 +288,111 @@ class Template(ABC):
             simulation_ind: Index of the current simulation.
             progress: Progress bar for tracking the simulation's progress.
         """
-        agents = self._generate_agents(simulation_ind)
-        try:
-            for round in range(self._n_round):
-                results = queue.Queue()
-                n_thread = len(agents) if round < 4 else 1
-                with ThreadPoolExecutor(n_thread) as agent_executor:
-                    futures = []
-                    for agent_ind, agent in enumerate(agents):
-                        question = self. _generate_question(agent, round)
-                        futures.append(agent_executor
-                                       .submit(agent.answer, question, 
-                                               agent_ind, round, 
-                                               simulation_ind))
-
-                    for ind, future in enumerate(as_completed(futures)):
-                        if future.exception() is not None:
-                            print("A thread raised an exception: "
-                                  f"{future.exception()}")
-                        else:
-                            idx, result = future.result()
-                            results.put((idx, result))
-                results = list(results.queue)
-                results = sorted(results, key=lambda x: x[0])
-                progress.update(1)
-                self._round_postprocess(simulation_ind, round, results, agents)
+        with trace.span("simulation", "simulation", sim=simulation_ind):
+            agents = self._generate_agents(simulation_ind)
+            try:
+                self._run_rounds(simulation_ind, agents, progress)
+            except Exception as e:
+                print(f"error:{e}")
+            finally:
+                agent_contexts = [agent.get_history() for agent in agents]
+                with self._lock:
+                    self._update_record(self._record, agent_contexts, 
+                                       simulation_ind, agents)
+                    for agent in agents:
+                        self._tokens += agent.cost
+                        self._latencies.extend(agent.latencies)
+
+    def _run_rounds(self, simulation_ind, agents, progress):
+        """
+        Run the rounds of a single simulation behind a global round barrier:
+        every agent answers, then the round is post-processed.
+
+        Args:
+            simulation_ind: Index of the current simulation.
+            agents: List of agents of the simulation.
+            progress: Progress bar for tracking the simulation's progress.
+        """
+        for round in range(self._n_round):
+            results = queue.Queue()
+            n_thread = len(agents) if round < 4 else 1
+            with (trace.span("round", "round", sim=simulation_ind, 
+                             round=round, threads=n_thread),
+                  ThreadPoolExecutor(n_thread) as agent_executor):
+                futures = []
+                for agent_ind, agent in enumerate(agents):
+                    question = self. _generate_question(agent, round)
+                    answer = trace.wrap(agent.answer, "answer", "llm", 
+                                        sim=simulation_ind, round=round, 
+                                        agent=agent_ind)
+                    futures.append(agent_executor
+                                   .submit(answer, question, 
+                                           agent_ind, round, 
+                                           simulation_ind))
+
+                for ind, future in enumerate(as_completed(futures)):
+                    if future.exception() is not None:
+                        print("A thread raised an exception: "
+                              f"{future.exception()}")
+                    else:
+                        idx, result = future.result()
+                        results.put((idx, result))
+            results = list(results.queue)
+            results = sorted(results, key=lambda x: x[0])
+            progress.update(1)
+            with trace.span("round_postprocess", "physics", 
+                            sim=simulation_ind, round=round):
+                self._round_postprocess(simulation_ind, round, results, 
+                                        agents)
+            self._log_progress(simulation_ind, round, results)
+            profiler.snapshot(f"round {round}")
+
+    def _catalog_results(self, data_file):
+        """
+        Get the numeric results registered in the catalog.
+
+        By default these are the parsed answers of the numeric index of the
+        record (see read_data.read_index), when it can be built.
+
+        Args:
+            data_file: Path of the saved record.
+
+        Returns:
+            dict: Named result arrays.
+        """
+        index = read_index(data_file)
+        return index if index is not None else {}
+
+    def _register(self, output_dir, data_file):
+        """
+        Register the saved run in the results catalog.
+
+        The catalog defaults to catalog.db next to the output directory,
+        so all runs of a campaign share it. Failing to register does not
+        fail the run.
 
+        Args:
+            output_dir: The directory where the record was saved.
+            data_file: Path of the saved record.
+        """
+        path = self._catalog or os.path.join(
+            os.path.dirname(os.path.abspath(output_dir)), CATALOG_FILE)
+        try:
+            Catalog(path).register(
+                output_dir, self._config, type(self).__name__, self._seed,
+                self._tokens, self._latencies, 
+                self._catalog_results(data_file))
         except Exception as e:
-            print(f"error:{e}")
-        finally:
-            agent_contexts = [agent.get_history() for agent in agents]
-            with self._lock:
-                self._update_record(self._record, agent_contexts, 
-                                   simulation_ind, agents)
+            print(f"An exception occurred while registering the run: {e}")
 
     def save_record(self, output_dir: str):
         """
         Save the experiment record to a file.
 
+        The record is written as an indexed result file (see
+        record_file.write_record), so readers can decode one simulation
+        without loading the others.
+
         Args:
             output_dir: The directory where the record will be saved.
 
@@ -213,12 +403,13 @@ class Template(ABC):
             if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
             data_file = output_dir + '/data.p'
-            # Save the record to a pickle file
-            pickle.dump(self._record, open(data_file, "wb"))
+            # Save the record to an indexed result file
+            write_record(data_file, self._record)
+            self._register(output_dir, data_file)
             return True, data_file
         except Exception as e:
             print(f"An exception occurred while saving the file: {e}")
             print("Saving to the current directory instead.")
             # Backup in case of an exception
-            pickle.dump(self._record, open("backup_output_file.p", "wb"))
+            write_record("backup_output_file.p", self._record)
             return False, ""
\ No newline at end of file
@@ -0,0 +1,491 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import time
+
+import numpy as np
+
+from .template import Template
+from ..llm.agent_nd import AgentND
+from ..llm.api_key import api_keys
+from ..llm.message import Prompt
+from ..llm.role import names
+from ..physics.connectivity import connectivity_factory
+from ..physics.engine import PhysicsEngine
+from ..physics.integrator import integrator_factory
+from ..physics.repulsion import RepulsionField
+from ..physics.state_store import StateStore
+from ..physics.trajectory import TrajectoryBuffer
+from ..profiling import profiler, trace
+from ..prompt.form import agent_output_form
+from ..prompt.personality import stubborn, suggestible
+from ..prompt import scenario_nd
+from ..visual.gen_html import gen_html
+
+class VectorNdDebate(Template):
+    """
+    VectorNdDebate is a class that simulates a debate between multiple robots
+    moving in an N-dimensional space.
+
+    The positions, targets and velocities of all agents in all simulations
+    are held by one StateStore of shape (n_exp, agents, dim); every agent
+    holds views into it. Trajectories go to a preallocated TrajectoryBuffer
+    that is memory-mapped into the output directory.
+
+    By default all agents answer behind a round barrier and then move for
+    one horizon. In asynchronous mode (args.async_mode) there is no barrier:
+    physics runs continuously on a simulated clock that follows the wall
+    clock, and every agent sends its next request on its own as soon as its
+    previous reply arrived (replan "reply") or once it has reached its
+    target (replan "arrival"), seeing its neighbors' positions at request
+    time.
+
+    Args:
+        args: 
+            An object containing configuration parameters for the debate 
+            simulation.
+        connectivity_matrix: 
+            A square matrix defining agent knowledge connectivity.
+        dim (int): 
+            Dimension of the space (default is taken from args.dim).
+
+    Raises:
+        ValueError: 
+            If the sum of stubborn and suggestible agents exceeds the total 
+            number of agents,
+            if there are insufficient API keys for the agents, or if the 
+            connectivity matrix is not appropriate.
+    """
+    _agent_class = AgentND  # Agent type created for each robot
+    _scenario = scenario_nd  # Prompt module used to describe the game
+
+    def __init__(self, args, connectivity_matrix, dim=None):
+        """
+        Initialize the VectorNdDebate instance.
+
+        Args:
+            args: An object containing configuration options.
+            connectivity_matrix: A matrix defining agent knowledge connectivity.
+            dim: Dimension of the space (optional).
+
+        Raises:
+            ValueError: If the input parameters are invalid.
+        """
+        super().__init__(args)
+        self._dim = dim if dim is not None else args.dim
+        self._dt = args.dt  # Physics time step (s)
+        self._horizon = args.horizon  # Motion time per round (s)
+        self._n_agents = args.agents
+        self._agent_role = self._scenario.agent_role.format(self._dim)
+        self._init_input = (self._scenario.game_description + "\n\n" 
+                            + agent_output_form)
+        self._round_description = self._scenario.round_description
+        self._positions = [[]] * args.n_exp
+        self._output_file = args.out_file
+        self._n_suggestible = args.n_suggestible
+        self._n_stubborn = args.n_stubborn
+        self._structured_output = args.structured_output
+        self._store = StateStore(args.n_exp, self._n_agents, self._dim)
+        # Optional collision avoidance between robots
+        interaction = None
+        if args.collision_radius > 0:
+            interaction = RepulsionField(args.collision_radius, 
+                                         args.collision_gain)
+        self._engine = PhysicsEngine(
+            self._store, integrator=integrator_factory(args.integrator),
+            settle_tolerance=args.settle_tol, interaction=interaction)
+        self._n_steps = int(round(self._horizon / self._dt))  # Physics steps per round
+        self._async_mode = args.async_mode
+        self._replan = args.replan  # "reply" or "arrival"
+        self._time_scale = args.time_scale  # Simulated seconds per second
+        self._arrive_tol = args.arrive_tol
+        # Simulated time limit of an asynchronous simulation (s)
+        self._max_time = (args.max_time if args.max_time > 0 
+                          else 2 * args.rounds * self._horizon)
+
+        # Define the connectivity matrix for agent knowledge
+        # m(i, j) = 1 means agent i knows the position of agent j
+        self._m = connectivity_matrix
+        # The communication graph is either the fixed matrix or recomputed 
+        # from the positions after every motion phase
+        self._connectivity = connectivity_factory(
+            args.connectivity, matrix=connectivity_matrix, 
+            radius=args.comm_radius, k=args.comm_k)
+
+        # Safety checks for input parameters
+        if self._dim < 1:
+            raise ValueError(f"dim must be positive, got: {self._dim}")
+        if self._n_steps < 1:
+            raise ValueError(f"horizon {self._horizon} is shorter than one "
+                             f"time step {self._dt}")
+        if self._replan not in ("reply", "arrival"):
+            raise ValueError(f"unknown replan policy: {self._replan}")
+        if self._time_scale <= 0:
+            raise ValueError(f"time_scale must be positive, got: "
+                             f"{self._time_scale}")
+        if args.n_stubborn + args.n_suggestible > self._n_agents:
+            raise ValueError("stubborn + suggestible agents is more than "
+                             f"{self._n_agents}")
+        if len(api_keys) < self._n_agents * args.n_exp:
+            raise ValueError("api_keys are not enough for "
+                             f"{self._n_agents} agents")
+        if self._m.shape[0] != self._m.shape[1]:
+            raise ValueError("connectivity_matrix is not a square matrix, "
+                             f"shape: {self._m.shape}")
+        if self._m.shape[0] != self._n_agents:
+            raise ValueError("connectivity_matrix is not enough for "
+                             f"{self._n_agents} agents, shape: {self._m.shape}")
+
+        # Preallocated trajectory buffers, memory-mapped in the output dir,
+        # created by run (see _open_trajectory)
+        self._trajectory = None
+        self._trajectory_dtype = np.dtype(args.trajectory_dtype)
+        # Requests sent by every agent, fewer than rounds when an 
+        # asynchronous simulation reached its time limit
+        self._requests_sent = np.full((args.n_exp, self._n_agents), 
+                                      args.rounds, dtype=np.int64)
+
+    def _initial_positions(self, rng):
+        """Draw the initial positions of the agents of one simulation.
+
+        Args:
+            rng: Random generator of the simulation.
+
+        Returns:
+            Array of shape (agents, dim).
+        """
+        return rng.integers(0, 100, size=(self._n_agents, self._dim))
+
+    def _update_other_positions(self, agents, positions, indices=None):
+        """Tell agents the positions of their current neighbors.
+
+        Args:
+            agents: List of agent instances.
+            positions: Array of shape (agents, dim) of the simulation.
+            indices: Indices of the agents to update (default is all).
+        """
+        neighbors = self._connectivity.neighbors(positions)
+        if indices is None:
+            indices = range(len(agents))
+        for idx in indices:
+            agents[idx].other_position = [tuple(x) for x 
+                                    in positions[neighbors[idx]].tolist()]
+
+    def _generate_agents(self, simulation_ind):
+        """Generate agent instances for the simulation.
+
+        Args:
+            simulation_ind: Index of the simulation.
+
+        Returns:
+            List of agent instances.
+        """
+        agents = []
+        position = self._initial_positions(self._rng(simulation_ind))
+        self._store.positions[simulation_ind] = position
+
+        for idx in range(self._n_agents):
+            agent = self._agent_class(
+                position=tuple(position[idx]),
+                other_position=[],
+                key=api_keys[simulation_ind * self._n_agents + idx],
+                model="gpt-3.5-turbo-0613",
+                name=names[idx],
+                store=self._store,
+                simulation_ind=simulation_ind,
+                agent_ind=idx,
+                structured_output=self._structured_output)
+            # add personality, neutral by default
+            personality = ""
+            if idx < self._n_stubborn:
+                personality = stubborn
+            elif (self._n_stubborn <= idx 
+                  < self._n_stubborn + self._n_suggestible):
+                personality = suggestible
+            agent.memories_update(role='system', 
+                                  content=self._agent_role + personality)
+            agents.append(agent)
+        self._update_other_positions(agents, 
+                                     self._store.positions[simulation_ind])
+        self._positions[simulation_ind] = position
+        return agents
+
+    def run(self):
+        """Run the experiment, see Template.run.
+
+        The trajectory buffers are created here rather than in the
+        constructor, so a debate that fails its checks or never runs leaves
+        no trajectory files in the output directory.
+        """
+        self._open_trajectory()
+        super().run()
+
+    def _open_trajectory(self):
+        """Create the trajectory buffers, unless they already exist."""
+        if self._trajectory is not None:
+            return
+        n_steps = None
+        if self._async_mode:
+            n_steps = int(round(self._max_time / self._dt)) + self._n_steps
+        self._trajectory = TrajectoryBuffer(
+            self._n_experiment, self._n_agents, self._n_round, self._n_steps,
+            self._dim, self._dt, output_dir=self._output_file or None,
+            dtype=self._trajectory_dtype, n_steps=n_steps)
+
+    def  _generate_question(self, agent, round) -> Prompt:
+        """Generate a question for an agent in a round.
+
+        Args:
+            agent: An agent instance.
+            round: The current round.
+
+        Returns:
+            A Prompt referencing the shared question template.
+        """
+        input = Prompt(self._init_input, agent.position, agent.other_position)
+        return input
+
+    def _exp_postprocess(self):
+        """Post-process the experiment data, including saving and 
+        generating HTML."""
+        is_success, filename = self.save_record(self._output_file)
+        if is_success:
+            gen_html(filename, self._output_file)
+
+    def _round_postprocess(self, simulation_ind, round, results, agents):
+        """Post-process data at the end of each round of the simulation.
+
+        Args:
+            simulation_ind: Index of the simulation.
+            round: The current round.
+            results: Results data.
+            agents: List of agent instances.
+        """
+        # Integrate all agents of the simulation at once, stopping early
+        # (and holding the final positions) once every agent has settled.
+        # Every step is written straight into the trajectory buffer.
+        self._engine.run(self._n_steps, self._dt, simulation_ind, 
+                         out=self._trajectory.round_steps(simulation_ind, 
+                                                          round))
+        self._trajectory.end_round(simulation_ind, round, 
+                                   self._store.targets[simulation_ind])
+        # The store already holds the latest positions of the simulation
+        self._update_other_positions(agents, 
+                                     self._store.positions[simulation_ind])
+
+    def _progress_state(self, simulation_ind, round, results):
+        """Get the targets and positions of a simulation after a round.
+
+        Args:
+            simulation_ind: Index of the simulation.
+            round: The round that just ended.
+            results: Results data (None in async mode, where a round is
+                one reply of every agent).
+
+        Returns:
+            dict: {"state": targets, "position": positions}, one vector
+            per agent, with None for targets not set yet.
+        """
+        targets = self._store.targets[simulation_ind]
+        return {"state": np.where(np.isnan(targets), None, targets).tolist(),
+                "position": self._store.positions[simulation_ind].tolist()}
+
+    def _run_rounds(self, simulation_ind, agents, progress):
+        """Run a simulation, round by round or asynchronously.
+
+        Args:
+            simulation_ind: Index of the simulation.
+            agents: List of agent instances.
+            progress: Progress bar for tracking the simulation's progress.
+        """
+        if not self._async_mode:
+            return super()._run_rounds(simulation_ind, agents, progress)
+        self._run_async(simulation_ind, agents, progress)
+
+    def _run_async(self, simulation_ind, agents, progress):
+        """Run a simulation without a round barrier.
+
+        Every agent has at most one request in flight and sends up to
+        'rounds' requests. The main thread steps the physics of the
+        simulation so that the simulated clock follows the wall clock
+        (scaled by time_scale) while replies are pending, and skips ahead
+        when no request is in flight. A reply sets the agent's target as
+        soon as it arrives. Once every request has been answered the robots
+        move for one more horizon (or until they settle), and the rest of
+        the trajectory buffer holds the final positions.
+
+        If the time limit (max_time) is reached first, the remaining
+        requests are not sent: the simulation is reported as truncated, in
+        the progress log and in the "requests_sent" result of the catalog.
+
+        Args:
+            simulation_ind: Index of the simulation.
+            agents: List of agent instances.
+            progress: Progress bar for tracking the simulation's progress.
+        """
+        dt = self._dt
+        n_agents = len(agents)
+        positions = self._store.positions[simulation_ind]
+        targets = self._store.targets[simulation_ind]
+        capacity = self._trajectory.n_steps - self._n_steps
+        requests = np.zeros(n_agents, dtype=int)  # Requests sent per agent
+        pending = {}  # future -> (agent index, request index)
+        n_replies = 0
+        step = 0
+        start = time.monotonic()
+        with ThreadPoolExecutor(n_agents) as agent_executor:
+            while step < capacity:
+                busy = [idx for idx, _ in pending.values()]
+                ready = requests < self._n_round
+                ready[busy] = False
+                if self._replan == "arrival":
+                    # The first request goes out at once, later ones on 
+                    # arrival
+                    ready &= (requests == 0) | self._engine.settled_agents(
+                        simulation_ind, self._arrive_tol)
+                ready = np.flatnonzero(ready)
+                if len(ready):
+                    self._update_other_positions(agents, positions, ready)
+                for idx in ready:
+                    question = self._generate_question(agents[idx], 
+                                                       requests[idx])
+                    answer = trace.wrap(agents[idx].answer, "answer", "llm",
+                                        sim=simulation_ind, 
+                                        round=int(requests[idx]),
+                                        agent=int(idx))
+                    future = agent_executor.submit(
+                        answer, question, idx, requests[idx], simulation_ind)
+                    pending[future] = (idx, requests[idx])
+                    requests[idx] += 1
+                if not pending:
+                    if (requests >= self._n_round).all():
+                        break
+                    # Nothing to wait for: move on without the wall clock
+                    start -= dt / self._time_scale
+                # Catch the simulated clock up with the wall clock
+                now = int((time.monotonic() - start) * self._time_scale / dt)
+                if step < min(now, capacity):
+                    with trace.span("physics", "physics", sim=simulation_ind,
+                                    steps=int(min(now, capacity) - step)):
+                        while step < min(now, capacity):
+                            self._engine.step(dt, simulation_ind)
+                            self._trajectory.steps(simulation_ind, step, 
+                                                  step + 1)[0] = positions
+                            step += 1
+                if not pending:
+                    continue
+                done, _ = wait(pending, timeout=dt / self._time_scale, 
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    idx, request = pending.pop(future)
+                    if future.exception() is not None:
+                        print("A thread raised an exception: "
+                              f"{future.exception()}")
+                    self._trajectory.set_target(simulation_ind, idx, request,
+                                                targets[idx], step)
+                    n_replies += 1
+                    if n_replies % n_agents == 0:
+                        progress.update(1)
+                        self._log_progress(simulation_ind, 
+                                           n_replies // n_agents - 1, None)
+                        profiler.snapshot(f"round {n_replies // n_agents - 1}")
+                if done:
+                    self._trajectory.flush()
+        # Replies that arrived after the time limit. Leaving the with block
+        # shut the executor down, which waited for these futures, so their
+        # targets are set by now
+        for future, (idx, request) in pending.items():
+            self._trajectory.set_target(simulation_ind, idx, request, 
+                                        targets[idx], step)
+            n_replies += 1
+            if n_replies % n_agents == 0:
+                progress.update(1)
+                self._log_progress(simulation_ind, 
+                                   n_replies // n_agents - 1, None)
+        self._requests_sent[simulation_ind] = requests
+        if (requests < self._n_round).any():
+            print(f"Simulation {simulation_ind} reached the time limit of "
+                  f"{self._max_time} s before all {self._n_round} requests "
+                  f"were sent (sent: {requests.tolist()}), increase "
+                  "--max_time")
+            with self._lock:
+                if self._progress is not None:
+                    self._write_progress({
+                        "event": "truncated", "sim": simulation_ind,
+                        "requests": requests.tolist(), "time": time.time()})
+        # Let the robots reach their last targets
+        with trace.span("physics", "physics", sim=simulation_ind, 
+                        steps=self._n_steps):
+            self._engine.run(self._n_steps, dt, simulation_ind, 
+                             out=self._trajectory.steps(simulation_ind, step,
+                                                        step + self._n_steps))
+        self._trajectory.steps(simulation_ind, step + self._n_steps)[:] = (
+            positions)
+        self._trajectory.flush()
+
+    def _update_record(self, record, agent_contexts, simulation_ind, agents):
+        """Update the experiment record with agent data.
+
+        Args:
+            record: Experiment record data.
+            agent_contexts: Contexts of agents.
+            simulation_ind: Index of the simulation.
+            agents: List of agent instances.
+        """
+        record[tuple(tuple(pos) for pos in self._positions[simulation_ind])] = (
+            agent_contexts)
+
+    def _catalog_results(self, data_file):
+        """Get the numeric results registered in the catalog.
+
+        Args:
+            data_file: Path of the saved record.
+
+        Returns:
+            A dict with the targets of every round (n_exp, agents, rounds, 
+            dim), the final positions (n_exp, agents, dim) and the number of
+            requests sent by every agent (n_exp, agents).
+        """
+        return {"target": np.asarray(self._trajectory.targets),
+                "final_position": self._store.positions.copy(),
+                "requests_sent": self._requests_sent.copy()}
+
+    def save_record(self, output_dir: str):
+        """Save the experiment record and agent trajectories.
+
+        Args:
+            output_dir: Directory where the data will be saved.
+
+        Returns:
+            A tuple (is_success, filename).
+        """
+        res = super().save_record(output_dir)
+        try:
+            self._trajectory.save(output_dir)
+        except Exception as e:
+            print("Error saving trajectory")
+            self._trajectory.save(".")
+        return res
@@ -23,10 +23,11 @@ OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-import re
 from .gpt import GPT
+from .output_parser import parse_scalar, position_function
+from ..profiling import trace
 from ..prompt.summarize import summarizer_role
-from ..prompt.form import summarizer_output_form
+from ..prompt.form import summarizer_output_form, repair_output_form
 
 class Agent(GPT):
     """
@@ -40,19 +41,27 @@ class Agent(GPT):
         model (str): GPT model name (default is 'gpt-3.5-turbo-0613').
         temperature (float): 
             GPT temperature for text generation (default is 0.7).
+        structured_output (bool): 
+            Whether to request the answer as function-call arguments 
+            (default is False).
     """
     def __init__(self, position, other_position, key: str, name=None, 
-                 model: str = 'gpt-3.5-turbo-0613', temperature: float = 0.7):
+                 model: str = 'gpt-3.5-turbo-0613', temperature: float = 0.7,
+                 structured_output: bool = False):
         super().__init__(key=key, model=model, temperature=temperature)
         self._name = name
         self._position = position  # Current position of the agent
         self._other_position = other_position  # Positions of other agents
-        self._trajectory = [self.position]  # Record the agent's movement trajectory
         self._summarizer = GPT(key=key, model="gpt-3.5-turbo-0613", 
                                keep_memory=False)
         self._summarize_result = ""
         self._summarizer_descriptions = summarizer_output_form
         self._summarizer.memories_update(role='system', content=summarizer_role)
+        self._output_kwargs = {}
+        if structured_output:
+            function = position_function()
+            self._output_kwargs = {"functions": [function],
+                                   "function_call": {"name": function["name"]}}
 
     @property
     def name(self):
@@ -93,11 +102,22 @@ class Agent(GPT):
             tuple: Index and the updated position of the agent.
         """
         try:
-            answer = self.generate_answer(input=input, try_times=try_times)
-            self.position = self.parse_output(answer)
+            answer = self.generate_answer(input=input, try_times=try_times,
+                                          **self._output_kwargs)
+            try:
+                with trace.span("parse", "llm"):
+                    self.position = self.parse_output(answer)
+            except ValueError:
+                # Repair only the malformed answer instead of a full replay
+                with trace.span("repair", "llm"):
+                    answer = self.repair_answer(
+                        repair_output_form.format(answer, "a single number"))
+                    self.position = self.parse_output(answer)
             return idx, self.position
         except Exception as e:
             try_times += 1
+            trace.instant("retry", "llm", agent=idx, round=round,
+                          try_times=try_times, error=str(e)[:200])
             if try_times < 3:
                 print(f"An error occurred when agent {self._name} tried to "
                       f"generate answers: {e},try_times: {try_times + 1}/3.")
@@ -130,11 +150,8 @@ class Agent(GPT):
 
         Returns:
             float: Parsed position value.
+
+        Raises:
+            ValueError: If the output holds no position.
         """
-        matches = re.findall(r'[-+]?\d*\.\d+|\d+', output)
-        if matches:
-            x = float(matches[-1])
-            self._trajectory.append(x)
-            return x
-        else:
-            raise ValueError(f"output: \n{output}\n can not be parsed")
+        return parse_scalar(output)
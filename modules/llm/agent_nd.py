@@ -0,0 +1,246 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+from .gpt import GPT
+from .output_parser import parse_vector, position_function
+from ..profiling import trace
+from ..physics.integrator import FixedStepIntegrator
+from ..physics.params import RobotParams
+from ..physics.state_store import StateStore
+from ..prompt.summarize import summarizer_role
+from ..prompt.form import summarizer_output_form, repair_output_form
+
+class AgentND(GPT):
+    """
+    A class representing an N-dimensional agent with position control.
+
+    The kinematic state (position, target, velocity) of the agent is a set of
+    views into a shared StateStore, so the experiment can read and write the
+    state of all agents as one array.
+
+    Args:
+        position (tuple): Current position of the agent.
+        other_position (list of tuples): Positions of other agents.
+        key (str): API key for the GPT model.
+        name (str): Name of the agent (optional).
+        model (str): GPT model name (default is 'gpt-3.5-turbo-0613').
+        temperature (float): 
+            GPT temperature for text generation (default is 0.7).
+        keep_memory (bool): 
+            Whether to keep a memory of conversations (default is False).
+        store (StateStore): 
+            Shared state store (optional). A private single-agent store is
+            created when it is not given.
+        simulation_ind (int): Index of the simulation in the store.
+        agent_ind (int): Index of the agent in the store.
+        structured_output (bool): 
+            Whether to request the answer as function-call arguments 
+            (default is False).
+        integrator (Integrator): 
+            Integration scheme used by move (default FixedStepIntegrator()).
+    """
+
+    def __init__(self, position, other_position, key: str, name=None,
+                 model: str = 'gpt-3.5-turbo-0613', temperature: float = 0.7,
+                 keep_memory=False, store: StateStore = None,
+                 simulation_ind: int = 0, agent_ind: int = 0,
+                 structured_output: bool = False, integrator=None):
+        super().__init__(key=key, model=model, temperature=temperature, 
+                         keep_memory=keep_memory)
+        if store is None:
+            store = StateStore(1, 1, len(position))
+            simulation_ind, agent_ind = 0, 0
+        self._name = name
+        self._dim = store.dim
+        self._store = store
+        # Views into the shared store, always updated in place
+        (self._position, self._target_position, self._velocity,
+         self.prev_error, self.integral) = store.view(simulation_ind, 
+                                                      agent_ind)
+        self._position[:] = position  # Current position of the agent
+        params = RobotParams()
+        self._max_traction_force = params.max_traction_force  # Maximum traction force of the agent (N)
+        self._max_velocity = params.max_velocity  # Maximum velocity of the agent (m/s)
+        self._m = params.mass  # Mass of the agent (kg)
+        self._mu = 0.02  # Friction coefficient
+        # PID Parameters
+        self.Kp = np.full(self._dim, params.kp, dtype=np.float64)
+        self.Ki = np.full(self._dim, params.ki, dtype=np.float64)
+        self.Kd = np.full(self._dim, params.kd, dtype=np.float64)
+        self._integrator = (integrator if integrator is not None 
+                            else FixedStepIntegrator())
+        self._exact_position = None  # Unrounded position of continuous integrators
+        self._other_position = other_position  # Positions of other agents
+        self._summarizer = GPT(key=key, model="gpt-3.5-turbo-0613", 
+                               keep_memory=False)
+        self._summarize_result = ""
+        self._summarizer_descriptions = summarizer_output_form
+        self._summarizer.memories_update(role='system', content=summarizer_role)
+        self._output_kwargs = {}
+        if structured_output:
+            function = position_function(self._dim)
+            self._output_kwargs = {"functions": [function],
+                                   "function_call": {"name": function["name"]}}
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def dim(self):
+        return self._dim
+
+    @property
+    def position(self):
+        return tuple(self._position.tolist())
+
+    @position.setter
+    def position(self, value):
+        self._position[:] = value
+
+    @property
+    def state(self):
+        return self._position, self._target_position, self._velocity
+
+    @property
+    def other_position(self):
+        return self._other_position
+
+    @other_position.setter
+    def other_position(self, value):
+        self._other_position = value
+
+    @property
+    def target_position(self):
+        if np.isnan(self._target_position).any():
+            return None
+        return tuple(self._target_position.tolist())
+
+    @property
+    def summarize_result(self):
+        return self._summarize_result
+
+    def answer(self, input, idx, round, simulation_ind, try_times=0) -> tuple:
+        """
+        Generate an answer using the GPT model.
+
+        Args:
+            input (str): Input text or prompt.
+            idx: Index.
+            round: Round.
+            simulation_ind: Simulation index.
+            try_times (int): Number of times the answer generation is attempted.
+
+        Returns:
+            tuple: Index and the target position.
+        """
+        try:
+            answer = self.generate_answer(input=input, try_times=try_times,
+                                          **self._output_kwargs)
+            try:
+                with trace.span("parse", "llm"):
+                    target = self.parse_output(answer)
+            except ValueError:
+                # Repair only the malformed answer instead of a full replay
+                with trace.span("repair", "llm"):
+                    answer = self.repair_answer(repair_output_form.format(
+                        answer, 
+                        f"a tuple of {self._dim} numbers in parentheses"))
+                    target = self.parse_output(answer)
+            self._target_position[:] = target
+            return idx, target
+        except Exception as e:
+            try_times += 1
+            trace.instant("retry", "llm", agent=idx, round=int(round),
+                          try_times=try_times, error=str(e)[:200])
+            if try_times < 3:
+                print(f"An error occurred when agent {self._name} tried to "
+                      f"generate answers: {e},try_times: {try_times + 1}/3.")
+                return self.answer(input=input, idx=idx, round=round, 
+                                   simulation_ind=simulation_ind, 
+                                   try_times=try_times)
+            else:
+                print("After three attempts, the error still remains "
+                      f"unresolved, the input is:\n'{input}'\n.")
+                return idx, self.target_position
+
+    def summarize(self, agent_answers):
+        """
+        Generate a summary of agent answers.
+
+        Args:
+            agent_answers (list): List of agent answers.
+        """
+        if len(agent_answers) == 0:
+            self._summarize_result = ""
+        else:
+            self._summarize_result = self._summarizer.generate_answer(
+                self._summarizer_descriptions.format(agent_answers))
+
+    def parse_output(self, output):
+        """
+        Parse the output for visualization.
+
+        Args:
+            output (str): Model's output.
+
+        Returns:
+            tuple: Parsed position value with one entry per dimension.
+
+        Raises:
+            ValueError: If the output holds no position of the right size.
+        """
+        return parse_vector(output, self._dim)
+
+    def move(self, time_duration: float):
+        """
+        Move the agent based on PID control.
+
+        The position and velocity views are updated in place by the
+        integrator, so the shared store always holds the latest state.
+
+        Args:
+            time_duration (float): Time duration for the movement.
+        """
+        if np.isnan(self._target_position).any():
+            print("Target not set!")
+            return
+        params = RobotParams(kp=self.Kp, ki=self.Ki, kd=self.Kd,
+                             max_traction_force=self._max_traction_force,
+                             max_velocity=self._max_velocity, mass=self._m)
+        position = self._position
+        if self._integrator.continuous:
+            # Integrate from the unrounded position (see PhysicsEngine),
+            # unless the position was set from outside since the last move
+            if (self._exact_position is None or not np.array_equal(
+                    np.round(self._exact_position, 2), self._position)):
+                self._exact_position = self._position.copy()
+            position = self._exact_position
+        state = (position, self._target_position, self._velocity,
+                 self.prev_error, self.integral)
+        self._integrator.step(state, time_duration, params, True, key=id(self))
+        np.round(position, 2, out=self._position)
+        return self.position
@@ -23,13 +23,18 @@ OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import time
+
 import openai
+from .message import Message
+from ..profiling import trace
 
 class GPT:
     """
     Initialize the GPT class for interacting with OpenAI's GPT model.
     GPT provides basic methods for interacting with the model and parsing its
-    output.
+    output. Memories and history share the same Message objects, and system
+    prompts and templates are interned, so they are stored only once.
     """
 
     def __init__(self, key: str, model: str = 'gpt-3.5-turbo-0613',
@@ -45,18 +50,27 @@ class GPT:
         """
         self._model = model
         self._openai_key = key
-        self._cost = 0
+        self._cost = 0  # Total tokens used
+        self._latencies = []  # Wall time of every request (s)
         self._memories = []
         self._keep_memory = keep_memory
         self._temperature = temperature
         self._history = []
 
+    @property
+    def cost(self):
+        return self._cost
+
+    @property
+    def latencies(self):
+        return self._latencies
+
     def get_memories(self):
         """
         Get the current memories.
 
         Returns:
-            list: List of memories.
+            list: List of memories (Message).
         """
         return self._memories
 
@@ -65,7 +79,7 @@ class GPT:
         Get the conversation history.
 
         Returns:
-            list: List of conversation history.
+            list: List of conversation history (Message).
         """
         return self._history
 
@@ -76,7 +90,7 @@ class GPT:
 
         Args:
             role (str): Role (system, user, assistant).
-            content (str): Content.
+            content (str or Prompt): Content.
 
         Raises:
             ValueError: If an unrecognized role is provided or if roles are
@@ -89,23 +103,26 @@ class GPT:
             raise ValueError('System role can only be added when memories are '
                              'empty')
         if (role == "user" and len(self._memories) > 0 and
-            self._memories[-1]["role"] == "user"):
+            self._memories[-1].role == "user"):
             raise ValueError('User role can only be added if the previous '
                              'round was a system or assistant role')
         if (role == "assistant" and len(self._memories) > 0 and
-            self._memories[-1]["role"] != "user"):
+            self._memories[-1].role != "user"):
             raise ValueError('Assistant role can only be added if the previous '
                              'round was a user role')
-        self._memories.append({"role": role, "content": content})
-        self._history.append({"role": role, "content": content})
+        message = Message(role, content)
+        self._memories.append(message)
+        self._history.append(message)
 
     def generate_answer(self, input: str, try_times=0, **kwargs) -> str:
         """
         Interact with the GPT model and generate an answer.
 
         Args:
-            input (str): Prompt or user input.
-            try_times (int): Number of attempts (default is 0).
+            input (str or Prompt): Prompt or user input.
+            try_times (int): Number of attempts (default is 0). A retry
+                asks again with the same input and replaces the previous
+                answer.
             kwargs: Additional parameters for the model.
 
         Returns:
@@ -114,29 +131,85 @@ class GPT:
         Raises:
             ConnectionError: If there's an error in generating the answer.
         """
-        if not self._keep_memory:
-            self._memories = [self._memories[0]]
-
         if try_times == 0:
-            self._memories.append({"role": "user", "content": input})
-            self._history.append({"role": "user", "content": input})
+            if not self._keep_memory:
+                self._memories = [self._memories[0]]
+            message = Message("user", input)
+            self._memories.append(message)
+            self._history.append(message)
         else:
-            if self._memories[-1]["role"] == "assistant":
+            # The new answer replaces the failed one, in the memories as
+            # well as in the history
+            if self._memories[-1].role == "assistant":
                 self._memories = self._memories[:-1]
+            if self._history and self._history[-1].role == "assistant":
+                self._history.pop()
+
+        content = self._request([m.to_dict() for m in self._memories], 
+                                **kwargs)
+        message = Message("assistant", content)
+        self._memories.append(message)
+        self._history.append(message)
+        return content
+
+    def repair_answer(self, prompt: str) -> str:
+        """
+        Ask the model to rewrite a malformed answer.
 
+        Only the repair prompt (which quotes the malformed answer) is sent,
+        not the whole conversation. The repaired answer replaces the
+        malformed one in the memories and the history.
+
+        Args:
+            prompt (str): Repair instruction including the malformed answer.
+
+        Returns:
+            str: The repaired answer.
+
+        Raises:
+            ConnectionError: If there's an error in generating the answer.
+        """
+        content = self._request([{"role": "user", "content": prompt}])
+        message = Message("assistant", content)
+        if self._memories and self._memories[-1].role == "assistant":
+            if self._history and self._history[-1] is self._memories[-1]:
+                self._history[-1] = message
+            self._memories[-1] = message
+        return content
+
+    def _request(self, messages, **kwargs) -> str:
+        """
+        Send messages to the GPT model.
+
+        Args:
+            messages (list): Messages in the dict format of the chat API.
+            kwargs: Additional parameters for the model.
+
+        Returns:
+            str: Text-based output result, or the arguments of the function
+            call when the model answers with one.
+
+        Raises:
+            ConnectionError: If there's an error in generating the answer.
+        """
         openai.api_key = self._openai_key
 
         try:
-            response = openai.ChatCompletion.create(
-                model=self._model,
-                messages=self._memories,
-                temperature=self._temperature,
-                **kwargs
-            )
-            self._cost += response['usage']["total_tokens"]
-            content = response['choices'][0]['message']['content']
-            self._memories.append({"role": "assistant", "content": content})
-            self._history.append({"role": "assistant", "content": content})
-            return content
+            with trace.span("http", "llm", model=self._model) as span_args:
+                start = time.perf_counter()
+                response = openai.ChatCompletion.create(
+                    model=self._model,
+                    messages=messages,
+                    temperature=self._temperature,
+                    **kwargs
+                )
+                self._latencies.append(time.perf_counter() - start)
+                self._cost += response['usage']["total_tokens"]
+                span_args["tokens"] = response['usage']["total_tokens"]
+            message = response['choices'][0]['message']
+            function_call = message.get('function_call')
+            if function_call:
+                return function_call['arguments']
+            return message['content']
         except Exception as e:
             raise ConnectionError(f"Error in generate_answer: {e}")
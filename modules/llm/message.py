@@ -0,0 +1,265 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import threading
+
+class StringTable:
+    """
+    A thread-safe table of interned strings.
+
+    Every distinct string is stored once and identified by its index, so the
+    same system prompt or prompt template shared by many agents is held in
+    memory (and written to disk) only once.
+    """
+    def __init__(self, strings=()):
+        self._strings = []
+        self._ids = {}
+        self._lock = threading.Lock()
+        for s in strings:
+            self.index(s)
+
+    def __len__(self):
+        return len(self._strings)
+
+    @property
+    def strings(self):
+        return self._strings
+
+    def index(self, s: str) -> int:
+        """
+        Get the index of a string, adding it to the table if needed.
+
+        Args:
+            s (str): The string to look up.
+
+        Returns:
+            int: Index of the string in the table.
+        """
+        ind = self._ids.get(s)
+        if ind is None:
+            with self._lock:
+                ind = self._ids.get(s)
+                if ind is None:
+                    ind = len(self._strings)
+                    self._strings.append(s)
+                    self._ids[s] = ind
+        return ind
+
+    def intern(self, s: str) -> str:
+        """
+        Get the canonical copy of a string.
+
+        Args:
+            s (str): The string to intern.
+
+        Returns:
+            str: The string object stored in the table.
+        """
+        return self._strings[self.index(s)]
+
+    def get(self, ind: int) -> str:
+        return self._strings[ind]
+
+# Process-wide table for system prompts and prompt templates
+strings = StringTable()
+
+class Prompt:
+    """
+    A prompt template together with the values formatted into it.
+
+    The template is interned, so a prompt only costs the (short) formatted
+    values on top of a reference to the shared template text.
+
+    Args:
+        template (str): Template with '{}' placeholders.
+        *args: Values formatted into the placeholders.
+    """
+    __slots__ = ('template', 'args')
+
+    def __init__(self, template: str, *args):
+        self.template = strings.intern(template)
+        self.args = tuple(format(arg) for arg in args)
+
+    def __str__(self):
+        return self.template.format(*self.args)
+
+class Message:
+    """
+    A single chat message.
+
+    Messages are shared between the memories and the history of an agent.
+    Content is stored as a template and its arguments; system prompts and
+    templates are interned in the process-wide string table. Item access
+    (message["role"], message["content"]) is kept for code written against
+    plain message dicts.
+
+    Args:
+        role (str): Role (system, user, assistant).
+        content (str or Prompt): Content of the message.
+    """
+    __slots__ = ('role', 'template', 'args')
+
+    def __init__(self, role: str, content):
+        self.role = role
+        if isinstance(content, Prompt):
+            self.template, self.args = content.template, content.args
+        else:
+            self.template = (strings.intern(content) if role == 'system' 
+                             else content)
+            self.args = ()
+
+    @property
+    def content(self):
+        if self.args:
+            return self.template.format(*self.args)
+        return self.template
+
+    def __getitem__(self, key):
+        if key not in ('role', 'content'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """
+        Convert the message to the dict format of the chat API.
+
+        Returns:
+            dict: {"role": ..., "content": ...}
+        """
+        return {"role": self.role, "content": self.content}
+
+    def __repr__(self):
+        return f"Message(role={self.role!r}, content={self.content!r})"
+
+def split_rounds(messages):
+    """
+    Split an agent history into rounds.
+
+    A round starts at a user message and runs up to the next one, so the
+    rounds do not depend on how many answers were stored per question.
+    Messages before the first user message (the system prompt) belong to
+    no round.
+
+    Args:
+        messages (list): Messages of one agent (Message or message dicts).
+
+    Returns:
+        list: (start, end) index ranges of the rounds.
+    """
+    starts = [i for i, msg in enumerate(messages) if msg["role"] == "user"]
+    return list(zip(starts, starts[1:] + [len(messages)]))
+
+def round_answers(messages):
+    """
+    Get the answer of an agent in every round.
+
+    Args:
+        messages (list): Messages of one agent (Message or message dicts).
+
+    Returns:
+        list: Per round (see split_rounds), the content of its last
+        assistant message, None if the round has no answer.
+    """
+    answers = []
+    for start, end in split_rounds(messages):
+        answer = None
+        for msg in messages[start + 1:end]:
+            if msg["role"] == "assistant":
+                answer = msg["content"]
+        answers.append(answer)
+    return answers
+
+RECORD_FORMAT = 'interned-v1'
+
+def pack_record(record):
+    """
+    Encode an experiment record for storage.
+
+    Every template and message text is replaced by an index into a string
+    table stored once in the packed record.
+
+    Args:
+        record (dict): Mapping from simulation key to a list of agent
+            histories (lists of Message or message dicts).
+
+    Returns:
+        dict: {"format", "strings", "records"} where each message is a
+        (role, string index, args) tuple.
+    """
+    table = StringTable()
+    records = {}
+    for key, agent_contexts in record.items():
+        packed_contexts = []
+        for context in agent_contexts:
+            packed = []
+            for msg in context:
+                if not isinstance(msg, Message):
+                    msg = Message(msg["role"], msg["content"])
+                packed.append((msg.role, table.index(msg.template), msg.args))
+            packed_contexts.append(packed)
+        records[key] = packed_contexts
+    return {"format": RECORD_FORMAT, "strings": table.strings,
+            "records": records}
+
+def is_packed_record(obj):
+    return isinstance(obj, dict) and obj.get("format") == RECORD_FORMAT
+
+def unpack_context(context, table):
+    """
+    Decode the packed history of one agent.
+
+    Args:
+        context (list): Packed (role, string index, args) tuples.
+        table (list): The string table of the record.
+
+    Returns:
+        list: List of Message.
+    """
+    messages = []
+    for role, ind, args in context:
+        msg = Message.__new__(Message)
+        msg.role, msg.template, msg.args = role, table[ind], args
+        messages.append(msg)
+    return messages
+
+def unpack_record(obj):
+    """
+    Decode a record produced by pack_record.
+
+    Args:
+        obj (dict): The packed record.
+
+    Returns:
+        dict: Mapping from simulation key to a list of agent histories.
+    """
+    table = obj["strings"]
+    return {key: [unpack_context(context, table) for context in contexts]
+            for key, contexts in obj["records"].items()}
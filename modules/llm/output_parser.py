@@ -0,0 +1,180 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import json
+import re
+
+# Patterns are compiled once and shared by all agents
+NUMBER_PATTERN = re.compile(r'[-+]?\d*\.\d+|\d+')
+SIGNED_NUMBER_PATTERN = re.compile(r'[-+]?\d*\.\d+|[-+]?\d+')
+POSITION_PATTERN = re.compile(r'position[\'"*\s]*[:=]', re.IGNORECASE)
+TUPLE_PATTERN = re.compile(r'[\(\[]([^()\[\]]*)[\)\]]')
+PARENTHESES_PATTERN = re.compile(r'\((.*?)\)')
+JSON_PATTERN = re.compile(r'\{.*\}', re.DOTALL)
+
+def position_function(dim=None):
+    """
+    Build the function definition used in structured output mode.
+
+    Args:
+        dim (int): Dimension of the position, None for a scalar position.
+
+    Returns:
+        dict: Function definition for the chat completion 'functions' field.
+    """
+    if dim is None:
+        position = {"type": "number", 
+                    "description": "The position to move to."}
+    else:
+        position = {"type": "array", "items": {"type": "number"},
+                    "minItems": dim, "maxItems": dim,
+                    "description": f"The position to move to, {dim} "
+                                   "coordinates."}
+    return {
+        "name": "submit_position",
+        "description": "Submit the reasoning and the position to move to.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "reasoning": {"type": "string",
+                              "description": "Your thought process."},
+                "position": position,
+            },
+            "required": ["reasoning", "position"],
+        },
+    }
+
+def _parse_json_position(output):
+    """
+    Extract the 'position' field of a JSON reply.
+
+    Args:
+        output (str): Model's output.
+
+    Returns:
+        The position field, or None if the output holds no JSON position.
+    """
+    if '{' not in output:
+        return None
+    match = JSON_PATTERN.search(output)
+    if match is None:
+        return None
+    try:
+        obj = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if isinstance(obj, dict):
+        return obj.get("position")
+    return None
+
+def _position_section(output):
+    """
+    Get the text after the last 'Position:' label.
+
+    Args:
+        output (str): Model's output.
+
+    Returns:
+        str or None: The position section, None if there is no label.
+    """
+    last = None
+    for last in POSITION_PATTERN.finditer(output):
+        pass
+    if last is None:
+        return None
+    return output[last.end():]
+
+def parse_scalar(output):
+    """
+    Parse a scalar position from a reply.
+
+    The JSON 'position' field of structured replies is used first, then the
+    first number after the last 'Position:' label, and finally the last
+    number anywhere in the reply.
+
+    Args:
+        output (str): Model's output.
+
+    Returns:
+        float: Parsed position value.
+
+    Raises:
+        ValueError: If no position can be found.
+    """
+    position = _parse_json_position(output)
+    if isinstance(position, (int, float)) and not isinstance(position, bool):
+        return float(position)
+    section = _position_section(output)
+    if section is not None:
+        match = SIGNED_NUMBER_PATTERN.search(section)
+        if match:
+            return float(match.group(0))
+    matches = NUMBER_PATTERN.findall(output)
+    if matches:
+        return float(matches[-1])
+    raise ValueError(f"output: \n{output}\n can not be parsed")
+
+def parse_vector(output, dim):
+    """
+    Parse a position with dim coordinates from a reply.
+
+    The JSON 'position' field of structured replies is used first, then the
+    first bracketed group after the last 'Position:' label, and finally the
+    last parenthesized group anywhere in the reply.
+
+    Args:
+        output (str): Model's output.
+        dim (int): Number of coordinates.
+
+    Returns:
+        tuple: Parsed position value.
+
+    Raises:
+        ValueError: If no position with dim coordinates can be found.
+    """
+    position = _parse_json_position(output)
+    if isinstance(position, list) and len(position) == dim:
+        try:
+            return tuple(float(x) for x in position)
+        except (TypeError, ValueError):
+            pass
+    section = _position_section(output)
+    if section is not None:
+        match = TUPLE_PATTERN.search(section)
+        if match:
+            numbers = SIGNED_NUMBER_PATTERN.findall(match.group(1))
+            if len(numbers) == dim:
+                return tuple(float(x) for x in numbers)
+    matches = PARENTHESES_PATTERN.findall(output)
+    if matches:
+        last_match = matches[-1]
+        numbers = NUMBER_PATTERN.findall(last_match)
+        if len(numbers) == dim:
+            return tuple(float(x) for x in numbers)
+        else:
+            raise ValueError(f"The last match {last_match} does "
+                             f"not contain exactly {dim} numbers.")
+    else:
+        raise ValueError(f"No array found in the output: \n{output}")
@@ -0,0 +1,180 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import os
+import pickle
+import struct
+from .message import is_packed_record, pack_record, unpack_record
+
+INDEXED_FORMAT = 'indexed-v1'
+MAGIC = b'LLMREC01'
+# Offset of the footer and magic number, at the very end of the file
+TRAILER = struct.Struct('<Q8s')
+
+def write_record(filename, record):
+    """
+    Write an experiment record as an indexed result file.
+
+    Every simulation is pickled on its own in the packed format of
+    pack_record (with its own string table), followed by a footer with the
+    key and the offset of every simulation, so a single simulation can be
+    read without decoding the others. The file is replaced atomically.
+
+    Args:
+        filename (str): Path of the result file.
+        record (dict): Mapping from simulation key to a list of agent
+            histories.
+    """
+    keys, offsets = [], []
+    tmp_name = filename + '.tmp'
+    with open(tmp_name, 'wb') as f:
+        for key, agent_contexts in record.items():
+            keys.append(key)
+            offsets.append(f.tell())
+            pickle.dump(pack_record({key: agent_contexts}), f, 
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        footer = f.tell()
+        pickle.dump({"format": INDEXED_FORMAT, "keys": keys, 
+                     "offsets": offsets}, f, 
+                    protocol=pickle.HIGHEST_PROTOCOL)
+        f.write(TRAILER.pack(footer, MAGIC))
+    os.replace(tmp_name, filename)
+
+class RecordFile:
+    """
+    Random-access reader of a result file.
+
+    Indexed files (see write_record) are read lazily: opening one reads
+    only its footer, and get_simulation decodes a single simulation. Legacy
+    files, a single pickled record (packed or not), are decoded whole when
+    opened and served from memory through the same interface.
+
+    Attributes:
+        _file (file): The open result file, None for legacy files.
+        _keys (list): Key of every simulation, in file order.
+        _offsets (list): Offset of every simulation in an indexed file.
+        _record (dict): The decoded record of a legacy file.
+    """
+    def __init__(self, filename):
+        """
+        Open a result file.
+
+        Args:
+            filename (str): Path of the result file.
+        """
+        self._file = open(filename, 'rb')
+        self._offsets = None
+        self._record = None
+        footer = self._read_footer()
+        if footer is not None:
+            self._keys, self._offsets = footer["keys"], footer["offsets"]
+            return
+        self._file.seek(0)
+        record = pickle.load(self._file)
+        self.close()
+        if is_packed_record(record):
+            record = unpack_record(record)
+        self._record = record
+        self._keys = list(record)
+
+    def _read_footer(self):
+        """
+        Read the footer of an indexed file.
+
+        Returns:
+            dict or None: The footer, None if the file is not indexed.
+        """
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size < TRAILER.size:
+            return None
+        self._file.seek(size - TRAILER.size)
+        footer, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+        if magic != MAGIC or footer >= size:
+            return None
+        self._file.seek(footer)
+        footer = pickle.load(self._file)
+        if not isinstance(footer, dict) or footer.get("format") != INDEXED_FORMAT:
+            return None
+        return footer
+
+    @property
+    def keys(self):
+        return self._keys
+
+    @property
+    def indexed(self):
+        return self._offsets is not None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get_simulation(self, ind):
+        """
+        Decode one simulation.
+
+        Args:
+            ind (int): Index of the simulation, in file order (negative
+                indices count from the end).
+
+        Returns:
+            tuple: (key, agent histories), each history a list of Message.
+        """
+        key = self._keys[ind]
+        if self._record is not None:
+            return key, self._record[key]
+        self._file.seek(self._offsets[ind])
+        (agent_contexts,) = unpack_record(pickle.load(self._file)).values()
+        return key, agent_contexts
+
+    def iter_simulations(self):
+        """
+        Decode the simulations one at a time, in file order.
+
+        Yields:
+            tuple: (key, agent histories) of every simulation.
+        """
+        for ind in range(len(self._keys)):
+            yield self.get_simulation(ind)
+
+    def to_dict(self):
+        """
+        Decode the whole record.
+
+        Returns:
+            dict: Mapping from simulation key to a list of agent histories.
+        """
+        return dict(self.iter_simulations())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
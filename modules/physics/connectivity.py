@@ -0,0 +1,178 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+from .spatial_hash import SpatialHash
+
+def _group_neighbors(query_ind, neighbor_ind, n_agents):
+    """
+    Split directed (query, neighbor) pairs into one index array per agent.
+
+    Args:
+        query_ind (numpy.ndarray): Query agent of every pair.
+        neighbor_ind (numpy.ndarray): Neighbor agent of every pair.
+        n_agents (int): Number of agents.
+
+    Returns:
+        list: For every agent, the sorted indices of its neighbors.
+    """
+    order = np.lexsort((neighbor_ind, query_ind))
+    bounds = np.searchsorted(query_ind[order], np.arange(n_agents + 1))
+    neighbor_ind = neighbor_ind[order]
+    return [neighbor_ind[bounds[i]:bounds[i + 1]] for i in range(n_agents)]
+
+class StaticConnectivity:
+    """
+    A fixed communication graph given by a connectivity matrix.
+
+    Args:
+        matrix (numpy.ndarray): Boolean matrix, m(i, j) = 1 means agent i
+            knows the position of agent j.
+    """
+    def __init__(self, matrix):
+        self._neighbors = [np.flatnonzero(row) for row in np.asarray(matrix)]
+
+    def neighbors(self, positions):
+        """
+        Get the neighbors of every agent.
+
+        Args:
+            positions (numpy.ndarray): Positions of shape (n_agents, dim),
+                unused.
+
+        Returns:
+            list: For every agent, the indices of its neighbors.
+        """
+        return self._neighbors
+
+class RadiusConnectivity:
+    """
+    An r-disk communication graph: agents know every agent within radius.
+
+    Args:
+        radius (float): Communication range (m).
+    """
+    def __init__(self, radius):
+        if radius <= 0:
+            raise ValueError(f"radius must be positive, got: {radius}")
+        self._radius = radius
+
+    def neighbors(self, positions):
+        """
+        Get the neighbors of every agent from the current positions.
+
+        Args:
+            positions (numpy.ndarray): Positions of shape (n_agents, dim).
+
+        Returns:
+            list: For every agent, the sorted indices of the agents within
+            the communication range.
+        """
+        query_ind, neighbor_ind, _ = SpatialHash(
+            positions, self._radius).query(self._radius)
+        return _group_neighbors(query_ind, neighbor_ind, len(positions))
+
+class KNearestConnectivity:
+    """
+    A k-nearest-neighbor communication graph.
+
+    Neighbors are searched with a spatial hash within a radius estimated
+    from the density of the agents; the radius is doubled only for the
+    agents that have fewer than k agents within it.
+
+    Args:
+        k (int): Number of neighbors of every agent.
+    """
+    def __init__(self, k):
+        if k < 1:
+            raise ValueError(f"k must be positive, got: {k}")
+        self._k = k
+
+    def neighbors(self, positions):
+        """
+        Get the neighbors of every agent from the current positions.
+
+        Args:
+            positions (numpy.ndarray): Positions of shape (n_agents, dim).
+
+        Returns:
+            list: For every agent, the sorted indices of its k nearest
+            agents (all other agents if there are fewer than k).
+        """
+        positions = np.asarray(positions, dtype=np.float64)
+        n_agents, dim = positions.shape
+        k = min(self._k, n_agents - 1)
+        if k <= 0:
+            return [np.empty(0, dtype=np.int64) for _ in range(n_agents)]
+        # Radius holding about k agents at the average density
+        extent = np.ptp(positions, axis=0).clip(min=1e-6)
+        radius = max((np.prod(extent) * (k + 1) / n_agents) ** (1 / dim), 
+                     1e-3)
+        pending = np.arange(n_agents)
+        found_query, found_neighbor = [], []
+        while len(pending):
+            index = SpatialHash(positions, radius)
+            query_ind, neighbor_ind, distance = index.query(radius, pending)
+            counts = np.bincount(query_ind, minlength=n_agents)[pending]
+            done = pending[counts >= k]
+            keep = np.isin(query_ind, done)
+            query_ind, neighbor_ind = query_ind[keep], neighbor_ind[keep]
+            distance = distance[keep]
+            # Keep the k nearest of every finished agent
+            order = np.lexsort((neighbor_ind, distance, query_ind))
+            query_ind, neighbor_ind = query_ind[order], neighbor_ind[order]
+            first = np.searchsorted(query_ind, query_ind, side='left')
+            rank = np.arange(len(query_ind)) - first
+            found_query.append(query_ind[rank < k])
+            found_neighbor.append(neighbor_ind[rank < k])
+            pending = pending[counts < k]
+            radius *= 2
+        return _group_neighbors(np.concatenate(found_query), 
+                                np.concatenate(found_neighbor), n_agents)
+
+def connectivity_factory(name, matrix=None, radius=None, k=None):
+    """
+    Create a communication graph by name.
+
+    Args:
+        name (str): "static", "radius" or "knn".
+        matrix (numpy.ndarray): Connectivity matrix for "static".
+        radius (float): Communication range for "radius".
+        k (int): Number of neighbors for "knn".
+
+    Returns:
+        An object with a neighbors(positions) method.
+
+    Raises:
+        ValueError: If the name is not recognized.
+    """
+    if name == "static":
+        return StaticConnectivity(matrix)
+    elif name == "radius":
+        return RadiusConnectivity(radius)
+    elif name == "knn":
+        return KNearestConnectivity(k)
+    else:
+        raise ValueError(f"Unrecognized connectivity: {name}")
@@ -0,0 +1,235 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+from .integrator import FixedStepIntegrator
+from .params import RobotParams
+
+class PhysicsEngine:
+    """
+    Batched PID motion of all agents stored in a StateStore.
+
+    Each step integrates every agent of one simulation (an (n_agents, dim)
+    slice of the store) or of all simulations at once (the full
+    (n_sims, n_agents, dim) arrays) with the same PID control, traction
+    force limit and velocity limit as AgentND.move. Agents without a target
+    stay where they are.
+
+    Args:
+        store (StateStore): The shared state store, updated in place.
+        params (RobotParams): Robot parameters (default RobotParams()).
+        integrator (Integrator): 
+            Integration scheme (default FixedStepIntegrator()).
+        settle_tolerance (float): 
+            Agents count as settled when both their distance to the target 
+            and their speed are below this value. run() stops early once all
+            agents have settled, or once a step leaves the state unchanged,
+            e.g. when a robot cannot overcome its traction limit and stalls
+            short of its target. 0 disables both checks (default is 1e-3).
+        decimals (int): 
+            Positions are rounded to this many decimals after every step,
+            None to disable (default is 2). Continuous integrators (see
+            Integrator.continuous) are integrated from unrounded positions
+            kept by the engine, and only the stored positions are rounded.
+            Otherwise sub-steps shorter than the rounding would be erased
+            and the robots would stall short of their targets.
+        interaction: 
+            Optional inter-robot force field with a force(positions) method,
+            e.g. a RepulsionField for collision avoidance.
+    """
+    def __init__(self, store, params=None, integrator=None, 
+                 settle_tolerance=1e-3, decimals=2, interaction=None):
+        self._store = store
+        self._params = params if params is not None else RobotParams()
+        self._integrator = (integrator if integrator is not None 
+                            else FixedStepIntegrator())
+        self._settle_tolerance = settle_tolerance
+        self._decimals = decimals
+        self._interaction = interaction
+        # Unrounded positions of continuous integrators
+        self._exact = (store.positions.copy() 
+                       if decimals is not None and self._integrator.continuous
+                       else None)
+
+    @property
+    def params(self):
+        return self._params
+
+    @property
+    def integrator(self):
+        return self._integrator
+
+    def _state(self, simulation_ind):
+        """Get the state arrays of one simulation or of all of them."""
+        store = self._store
+        ind = slice(None) if simulation_ind is None else simulation_ind
+        return (store.positions[ind], store.targets[ind], 
+                store.velocities[ind], store.errors[ind], store.integrals[ind])
+
+    def step(self, dt: float, simulation_ind=None):
+        """
+        Advance the agents by one time step.
+
+        Args:
+            dt (float): Time step (s).
+            simulation_ind (int): Simulation to advance, all if None.
+
+        Returns:
+            numpy.ndarray: View of the updated positions.
+        """
+        state = self._state(simulation_ind)
+        position, target = state[0], state[1]
+        if self._exact is not None:
+            exact = self._exact[slice(None) if simulation_ind is None 
+                                else simulation_ind]
+            # Positions set from outside (e.g. by new agents) replace the
+            # unrounded ones
+            moved = np.round(exact, self._decimals) != position
+            exact[moved] = position[moved]
+            state = (exact,) + state[1:]
+        active = ~np.isnan(target).any(axis=-1, keepdims=True)
+        external_force = None
+        if self._interaction is not None:
+            external_force = self._interaction.force(state[0])
+        self._integrator.step(state, dt, self._params, active, 
+                              external_force, simulation_ind)
+        if self._decimals is not None:
+            np.round(state[0], self._decimals, out=position)
+        return position
+
+    def settled_agents(self, simulation_ind=None, tolerance=None):
+        """
+        Check which agents have reached their targets and stopped.
+
+        Args:
+            simulation_ind (int): Simulation to check, all if None.
+            tolerance (float): 
+                Distance and speed tolerance, the settle tolerance of the
+                engine if None.
+
+        Returns:
+            numpy.ndarray: Boolean mask over the agents (agents without a
+            target count as settled once they have stopped).
+        """
+        position, target, velocity, _, _ = self._state(simulation_ind)
+        if tolerance is None:
+            tolerance = self._settle_tolerance
+        speed = np.einsum('...i,...i->...', velocity, velocity)
+        offset = np.nan_to_num(target - position, nan=0.0)
+        return ((speed <= tolerance ** 2) 
+                & (np.einsum('...i,...i->...', offset, offset) 
+                   <= tolerance ** 2))
+
+    def settled(self, simulation_ind=None):
+        """
+        Check whether all agents have reached their targets and stopped.
+
+        Args:
+            simulation_ind (int): Simulation to check, all if None.
+
+        Returns:
+            bool: True if every agent is settled (agents without a target
+            count as settled once they have stopped).
+        """
+        return bool(self.settled_agents(simulation_ind).all())
+
+    def run(self, n_steps: int, dt: float, simulation_ind=None, out=None):
+        """
+        Advance the agents by up to n_steps time steps.
+
+        Integration stops as soon as all agents have settled or the state
+        has reached a fixed point; the remaining rows of out are filled with
+        the final positions. The error integral keeps growing while a robot
+        stalls short of its target, so it is only part of the fixed point
+        when the integral gain ki is nonzero.
+
+        Args:
+            n_steps (int): Number of steps.
+            dt (float): Time step (s).
+            simulation_ind (int): Simulation to advance, all if None.
+            out (numpy.ndarray): 
+                Preallocated buffer of shape (n_steps, ...) receiving the 
+                positions after every step (optional).
+
+        Returns:
+            int: Number of steps actually integrated.
+        """
+        check = self._settle_tolerance > 0
+        state = self._state(simulation_ind)
+        position, velocity, integral = state[0], state[2], state[4]
+        # The integral only acts on the motion through ki
+        check_integral = bool(np.any(np.asarray(self._params.ki) != 0))
+        for i in range(n_steps):
+            if check:
+                if self.settled(simulation_ind):
+                    break
+                previous = (position.copy(), velocity.copy(), 
+                            integral.copy() if check_integral else None)
+            self.step(dt, simulation_ind)
+            if out is not None:
+                out[i] = position
+            if check and (np.array_equal(previous[0], position) 
+                          and np.array_equal(previous[1], velocity)
+                          and (not check_integral 
+                               or np.array_equal(previous[2], integral))):
+                # Every further step would repeat this one
+                i += 1
+                break
+        else:
+            return n_steps
+        if out is not None:
+            out[i:] = position
+        return i
+
+if __name__ == "__main__":
+    # Regression check, run with python -m modules.physics.engine: every
+    # integrator must bring a robot to its target, with and without
+    # rounding, and stop before the step budget is spent
+    from .integrator import integrators
+    from .params import RobotParams
+    from .state_store import StateStore
+    for name, integrator in integrators.items():
+        for decimals in (2, None):
+            store = StateStore(1, 1, 1)
+            store.positions[0, 0] = 0
+            store.targets[0, 0] = 5
+            engine = PhysicsEngine(store, integrator=integrator(), 
+                                   decimals=decimals)
+            n_steps = engine.run(4000, 0.1, 0)
+            error = abs(store.positions[0, 0, 0] - 5)
+            print(f"{name} (decimals={decimals}): {n_steps} steps, "
+                  f"error {error:.4f}")
+            assert n_steps < 4000 and error < 1e-2, name
+    # A robot without traction stalls short of its target: run must stop
+    # at the first step that leaves it unchanged
+    for name, integrator in integrators.items():
+        store = StateStore(1, 1, 1)
+        store.positions[0, 0] = 0
+        store.targets[0, 0] = 5
+        engine = PhysicsEngine(store, RobotParams(max_traction_force=0), 
+                               integrator())
+        n_steps = engine.run(4000, 0.1, 0)
+        print(f"{name} (stalled): {n_steps} steps")
+        assert n_steps == 1, name
@@ -0,0 +1,225 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+from abc import ABC, abstractmethod
+import threading
+import numpy as np
+
+def limit_norm(vectors, max_norm):
+    """
+    Scale vectors whose norm exceeds max_norm back onto that norm.
+
+    Args:
+        vectors (numpy.ndarray): Array of shape (..., dim).
+        max_norm: Maximum norm, scalar or broadcastable to (..., 1).
+
+    Returns:
+        numpy.ndarray: The limited vectors (a new array).
+    """
+    magnitude = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    limited = magnitude > max_norm
+    if not limited.any():
+        return vectors
+    return np.where(limited, vectors / np.where(limited, magnitude, 1.0) 
+                    * max_norm, vectors)
+
+class Integrator(ABC):
+    """
+    Base class of the motion integrators.
+
+    An integrator advances the PID-controlled motion of a batch of agents by
+    one time step, updating the state arrays in place. The arrays have shape
+    (..., dim), so the same integrator serves a single agent, a simulation
+    or a whole batch of simulations.
+
+    Attributes:
+        continuous (bool): Whether the integrator needs unrounded positions.
+            Its steps can be shorter than the rounding of the positions, so
+            PhysicsEngine integrates it from an unrounded copy and rounds
+            only the positions it outputs.
+    """
+    continuous = False
+
+    @abstractmethod
+    def step(self, state, dt, params, active, external_force=None, key=None):
+        """
+        Advance the state by one time step.
+
+        Args:
+            state (tuple): (position, target, velocity, error, integral)
+                arrays, updated in place.
+            dt (float): Time step (s).
+            params (RobotParams): Robot parameters.
+            active (numpy.ndarray): Boolean mask of shape (..., 1), True for
+                agents with a target.
+            external_force (numpy.ndarray): Optional force added to the PID
+                command before the traction limit, e.g. collision
+                avoidance. It is held constant over the step.
+            key: Identifies the batch being integrated (e.g. the simulation
+                index), for integrators that keep state between steps.
+        """
+        pass
+
+class FixedStepIntegrator(Integrator):
+    """
+    The original fixed-step scheme: a discrete PID whose derivative term is
+    the difference of successive errors, a velocity update, and a position
+    update including the 0.5 * a * dt^2 term.
+    """
+    def step(self, state, dt, params, active, external_force=None, key=None):
+        position, target, velocity, prev_error, integral = state
+        error = np.where(active, target - position, 0.0)
+        integral += error * dt
+        derivative = (error - prev_error) / dt
+        force = params.kp * error + params.ki * integral + params.kd * derivative
+        if external_force is not None:
+            force = force + external_force
+        force = limit_norm(force, params.max_traction_force)
+        acceleration = force / params.mass
+        velocity += acceleration * dt
+        velocity[...] = limit_norm(velocity, params.max_velocity)
+        position += np.where(active, velocity * dt 
+                             + 0.5 * acceleration * dt ** 2, 0.0)
+        prev_error[...] = error
+
+class SemiImplicitEulerIntegrator(Integrator):
+    """
+    Semi-implicit (symplectic) Euler: the velocity is updated first and the
+    position is advanced with the new velocity.
+    """
+    def step(self, state, dt, params, active, external_force=None, key=None):
+        position, target, velocity, prev_error, integral = state
+        error = np.where(active, target - position, 0.0)
+        integral += error * dt
+        derivative = (error - prev_error) / dt
+        force = params.kp * error + params.ki * integral + params.kd * derivative
+        if external_force is not None:
+            force = force + external_force
+        force = limit_norm(force, params.max_traction_force)
+        velocity += force / params.mass * dt
+        velocity[...] = limit_norm(velocity, params.max_velocity)
+        position += np.where(active, velocity * dt, 0.0)
+        prev_error[...] = error
+
+class AdaptiveRKIntegrator(Integrator):
+    """
+    Adaptive Runge-Kutta (Bogacki-Shampine 3(2)) integration of the
+    continuous PID dynamics.
+
+    The derivative term uses the continuous error rate (-velocity), and the
+    time step is split into sub-steps whose size is adapted to keep the
+    local error below the tolerance. One sub-step size is shared by the
+    whole batch, and the last one is kept per key (simulation) as the first
+    guess of the next step, so simulations integrated from different
+    threads do not affect each other.
+
+    Args:
+        tolerance (float): Local error tolerance (default is 1e-4).
+        min_substep (float): Smallest sub-step (s) (default is 1e-4).
+    """
+    continuous = True
+
+    def __init__(self, tolerance=1e-4, min_substep=1e-4):
+        self._tolerance = tolerance
+        self._min_substep = min_substep
+        self._substeps = {}  # key -> last sub-step size
+        self._lock = threading.Lock()
+
+    def _derivatives(self, position, velocity, integral, target, params, 
+                     active, external_force):
+        error = np.where(active, target - position, 0.0)
+        force = (params.kp * error + params.ki * integral 
+                 - params.kd * np.where(active, velocity, 0.0))
+        if external_force is not None:
+            force = force + external_force
+        force = limit_norm(force, params.max_traction_force)
+        return velocity, force / params.mass, error
+
+    @staticmethod
+    def _combine(y, h, *terms):
+        """Compute y + h * sum(c * k) for (c, k) in terms, per component."""
+        return tuple(yi + h * sum(c * k[i] for c, k in terms) 
+                     for i, yi in enumerate(y))
+
+    def step(self, state, dt, params, active, external_force=None, key=None):
+        position, target, velocity, prev_error, integral = state
+        y = (position.copy(), velocity.copy(), integral.copy())
+        with self._lock:
+            h = min(self._substeps.get(key) or dt, dt)
+        elapsed = 0.0
+        k1 = self._derivatives(*y, target, params, active, external_force)
+        while elapsed < dt - 1e-12:
+            h = min(h, dt - elapsed)
+            k2 = self._derivatives(*self._combine(y, h, (0.5, k1)), 
+                                   target, params, active, external_force)
+            k3 = self._derivatives(*self._combine(y, h, (0.75, k2)), 
+                                   target, params, active, external_force)
+            y_new = self._combine(y, h, (2 / 9, k1), (1 / 3, k2), (4 / 9, k3))
+            k4 = self._derivatives(*y_new, target, params, active, 
+                                   external_force)
+            y_low = self._combine(y, h, (7 / 24, k1), (1 / 4, k2), 
+                                  (1 / 3, k3), (1 / 8, k4))
+            err = max(float(np.max(np.abs(a - b), initial=0.0)) 
+                      for a, b in zip(y_new, y_low))
+            if err <= self._tolerance or h <= self._min_substep:
+                # Accept the sub-step and apply the velocity limit
+                elapsed += h
+                y = (y_new[0], limit_norm(y_new[1], params.max_velocity),
+                     y_new[2])
+                k1 = self._derivatives(*y, target, params, active, 
+                                       external_force)
+            scale = 5.0 if err == 0 else min(5.0, max(
+                0.2, 0.9 * (self._tolerance / err) ** (1 / 3)))
+            h = max(h * scale, self._min_substep)
+        with self._lock:
+            self._substeps[key] = h
+        position[...] = np.where(active, y[0], position)
+        velocity[...] = y[1]
+        integral[...] = y[2]
+        prev_error[...] = np.where(active, target - position, 0.0)
+
+integrators = {
+    "fixed": FixedStepIntegrator,
+    "semi_implicit": SemiImplicitEulerIntegrator,
+    "rk": AdaptiveRKIntegrator,
+}
+
+def integrator_factory(name):
+    """
+    Create an integrator by name.
+
+    Args:
+        name (str): "fixed", "semi_implicit" or "rk".
+
+    Returns:
+        Integrator: A new integrator instance.
+
+    Raises:
+        ValueError: If the name is not recognized.
+    """
+    if name not in integrators:
+        raise ValueError(f"Unrecognized integrator: {name}, expected one of "
+                         f"{list(integrators)}")
+    return integrators[name]()
@@ -0,0 +1,49 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+class RobotParams:
+    """
+    Physical and controller parameters of the robots.
+
+    Every parameter may be a scalar or an array broadcastable against the
+    (..., n_agents, dim) state arrays, e.g. to give each simulation of a
+    batch its own controller gains.
+
+    Args:
+        kp: Proportional gain of the PID controller.
+        ki: Integral gain of the PID controller.
+        kd: Derivative gain of the PID controller.
+        max_traction_force: Maximum traction force of the robot (N).
+        max_velocity: Maximum velocity of the robot (m/s).
+        mass: Mass of the robot (kg).
+    """
+    def __init__(self, kp=1.2, ki=0.0, kd=6.0, max_traction_force=50,
+                 max_velocity=3, mass=15):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.max_traction_force = max_traction_force
+        self.max_velocity = max_velocity
+        self.mass = mass
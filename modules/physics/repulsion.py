@@ -0,0 +1,81 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+from .spatial_hash import SpatialHash
+
+class RepulsionField:
+    """
+    Short-range repulsion between robots for collision avoidance.
+
+    Two robots closer than `radius` push each other apart with a force that
+    grows linearly from 0 at `radius` to `gain` at contact. Neighbors are
+    found with a SpatialHash rebuilt on every call, so the cost is linear in
+    the number of robots.
+
+    Args:
+        radius (float): Interaction radius (m).
+        gain (float): Repulsive force at zero distance (N).
+    """
+    def __init__(self, radius, gain=50.0):
+        if radius <= 0:
+            raise ValueError(f"radius must be positive, got: {radius}")
+        self._radius = radius
+        self._gain = gain
+
+    @property
+    def radius(self):
+        return self._radius
+
+    def force(self, positions):
+        """
+        Compute the repulsive force on every robot.
+
+        Args:
+            positions (numpy.ndarray): Array of shape (..., n_agents, dim).
+                Robots only interact with robots sharing the leading
+                indices, i.e. of the same simulation.
+
+        Returns:
+            numpy.ndarray: Forces with the shape of positions.
+        """
+        shape = positions.shape
+        n_agents, dim = shape[-2], shape[-1]
+        points = positions.reshape(-1, dim)
+        groups = np.arange(len(points)) // n_agents
+        i, j, distance = SpatialHash(points, self._radius, 
+                                     groups=groups).query(self._radius)
+        force = np.zeros_like(points, dtype=np.float64)
+        # Coincident robots have no direction to separate along
+        apart = distance > 1e-9
+        i, j, distance = i[apart], j[apart], distance[apart]
+        if len(i):
+            magnitude = self._gain * (1.0 - distance / self._radius)
+            push = ((points[i] - points[j]) 
+                    * (magnitude / distance)[:, None])
+            for d in range(dim):
+                force[:, d] = np.bincount(i, weights=push[:, d], 
+                                          minlength=len(points))
+        return force.reshape(shape)
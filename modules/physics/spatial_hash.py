@@ -0,0 +1,179 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import itertools
+import math
+import numpy as np
+
+class SpatialHash:
+    """
+    A uniform-grid spatial hash for fixed-radius neighbor queries.
+
+    Points are bucketed into cubic cells by sorting their cell keys once.
+    A query only visits the cells around each query point, so finding all
+    neighbors within a radius costs O(N + number of pairs) instead of the
+    O(N^2) of a dense distance matrix.
+
+    Cell keys are int64 indices into the padded grid of occupied cells. A
+    grid with 2**63 cells or more (many dimensions with cells much smaller
+    than the spread of the points) would overflow them, so it falls back to
+    a dict of tuple keys, which gives the same neighbors more slowly.
+
+    Args:
+        points (numpy.ndarray): Array of shape (M, dim).
+        cell_size (float): Edge length of the grid cells.
+        groups (numpy.ndarray): 
+            Optional integer group of every point, shape (M,). Points only
+            see neighbors of their own group, e.g. agents of the same
+            simulation.
+    """
+    def __init__(self, points, cell_size, groups=None):
+        if cell_size <= 0:
+            raise ValueError(f"cell_size must be positive, got: {cell_size}")
+        self._points = np.asarray(points, dtype=np.float64)
+        self._cell_size = float(cell_size)
+        cells = np.floor(self._points / self._cell_size).astype(np.int64)
+        if groups is not None:
+            cells = np.column_stack([np.asarray(groups, dtype=np.int64), 
+                                     cells])
+        self._has_groups = groups is not None
+        self._cells = cells
+        self._origin = cells.min(axis=0) if len(cells) else 0
+        self._rings = None
+        self._buckets = None  # Tuple key -> point indices, see _build
+
+    @property
+    def points(self):
+        return self._points
+
+    def _build(self, rings):
+        """Sort the cell keys, with room for `rings` cells of padding."""
+        cells = self._cells - self._origin + rings
+        extent = cells.max(axis=0) + 1 + rings if len(cells) else 1
+        if self._has_groups:
+            cells[:, 0] -= rings
+            extent[0] -= 2 * rings
+        self._rings = rings
+        if math.prod(int(e) for e in np.atleast_1d(extent)) >= 2 ** 63:
+            # The int64 keys would overflow and distinct cells share a key
+            self._buckets = {}
+            for ind, cell in enumerate(map(tuple, self._cells.tolist())):
+                self._buckets.setdefault(cell, []).append(ind)
+            return
+        self._buckets = None
+        # Row-major multipliers of the (padded) cell grid
+        self._multipliers = np.cumprod(
+            np.concatenate([[1], extent[::-1][:-1]]))[::-1].astype(np.int64)
+        self._keys = cells @ self._multipliers
+        self._order = np.argsort(self._keys, kind='stable')
+        self._sorted_keys = self._keys[self._order]
+
+    def query(self, radius, queries=None):
+        """
+        Find all neighbors within a radius.
+
+        Args:
+            radius (float): Search radius.
+            queries (numpy.ndarray): 
+                Indices of the query points (default is all points).
+
+        Returns:
+            tuple: (query_ind, neighbor_ind, distance) arrays listing every
+            pair with distance < radius. A point is never its own neighbor.
+        """
+        rings = max(1, int(np.ceil(radius / self._cell_size)))
+        if self._rings != rings:
+            self._build(rings)
+        if queries is None:
+            queries = np.arange(len(self._points))
+        queries = np.asarray(queries, dtype=np.int64)
+        dim = self._points.shape[1]
+        offsets = np.array(list(itertools.product(range(-rings, rings + 1), 
+                                                  repeat=dim)), 
+                           dtype=np.int64)
+        if self._has_groups:
+            offsets = np.column_stack([np.zeros(len(offsets), np.int64), 
+                                       offsets])
+        if self._buckets is not None:
+            query_ind, neighbor_ind = self._bucket_pairs(queries, offsets)
+        else:
+            query_ind, neighbor_ind = self._key_pairs(queries, offsets)
+        distance = np.linalg.norm(self._points[query_ind] 
+                                  - self._points[neighbor_ind], axis=-1)
+        keep = (distance < radius) & (query_ind != neighbor_ind)
+        return query_ind[keep], neighbor_ind[keep], distance[keep]
+
+    def _key_pairs(self, queries, offsets):
+        """
+        List the candidate pairs of the queries from the sorted int64 keys.
+
+        Args:
+            queries (numpy.ndarray): Indices of the query points.
+            offsets (numpy.ndarray): Cell offsets to visit, shape (K, dim).
+
+        Returns:
+            tuple: (query_ind, neighbor_ind) arrays of every point in the
+            visited cells.
+        """
+        offset_keys = offsets @ self._multipliers
+        query_keys = self._keys[queries]
+        query_ind, neighbor_ind = [], []
+        for offset_key in offset_keys:
+            keys = query_keys + offset_key
+            lo = np.searchsorted(self._sorted_keys, keys, side='left')
+            hi = np.searchsorted(self._sorted_keys, keys, side='right')
+            counts = hi - lo
+            total = counts.sum()
+            if total == 0:
+                continue
+            # Expand the [lo, hi) ranges without a Python loop
+            starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+            query_ind.append(np.repeat(queries, counts))
+            neighbor_ind.append(self._order[starts + np.arange(total)])
+        if not query_ind:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(query_ind), np.concatenate(neighbor_ind)
+
+    def _bucket_pairs(self, queries, offsets):
+        """
+        List the candidate pairs of the queries from the tuple keys.
+
+        Args:
+            queries (numpy.ndarray): Indices of the query points.
+            offsets (numpy.ndarray): Cell offsets to visit, shape (K, dim).
+
+        Returns:
+            tuple: (query_ind, neighbor_ind) arrays of every point in the
+            visited cells.
+        """
+        query_ind, neighbor_ind = [], []
+        for query in queries.tolist():
+            for cell in map(tuple, (self._cells[query] + offsets).tolist()):
+                neighbors = self._buckets.get(cell, ())
+                query_ind.extend([query] * len(neighbors))
+                neighbor_ind.extend(neighbors)
+        return (np.array(query_ind, dtype=np.int64), 
+                np.array(neighbor_ind, dtype=np.int64))
@@ -0,0 +1,108 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import numpy as np
+
+class StateStore:
+    """
+    Array-backed storage for the kinematic state of every agent.
+
+    Positions, targets and velocities of all agents in all simulations live in
+    (n_sims, n_agents, dim) arrays, together with the controller state (last
+    error and error integral). Agents do not own copies of their state; they
+    hold views into these arrays, so a whole simulation (or the whole
+    experiment) can be read or updated with a single array operation.
+
+    Args:
+        n_sims (int): Number of independent simulations.
+        n_agents (int): Number of agents per simulation.
+        dim (int): Dimension of the space the agents move in.
+        dtype: NumPy dtype of the state arrays (default is float64).
+
+    Note:
+        Targets are initialized to NaN, meaning "no target set yet".
+    """
+    def __init__(self, n_sims: int, n_agents: int, dim: int,
+                 dtype=np.float64):
+        shape = (n_sims, n_agents, dim)
+        self._positions = np.zeros(shape, dtype=dtype)
+        self._targets = np.full(shape, np.nan, dtype=dtype)
+        self._velocities = np.zeros(shape, dtype=dtype)
+        self._errors = np.zeros(shape, dtype=dtype)
+        self._integrals = np.zeros(shape, dtype=dtype)
+
+    @property
+    def shape(self):
+        return self._positions.shape
+
+    @property
+    def n_sims(self):
+        return self._positions.shape[0]
+
+    @property
+    def n_agents(self):
+        return self._positions.shape[1]
+
+    @property
+    def dim(self):
+        return self._positions.shape[2]
+
+    @property
+    def positions(self):
+        return self._positions
+
+    @property
+    def targets(self):
+        return self._targets
+
+    @property
+    def velocities(self):
+        return self._velocities
+
+    @property
+    def errors(self):
+        return self._errors
+
+    @property
+    def integrals(self):
+        return self._integrals
+
+    def view(self, simulation_ind: int, agent_ind: int):
+        """
+        Get the state views of a single agent.
+
+        Args:
+            simulation_ind (int): Index of the simulation.
+            agent_ind (int): Index of the agent within the simulation.
+
+        Returns:
+            tuple: (position, target, velocity, error, integral) views of
+            shape (dim,). Writing into them in place updates the store.
+        """
+        return (self._positions[simulation_ind, agent_ind],
+                self._targets[simulation_ind, agent_ind],
+                self._velocities[simulation_ind, agent_ind],
+                self._errors[simulation_ind, agent_ind],
+                self._integrals[simulation_ind, agent_ind])
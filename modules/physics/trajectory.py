@@ -0,0 +1,263 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import json
+import os
+import pickle
+import threading
+
+import numpy as np
+
+POSITION_FILE = 'trajectory_pos.npy'
+TARGET_FILE = 'trajectory_target.npy'
+TARGET_STEP_FILE = 'trajectory_target_step.npy'
+META_FILE = 'trajectory.json'
+
+class TrajectoryBuffer:
+    """
+    Preallocated storage for the trajectories of all agents.
+
+    Positions after every physics step are kept in one
+    (n_sims, n_agents, n_rounds * steps_per_round, dim) block and the target
+    of every round in one (n_sims, n_agents, n_rounds, dim) block, together
+    with the step at which each target was set. Unwritten entries are NaN
+    (-1 for the steps). When an output directory is given, both blocks are
+    .npy memory maps in that directory, so the data reaches the disk as
+    rounds complete instead of being held in memory and pickled at the end.
+
+    Args:
+        n_sims (int): Number of simulations.
+        n_agents (int): Number of agents per simulation.
+        n_rounds (int): Number of rounds per simulation.
+        steps_per_round (int): Physics steps per round.
+        dim (int): Dimension of the space.
+        dt (float): Physics time step (s), stored with the data.
+        output_dir (str): Directory of the memory maps, in memory if None.
+        dtype: NumPy dtype of the buffers (default is float64).
+        n_steps (int): 
+            Capacity of the position block in steps, for simulations that
+            are not split into rounds of equal length (default is 
+            n_rounds * steps_per_round).
+    """
+    def __init__(self, n_sims, n_agents, n_rounds, steps_per_round, dim, 
+                 dt, output_dir=None, dtype=np.float64, n_steps=None):
+        self._steps_per_round = steps_per_round
+        self._dt = dt
+        self._output_dir = output_dir
+        if n_steps is None:
+            n_steps = n_rounds * steps_per_round
+        self._n_steps = n_steps
+        pos_shape = (n_sims, n_agents, n_steps, dim)
+        target_shape = (n_sims, n_agents, n_rounds, dim)
+        if output_dir:
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+            self._positions = np.lib.format.open_memmap(
+                os.path.join(output_dir, POSITION_FILE), mode='w+', 
+                dtype=dtype, shape=pos_shape)
+            self._targets = np.lib.format.open_memmap(
+                os.path.join(output_dir, TARGET_FILE), mode='w+', 
+                dtype=dtype, shape=target_shape)
+            self._positions[...] = np.nan
+            self._targets[...] = np.nan
+        else:
+            self._positions = np.full(pos_shape, np.nan, dtype=dtype)
+            self._targets = np.full(target_shape, np.nan, dtype=dtype)
+        self._target_steps = np.full((n_sims, n_agents, n_rounds), -1, 
+                                     dtype=np.int64)
+        self._n_rounds_done = np.zeros(n_sims, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @property
+    def positions(self):
+        return self._positions
+
+    @property
+    def targets(self):
+        return self._targets
+
+    @property
+    def target_steps(self):
+        return self._target_steps
+
+    @property
+    def steps_per_round(self):
+        return self._steps_per_round
+
+    @property
+    def n_steps(self):
+        return self._n_steps
+
+    def round_steps(self, simulation_ind, round):
+        """
+        Get the slice of the position block for one round.
+
+        Args:
+            simulation_ind (int): Index of the simulation, all if None.
+            round (int): Index of the round.
+
+        Returns:
+            numpy.ndarray: View of shape (steps_per_round, n_agents, dim),
+            or (steps_per_round, n_sims, n_agents, dim) for all simulations,
+            suitable as the 'out' buffer of PhysicsEngine.run.
+        """
+        start = round * self._steps_per_round
+        stop = start + self._steps_per_round
+        if simulation_ind is None:
+            return self._positions[:, :, start:stop].transpose(2, 0, 1, 3)
+        return self._positions[simulation_ind, :, 
+                               start:stop].transpose(1, 0, 2)
+
+    def end_round(self, simulation_ind, round, targets):
+        """
+        Record the targets of a finished round and flush it to disk.
+
+        Args:
+            simulation_ind (int): Index of the simulation, all if None.
+            round (int): Index of the round.
+            targets (numpy.ndarray): Targets of shape (n_agents, dim), or
+                (n_sims, n_agents, dim) for all simulations.
+        """
+        ind = slice(None) if simulation_ind is None else simulation_ind
+        self._targets[ind, :, round] = targets
+        self._target_steps[ind, :, round] = round * self._steps_per_round
+        self._n_rounds_done[ind] = round + 1
+        self.flush()
+
+    def steps(self, simulation_ind, start, stop=None):
+        """
+        Get a range of steps of the position block.
+
+        Args:
+            simulation_ind (int): Index of the simulation.
+            start (int): First step.
+            stop (int): End of the range (default is the capacity).
+
+        Returns:
+            numpy.ndarray: View of shape (stop - start, n_agents, dim).
+        """
+        return self._positions[simulation_ind, :, start:stop].transpose(1, 0, 2)
+
+    def set_target(self, simulation_ind, agent_ind, round, target, step):
+        """
+        Record the target one agent received, independently of the others.
+
+        Args:
+            simulation_ind (int): Index of the simulation.
+            agent_ind (int): Index of the agent.
+            round (int): Index of the agent's request.
+            target: Target of shape (dim,).
+            step (int): Step at which the target was set.
+        """
+        self._targets[simulation_ind, agent_ind, round] = target
+        self._target_steps[simulation_ind, agent_ind, round] = step
+        self._n_rounds_done[simulation_ind] = max(
+            self._n_rounds_done[simulation_ind], round + 1)
+
+    def flush(self):
+        """Write the memory maps to disk and update the metadata file."""
+        if not self._output_dir:
+            return
+        with self._lock:
+            self._positions.flush()
+            self._targets.flush()
+            self._write_meta(self._output_dir)
+
+    def _write_meta(self, output_dir):
+        np.save(os.path.join(output_dir, TARGET_STEP_FILE), 
+                self._target_steps)
+        meta = {"dt": self._dt, "steps_per_round": self._steps_per_round,
+                "n_rounds_done": self._n_rounds_done.tolist()}
+        with open(os.path.join(output_dir, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+    def save(self, output_dir):
+        """
+        Make sure the trajectories are stored in output_dir.
+
+        Memory-mapped buffers are flushed in place; in-memory buffers (or
+        buffers mapped elsewhere) are written as .npy files.
+
+        Args:
+            output_dir (str): Directory to save the trajectories to.
+        """
+        if self._output_dir and os.path.abspath(output_dir) == (
+                os.path.abspath(self._output_dir)):
+            self.flush()
+            return
+        with self._lock:
+            np.save(os.path.join(output_dir, POSITION_FILE), self._positions)
+            np.save(os.path.join(output_dir, TARGET_FILE), self._targets)
+            self._write_meta(output_dir)
+
+def load_trajectory(path):
+    """
+    Load trajectories written by TrajectoryBuffer, or a legacy trajectory.p.
+
+    Args:
+        path (str): Output directory, one of its trajectory files, or the
+            path to a legacy trajectory.p pickle.
+
+    Returns:
+        dict: {"pos": (n_sims, n_agents, steps, dim) array, "target":
+        (n_sims, n_agents, rounds, dim) array, "dt": float,
+        "steps_per_round": int, "target_step": (n_sims, n_agents, rounds)
+        array of the step at which every target was set}. The arrays of .npy
+        files are memory mapped.
+    """
+    if path.endswith('.p'):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        sims = sorted(data['pos'])
+        data = {"pos": np.array([data['pos'][k] for k in sims], dtype=float),
+                "target": np.array([data['target'][k] for k in sims], 
+                                   dtype=float),
+                "dt": data.get('dt', 0.1),
+                "steps_per_round": data.get('steps_per_round', 20)}
+        data["target_step"] = _round_steps(data)
+        return data
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    meta = {"dt": 0.1, "steps_per_round": 20}
+    meta_file = os.path.join(directory, META_FILE)
+    if os.path.exists(meta_file):
+        with open(meta_file) as f:
+            meta.update(json.load(f))
+    data = {"pos": np.load(os.path.join(directory, POSITION_FILE), 
+                           mmap_mode='r'),
+            "target": np.load(os.path.join(directory, TARGET_FILE), 
+                              mmap_mode='r'),
+            "dt": meta["dt"], "steps_per_round": meta["steps_per_round"]}
+    target_step_file = os.path.join(directory, TARGET_STEP_FILE)
+    if os.path.exists(target_step_file):
+        data["target_step"] = np.load(target_step_file)
+    else:
+        data["target_step"] = _round_steps(data)
+    return data
+
+def _round_steps(data):
+    """Target steps of trajectories recorded round by round."""
+    target = data["target"]
+    steps = np.arange(target.shape[2]) * data["steps_per_round"]
+    return np.broadcast_to(steps, target.shape[:3]).copy()
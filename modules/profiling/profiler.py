@@ -0,0 +1,345 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+PSTATS_FILE = 'profile.pstats'
+REPORT_FILE = 'profile.txt'
+STACKS_FILE = 'stacks.collapsed'
+MEMORY_FILE = 'memory.txt'
+
+class ThreadProfiler:
+    """
+    Profiler of every thread of the process, and of plotting jobs.
+
+    Three profilers run together:
+        - cProfile, in the main thread and in every thread started while
+          profiling (installed with threading.setprofile), so the agent
+          and simulation threads of the thread pools are profiled too.
+          The per-thread profiles are merged into one pstats file.
+        - A sampler that records the stacks of all threads every interval,
+          written as collapsed stacks for flame graphs (flamegraph.pl,
+          speedscope). Pool threads are grouped by pool.
+        - Optionally tracemalloc, with a snapshot at the end of every 
+          round (see snapshot).
+    Jobs of the figure engine's process pool are profiled in the workers
+    (see task_wrapper) and merged into the pstats file.
+
+    Attributes:
+        _output_dir (str): Directory of the reports.
+        _interval (float): Sampling interval (s).
+        _memory (bool): Whether tracemalloc snapshots are taken.
+        _profiles (list): cProfile.Profile of every profiled thread.
+        _stacks (Counter): Number of samples of every collapsed stack.
+        _snapshots (list): (label, time, snapshot) of every round.
+        _task_dir (str): Directory of the profiles of plotting jobs.
+    """
+    def __init__(self, output_dir, interval=0.005, memory=False):
+        """
+        Initialize the profiler, without starting it.
+
+        Args:
+            output_dir (str): Directory of the reports.
+            interval (float): Sampling interval (s).
+            memory (bool): Whether to take tracemalloc snapshots per round.
+        """
+        self._output_dir = output_dir
+        self._interval = interval
+        self._memory = memory
+        self._profiles = []
+        self._stacks = Counter()
+        self._snapshots = []
+        self._labels = set()
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._sampler = None
+        self._task_dir = None
+        self._deterministic = True
+
+    @property
+    def task_dir(self):
+        return self._task_dir
+
+    def _profile_thread(self, frame, event, arg):
+        """
+        Start cProfile in a new thread (threading.setprofile hook).
+        """
+        sys.setprofile(None)
+        if not self._running.is_set() or not self._deterministic:
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # A single cProfile can be active at a time (Python 3.12+)
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def _sample(self):
+        """
+        Record the stacks of all threads until the profiler stops.
+        """
+        own = threading.get_ident()
+        while self._running.is_set():
+            names = {thread.ident: thread.name 
+                     for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            samples = []
+            for tid, frame in frames.items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} "
+                                 f"({os.path.basename(code.co_filename)}:"
+                                 f"{code.co_firstlineno})")
+                    frame = frame.f_back
+                # Threads of a pool share one root, e.g. ThreadPoolExecutor
+                group = re.sub(r'[-_]\d+', '', names.get(tid, 'Thread'))
+                samples.append(';'.join([group] + stack[::-1]))
+            del frames
+            with self._lock:
+                self._stacks.update(samples)
+            time.sleep(self._interval)
+
+    def start(self):
+        """
+        Start profiling.
+
+        Returns:
+            ThreadProfiler: The profiler itself.
+        """
+        global _profiler
+        os.makedirs(self._output_dir, exist_ok=True)
+        self._task_dir = tempfile.mkdtemp(prefix='profile_tasks_')
+        self._running.set()
+        if self._memory:
+            tracemalloc.start()
+        # The sampler starts before the hook, so it is not profiled itself
+        self._sampler = threading.Thread(target=self._sample, 
+                                         name='profile-sampler', daemon=True)
+        self._sampler.start()
+        main = cProfile.Profile()
+        try:
+            main.enable()
+            self._profiles.append(main)
+        except ValueError:
+            print("cProfile is already active, only sampling the threads")
+            self._deterministic = False
+        threading.setprofile(self._profile_thread)
+        _profiler = self
+        return self
+
+    def stop(self):
+        """
+        Stop profiling and write the reports.
+
+        Returns:
+            list: Paths of the reports.
+        """
+        global _profiler
+        _profiler = None
+        threading.setprofile(None)
+        if self._profiles and self._deterministic:
+            # The main profile first: disabling the others acts on this
+            # thread
+            self._profiles[0].disable()
+        self._running.clear()
+        self._sampler.join()
+        paths = [self._write_pstats(), self._write_stacks()]
+        if self._memory:
+            paths.append(self._write_memory())
+            tracemalloc.stop()
+        for name in os.listdir(self._task_dir):
+            os.remove(os.path.join(self._task_dir, name))
+        os.rmdir(self._task_dir)
+        self._task_dir = None
+        return [path for path in paths if path is not None]
+
+    def snapshot(self, label):
+        """
+        Take a tracemalloc snapshot, once per label.
+
+        Args:
+            label (str): Label of the snapshot, e.g. the round.
+        """
+        if not self._memory:
+            return
+        with self._lock:
+            if label in self._labels:
+                return
+            self._labels.add(label)
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self._snapshots.append((label, current, peak, snapshot))
+
+    def _write_pstats(self):
+        """Merge the thread and job profiles into one pstats file."""
+        stats = None
+        with self._lock:
+            profiles = list(self._profiles)
+        sources = profiles + [os.path.join(self._task_dir, name) 
+                              for name in sorted(os.listdir(self._task_dir))]
+        for source in sources:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(source)
+                else:
+                    stats.add(source)
+            except (TypeError, ValueError, OSError, EOFError):
+                # Threads that never ran Python code have no stats
+                continue
+        if stats is None:
+            return None
+        path = os.path.join(self._output_dir, PSTATS_FILE)
+        stats.dump_stats(path)
+        report = io.StringIO()
+        stats.stream = report
+        print(f"{len(profiles)} threads and "
+              f"{len(sources) - len(profiles)} plotting jobs profiled\n", 
+              file=report)
+        stats.sort_stats('tottime').print_stats(40)
+        stats.sort_stats('cumulative').print_stats(40)
+        with open(os.path.join(self._output_dir, REPORT_FILE), 'w') as f:
+            f.write(report.getvalue())
+        return path
+
+    def _write_stacks(self):
+        """Write the sampled stacks in the collapsed format."""
+        path = os.path.join(self._output_dir, STACKS_FILE)
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        with open(path, 'w') as f:
+            for stack, count in stacks:
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def _write_memory(self):
+        """Write the traced memory per round and its largest growths."""
+        path = os.path.join(self._output_dir, MEMORY_FILE)
+        with self._lock:
+            snapshots = list(self._snapshots)
+        with open(path, 'w') as f:
+            previous = None
+            for label, current, peak, snapshot in snapshots:
+                f.write(f"{label}: {current / 2 ** 20:.2f} MiB traced, "
+                        f"peak {peak / 2 ** 20:.2f} MiB\n")
+                if previous is None:
+                    top = snapshot.statistics('lineno')[:10]
+                else:
+                    top = snapshot.compare_to(previous, 'lineno')[:10]
+                for stat in top:
+                    f.write(f"    {stat}\n")
+                previous = snapshot
+        return path
+
+# The running profiler of this process, None when not profiling
+_profiler = None
+
+def start(output_dir, interval=0.005, memory=False):
+    """
+    Start profiling all threads of this process.
+
+    Args:
+        output_dir (str): Directory of the reports.
+        interval (float): Sampling interval of the stacks (s).
+        memory (bool): Whether to take tracemalloc snapshots per round.
+
+    Returns:
+        ThreadProfiler: The running profiler.
+    """
+    return ThreadProfiler(output_dir, interval, memory).start()
+
+def stop():
+    """
+    Stop profiling and write the reports, if profiling.
+
+    Returns:
+        list: Paths of the reports.
+    """
+    if _profiler is None:
+        return []
+    paths = _profiler.stop()
+    print(f"Profile written to {', '.join(paths)}")
+    return paths
+
+def snapshot(label):
+    """
+    Take a tracemalloc snapshot, if profiling memory.
+
+    Args:
+        label (str): Label of the snapshot; only the first snapshot of a
+            label is kept.
+    """
+    if _profiler is not None:
+        _profiler.snapshot(label)
+
+def profile_task(task_dir, fn, *args, **kwargs):
+    """
+    Run a job in a worker process under cProfile.
+
+    Args:
+        task_dir (str): Directory to dump the profile of the job to.
+        fn (callable): The job.
+        args, kwargs: Its arguments.
+
+    Returns:
+        The result of the job.
+    """
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(fn, *args, **kwargs)
+    finally:
+        profile.dump_stats(os.path.join(
+            task_dir, f"task_{os.getpid()}_{uuid.uuid4().hex}.prof"))
+
+def task_wrapper(fn, args):
+    """
+    Wrap a job submitted to a process pool so that it is profiled.
+
+    Args:
+        fn (callable): Module-level job function.
+        args (tuple): Its positional arguments.
+
+    Returns:
+        tuple: (fn, args) to submit, unchanged when not profiling.
+    """
+    if _profiler is None or _profiler.task_dir is None:
+        return fn, args
+    return profile_task, (_profiler.task_dir, fn) + tuple(args)
@@ -0,0 +1,280 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+class Tracer:
+    """
+    Recorder of timed spans, exported in the Chrome trace event format.
+
+    Every span is a complete ("X") event on the thread that ran it, so
+    nested spans of the simulation, round and agent threads appear as
+    stacked bars per thread in chrome://tracing or ui.perfetto.dev. Waits
+    that belong to no thread, such as the time a task spends queued in an
+    executor, are async ("b"/"e") events shown on tracks of their own.
+
+    Attributes:
+        _events (list): Recorded events.
+        _threads (dict): Name of every thread that recorded an event.
+        _start (int): Origin of the timestamps (perf_counter_ns).
+        _lock (threading.Lock): Lock protecting the events.
+    """
+    def __init__(self):
+        self._events = []
+        self._threads = {}
+        self._start = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._ids = itertools.count()  # Ids of the async events
+        self._lock = threading.Lock()
+
+    def _timestamp(self, ns):
+        """Convert a perf_counter_ns time to trace microseconds."""
+        return (ns - self._start) / 1000
+
+    def add(self, name, category, start_ns, end_ns, args=None, tid=None):
+        """
+        Record a span.
+
+        Args:
+            name (str): Name of the span.
+            category (str): Category of the span.
+            start_ns (int): Start (perf_counter_ns).
+            end_ns (int): End (perf_counter_ns).
+            args (dict): Arguments shown with the span.
+            tid (int): Thread of the span (default is the current thread).
+        """
+        thread = threading.current_thread()
+        tid = thread.ident if tid is None else tid
+        event = {"name": name, "cat": category, "ph": "X", 
+                 "ts": self._timestamp(start_ns), 
+                 "dur": (end_ns - start_ns) / 1000,
+                 "pid": self._pid, "tid": tid}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._threads.setdefault(tid, thread.name)
+            self._events.append(event)
+
+    def add_async(self, name, category, start_ns, end_ns, args=None):
+        """
+        Record a span that does not belong to a thread.
+
+        The span is a pair of async begin/end events with an id of its 
+        own, so overlapping spans do not nest into the thread spans.
+
+        Args:
+            name (str): Name of the span.
+            category (str): Category of the span.
+            start_ns (int): Start (perf_counter_ns).
+            end_ns (int): End (perf_counter_ns).
+            args (dict): Arguments shown with the span.
+        """
+        tid = threading.current_thread().ident
+        with self._lock:
+            event_id = next(self._ids)
+        begin = {"name": name, "cat": category, "ph": "b", "id": event_id,
+                 "ts": self._timestamp(start_ns), "pid": self._pid, 
+                 "tid": tid}
+        if args:
+            begin["args"] = args
+        end = {"name": name, "cat": category, "ph": "e", "id": event_id,
+               "ts": self._timestamp(end_ns), "pid": self._pid, "tid": tid}
+        with self._lock:
+            self._events.extend((begin, end))
+
+    def instant(self, name, category="", **args):
+        """
+        Record an instant event on the current thread.
+
+        Args:
+            name (str): Name of the event.
+            category (str): Category of the event.
+            args: Arguments shown with the event.
+        """
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "i", "s": "t",
+                 "ts": self._timestamp(time.perf_counter_ns()),
+                 "pid": self._pid, "tid": thread.ident}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name, category="", args=None):
+        """
+        Time the body of a with statement as a span.
+
+        The body can add arguments to the yielded dict; an exception raised
+        by the body is recorded in its "error" argument.
+
+        Args:
+            name (str): Name of the span.
+            category (str): Category of the span.
+            args (dict): Arguments shown with the span.
+
+        Yields:
+            dict: The arguments of the span.
+        """
+        args = {} if args is None else args
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = repr(e)[:200]
+            raise
+        finally:
+            self.add(name, category, start, time.perf_counter_ns(), args)
+
+    def to_dict(self):
+        """
+        Get the trace in the Chrome trace event format.
+
+        Returns:
+            dict: {"traceEvents": [...], "displayTimeUnit": "ms"}.
+        """
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": self._pid, 
+                     "tid": tid, "args": {"name": name}}
+                    for tid, name in threads.items()]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def save(self, filename):
+        """
+        Write the trace to a JSON file.
+
+        Args:
+            filename (str): Path of the trace file.
+        """
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+
+# The tracer of this process, None while tracing is disabled
+_tracer = None
+
+def enable():
+    """
+    Start tracing, discarding any previous trace.
+
+    Returns:
+        Tracer: The tracer of this process.
+    """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+def disable():
+    """Stop tracing."""
+    global _tracer
+    _tracer = None
+
+def enabled():
+    return _tracer is not None
+
+def span(name, category="", **args):
+    """
+    Time the body of a with statement, if tracing is enabled.
+
+    Args:
+        name (str): Name of the span.
+        category (str): Category of the span.
+        args: Arguments shown with the span.
+
+    Returns:
+        A context manager yielding the arguments of the span, to which the
+        body can add; it records nothing while tracing is disabled.
+    """
+    if _tracer is None:
+        return nullcontext(args)
+    return _tracer.span(name, category, args)
+
+def instant(name, category="", **args):
+    """
+    Record an instant event, if tracing is enabled.
+
+    Args:
+        name (str): Name of the event.
+        category (str): Category of the event.
+        args: Arguments shown with the event.
+    """
+    if _tracer is not None:
+        _tracer.instant(name, category, **args)
+
+def wrap(fn, name, category="", **args):
+    """
+    Trace a callable submitted to an executor.
+
+    The wrapped callable records the time from the call to wrap until it
+    starts running as an async "queue" span (see Tracer.add_async), and its
+    own run as a span on the thread that runs it.
+
+    Args:
+        fn (callable): The callable.
+        name (str): Name of the span of the run.
+        category (str): Category of the spans.
+        args: Arguments shown with the spans.
+
+    Returns:
+        callable: The wrapped callable, or fn itself while tracing is 
+        disabled.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return fn
+    submitted = time.perf_counter_ns()
+
+    def traced(*fn_args, **fn_kwargs):
+        tracer.add_async("queue", category, submitted, 
+                         time.perf_counter_ns(), dict(args))
+        with tracer.span(name, category, dict(args)):
+            return fn(*fn_args, **fn_kwargs)
+    return traced
+
+def save(filename):
+    """
+    Write the trace of this process, if tracing is enabled.
+
+    Args:
+        filename (str): Path of the trace file.
+
+    Returns:
+        bool: Whether a trace was written.
+    """
+    if _tracer is None:
+        return False
+    _tracer.save(filename)
+    print(f"Trace written to {filename}, open it in ui.perfetto.dev or "
+          "chrome://tracing")
+    return True
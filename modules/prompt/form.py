@@ -29,3 +29,7 @@ In the 'Reasoning' section, it is your thought process, while the 'position' sec
 
 summarizer_output_form = '''Read the text below:\n'{}', extract the positions each player chose in the last round and present it in the format 'player ...: ...'.
 Finally, provide a summary of all players' strategies and thinking.'''
+
+repair_output_form = '''The following answer does not follow the required format:
+'{}'
+Rewrite it strictly in the 'Reasoning:..., Position:...' format, where Position is {}. Keep the original reasoning and position, and add nothing else.'''
@@ -29,59 +29,129 @@ import numpy as np
 import sys
 import os
 import glob
-from .read_data import read_from_file
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from .read_data import INDEX_VERSION, read_index
 
-def extract_data_from_file(file):
+# Per-file results are cached next to the data file (data.p -> 
+# data_bias.npz), keyed by its content hash and the versions below
+CACHE_SUFFIX = '_bias.npz'
+BIAS_VERSION = 1  # Bumped whenever compute_bias changes
+
+def file_hash(file):
     """
-    Extract data from a file.
+    Compute the content hash of a file.
 
     Args:
-        file (str): The file path to read data from.
+        file (str): The file path.
 
     Returns:
-        numpy.ndarray: A NumPy array containing the extracted data.
+        str: The SHA-1 hex digest of the file content.
+    """
+    digest = hashlib.sha1()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def compute_bias(values, parsed, lengths, length=10):
+    """
+    Compute the bias of every converged simulation.
+
+    A simulation is used when every agent has the expected number of
+    entries (initial position and answers) and all of them are numbers. It
+    has converged when the mean gap between the sorted final positions of
+    its agents, (max - min) / (agents - 1), is below 1; its bias is the
+    mean over the agents of final minus initial position.
 
-    Raises:
-        Exception: If an error occurs during data extraction.
+    Args:
+        values (numpy.ndarray): Entries of shape (sims, agents, entries).
+        parsed (numpy.ndarray): Boolean mask of the entries that are numbers.
+        lengths (numpy.ndarray): Number of entries per (sim, agent).
+        length (int): Expected number of entries, or None to accept any
+            number as long as all agents of the simulation have the same.
+
+    Returns:
+        numpy.ndarray: The bias of every converged simulation.
 
-    This function reads data from a file, filters it, calculates bias, and 
-    returns a NumPy array.
+    This function works on whole arrays of ragged simulations, as stored
+    by read_data.read_index.
     """
-    results = read_from_file(file)
-    try:
-        # Filter results ensuring each inner list is of length 10 and contains no None values
-        filtered_results = [
-            mid_list for mid_list in results 
-            if all(len(inner_list) == 10 for inner_list in mid_list) 
-                and all(item is not None 
-                    for inner_list in mid_list 
-                    for item in inner_list)
-        ]
-
-        # Convert the filtered results to a numpy array for further processing
-        filtered_results = np.array(filtered_results)
+    n_sims, n_agents, n_entries = values.shape
+    if n_sims == 0 or n_agents < 2 or n_entries == 0:
+        return np.empty(0)
+    filled = np.arange(n_entries) < lengths[..., None]
+    if length is None:
+        complete = (lengths == lengths[:, :1]).all(axis=1) & (lengths[:, 0] > 0)
+    else:
+        complete = (lengths == length).all(axis=1)
+    complete &= (parsed | ~filled).all(axis=(1, 2))
+
+    last = np.take_along_axis(values, np.maximum(lengths - 1, 0)[..., None],
+                              axis=2)[..., 0]
+    spread = (last.max(axis=1) - last.min(axis=1)) / (n_agents - 1)
+    converged = complete & (spread < 1)
+    return (last - values[:, :, 0])[converged].mean(axis=1)
+
+def cache_key(file, length):
+    """
+    Get the key of the cached result of a file.
 
-    except Exception as e:
-        print('ERROR:--' + file)
-        return []
+    Args:
+        file (str): The file path.
+        length (int): Expected number of entries per agent.
 
-    bias = []
-    # Process each agent's results
-    for agent_results in filtered_results:
-        # Extract the last value from each result and sort them
-        last_values = sorted([res[-1] for res in agent_results])
+    Returns:
+        str: Key combining the content hash of the file, the length and the
+        versions of the answer parsing and of the bias computation.
+    """
+    return f"{file_hash(file)}_{length}_{INDEX_VERSION}_{BIAS_VERSION}"
+
+def extract_data_from_file(file, length=10, cache=True):
+    """
+    Extract data from a file.
 
-        # Calculate the mean difference between consecutive sorted last values
-        differences = np.mean([last_values[i + 1] - last_values[i] 
-                               for i in range(len(last_values) - 1)])
+    Args:
+        file (str): The file path to read data from.
+        length (int): Expected number of entries per agent, see compute_bias.
+        cache (bool): Whether to cache the result next to the file.
 
-        # If the mean difference is less than 1, compute the bias for each result of the agent
-        if differences < 1:
-            agent_bias = [res[-1] - res[0] for res in agent_results]
-            bias.append(agent_bias)
+    Returns:
+        numpy.ndarray: A NumPy array containing the extracted data.
 
-    # Calculate the mean bias for all agents
-    data = np.mean(bias, axis=1)
+    This function reads the numeric index of the file, filters it, 
+    calculates bias, and returns a NumPy array. The result is cached under
+    the content hash of the file (see cache_key), so an unchanged file is
+    not read again.
+    """
+    cache_file = key = None
+    if cache:
+        cache_file = os.path.splitext(file)[0] + CACHE_SUFFIX
+        key = cache_key(file, length)
+        try:
+            with np.load(cache_file) as cached:
+                if str(cached["key"]) == key:
+                    return cached["bias"]
+        except (OSError, KeyError, ValueError):
+            pass
+    try:
+        index = read_index(file)
+    except Exception as e:
+        print('ERROR:--' + file)
+        return np.empty(0)
+    if index is None:
+        print('ERROR:--' + file)
+        return np.empty(0)
+    data = compute_bias(index["values"], index["parsed"], index["lengths"],
+                        length)
+    if cache_file:
+        try:
+            with open(cache_file + '.tmp', 'wb') as f:
+                np.savez(f, key=key, bias=data)
+            os.replace(cache_file + '.tmp', cache_file)
+        except OSError as e:
+            print(f"Could not write cache {cache_file}: {e}")
     return data
 
 def get_data_files(dir, directory_pattern):
@@ -105,28 +175,36 @@ def get_data_files(dir, directory_pattern):
             file_paths.append(data_file_path)
     return file_paths
 
-def extract_data_from_files(files):
+def extract_data_from_files(files, limit=300, max_workers=None, length=10,
+                            cache=True):
     """
     Extract data from a list of data files.
 
     Args:
         files (list): A list of data file paths.
+        limit (int): Maximum number of samples, None for all (default is
+            300).
+        max_workers (int): Number of worker processes (default is the
+            number of CPUs).
+        length (int): Expected number of entries per agent, see compute_bias.
+        cache (bool): Whether to cache the per-file results next to the
+            files.
 
     Returns:
         list: A list of extracted data.
 
-    This function extracts data from a list of data files and accumulates it, 
-    returning the extracted data.
+    This function extracts data from the files in a process pool and
+    accumulates it in the order of the files, keeping the first limit
+    samples.
     """
-    data_list = []
-
-    for file in files:
-        data_list.extend(extract_data_from_file(file))
-
-        # Check if the length of the accumulated data list is at least 300
-        if len(data_list) >= 300:
-            print(len(data_list))
-            return data_list
+    extract = partial(extract_data_from_file, length=length, cache=cache)
+    if len(files) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers) as executor:
+            results = list(executor.map(extract, files))
+    else:
+        results = [extract(file) for file in files]
+    data_list = [value for data in results for value in data.tolist()]
+    return data_list[:limit] if limit is not None else data_list
 
 # Create a data structure to store results
 def plot_result(data):
@@ -0,0 +1,599 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from ..experiment.template import PROGRESS_FILE
+
+DASHBOARD_FILE = 'dashboard.html'
+
+class ProgressTail:
+    """
+    Incremental reader of a progress log.
+
+    Every call to read returns only the lines appended since the previous
+    call; a line that is still being written is kept until it is complete.
+    If the log is truncated (a new run in the same directory), it is read
+    again from the start.
+
+    Attributes:
+        _path (str): Path of the progress log.
+        _offset (int): Number of bytes read so far.
+        _partial (bytes): Incomplete last line.
+    """
+    def __init__(self, path):
+        """
+        Initialize the reader.
+
+        Args:
+            path (str): Path of the progress log, or of the output directory
+                containing progress.jsonl.
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, PROGRESS_FILE)
+        self._path = path
+        self._offset = 0
+        self._partial = b''
+
+    @property
+    def path(self):
+        return self._path
+
+    def read(self):
+        """
+        Read the entries appended since the previous call.
+
+        Returns:
+            list: New entries (dicts), malformed lines are skipped.
+        """
+        try:
+            size = os.path.getsize(self._path)
+        except OSError:
+            return []
+        if size < self._offset:
+            self._offset = 0
+            self._partial = b''
+        if size == self._offset:
+            return []
+        with open(self._path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        self._offset += len(chunk)
+        lines = (self._partial + chunk).split(b'\n')
+        self._partial = lines.pop()
+        entries = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+def _vectors(values):
+    """
+    Convert the logged answers of one round to a float array.
+
+    Args:
+        values (list): One scalar or vector per agent, None if missing.
+
+    Returns:
+        numpy.ndarray: Array of shape (N, D), NaN where missing.
+    """
+    rows = [np.atleast_1d(np.asarray(value if value is not None else np.nan,
+                                     dtype=float))
+            for value in values]
+    dim = max(len(row) for row in rows)
+    out = np.full((len(rows), dim), np.nan)
+    for i, row in enumerate(rows):
+        out[i, :len(row)] = row
+    return out
+
+def _to_list(array):
+    """
+    Convert an array to a JSON-safe list, with None for NaN.
+
+    Args:
+        array (numpy.ndarray): Float array.
+
+    Returns:
+        list: Nested lists.
+    """
+    values = np.asarray(array, dtype=float)
+    out = values.astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
+
+class RunState:
+    """
+    Convergence state of a running experiment, built from its progress log.
+
+    For every simulation the state keeps the answers (and robot positions
+    when logged) of every round, and two metrics per round: the spread,
+    the largest distance of an answer to the mean answer, and the change,
+    the largest distance an answer moved since the previous round. A
+    simulation is flagged as
+        - "converged" when its spread is within the tolerance,
+        - "stuck" when its answers moved less than the tolerance in each of
+          the last 'window' rounds without having converged,
+        - "diverging" when its spread grew in each of the last 'window'
+          rounds.
+
+    Attributes:
+        _tolerance (float): Distance below which answers agree.
+        _window (int): Number of rounds a trend must last to be flagged.
+        _meta (dict): Header of the progress log.
+        _finished (bool): Whether the experiment has ended.
+        _sims (dict): Per-simulation rounds, answers and metrics.
+    """
+    def __init__(self, tolerance=0.5, window=3):
+        """
+        Initialize an empty state.
+
+        Args:
+            tolerance (float): Distance below which answers agree (default
+                is 0.5).
+            window (int): Number of rounds a trend must last to be flagged
+                (default is 3).
+        """
+        self._tolerance = tolerance
+        self._window = window
+        self._meta = {}
+        self._finished = False
+        self._sims = {}
+
+    @property
+    def finished(self):
+        return self._finished
+
+    def update(self, entries):
+        """
+        Add the entries of the progress log.
+
+        Args:
+            entries (list): Entries, as returned by ProgressTail.read.
+        """
+        for entry in entries:
+            event = entry.get("event")
+            if event == "start":
+                self._meta = entry
+                self._finished = False
+                self._sims = {}
+            elif event == "end":
+                self._finished = True
+                self._meta["end"] = entry.get("time")
+            elif event is None and "sim" in entry:
+                self._add_round(entry)
+
+    def _add_round(self, entry):
+        """
+        Add the answers of one simulation after one round.
+
+        Args:
+            entry (dict): Progress entry with "sim", "round", "time",
+                "state" and optionally "position".
+        """
+        sim = self._sims.setdefault(entry["sim"], {
+            "rounds": [], "state": [], "position": [], "spread": [],
+            "change": [], "time": []})
+        state = _vectors(entry.get("state", []))
+        deviation = np.linalg.norm(state - np.nanmean(state, axis=0), axis=1)
+        change = np.nan
+        if sim["state"]:
+            previous = sim["state"][-1]
+            if previous.shape == state.shape:
+                change = np.nanmax(np.append(
+                    np.linalg.norm(state - previous, axis=1), np.nan))
+        sim["rounds"].append(entry.get("round"))
+        sim["state"].append(state)
+        sim["spread"].append(np.nanmax(np.append(deviation, np.nan)))
+        sim["change"].append(change)
+        sim["time"].append(entry.get("time"))
+        if entry.get("position") is not None:
+            sim["position"].append(_vectors(entry["position"]))
+
+    def status(self, sim_ind):
+        """
+        Get the status of a simulation.
+
+        Args:
+            sim_ind (int): Index of the simulation.
+
+        Returns:
+            str: "converged", "stuck", "diverging", "done" or "running".
+        """
+        sim = self._sims[sim_ind]
+        spread = np.asarray(sim["spread"])
+        change = np.asarray(sim["change"])
+        if len(spread) and spread[-1] <= self._tolerance:
+            return "converged"
+        if len(change) >= self._window:
+            last = change[-self._window:]
+            if not np.isnan(last).any() and (last < self._tolerance).all():
+                return "stuck"
+        if len(spread) > self._window:
+            trend = np.diff(spread[-self._window - 1:])
+            if (trend > 0).all():
+                return "diverging"
+        rounds = self._meta.get("rounds")
+        if rounds is not None and len(sim["rounds"]) >= rounds:
+            return "done"
+        return "running"
+
+    def to_dict(self):
+        """
+        Get the state in the form sent to the dashboard page.
+
+        Returns:
+            dict: JSON-serializable state.
+        """
+        start = self._meta.get("time")
+        sims = []
+        for sim_ind in sorted(self._sims):
+            sim = self._sims[sim_ind]
+            elapsed = (sim["time"][-1] - start 
+                       if start is not None and sim["time"] 
+                       and sim["time"][-1] is not None else None)
+            sims.append({
+                "id": sim_ind,
+                "rounds": sim["rounds"],
+                "state": [_to_list(state) for state in sim["state"]],
+                "position": [_to_list(position) 
+                             for position in sim["position"]],
+                "spread": _to_list(sim["spread"]),
+                "change": _to_list(sim["change"]),
+                "status": self.status(sim_ind),
+                "elapsed": elapsed,
+            })
+        return {"meta": self._meta, "finished": self._finished, 
+                "tolerance": self._tolerance, "now": time.time(), 
+                "sims": sims}
+
+def render_page(state=None, interval=5, poll=False):
+    """
+    Render the dashboard page.
+
+    Args:
+        state (dict): State to embed, as returned by RunState.to_dict
+            (default is None, for a page polling the server).
+        interval (float): Update interval of the page (s).
+        poll (bool): Whether the page fetches state.json from the server
+            instead of reloading itself.
+
+    Returns:
+        str: The HTML page.
+    """
+    refresh = ('' if poll or (state is not None and state["finished"]) else
+               f'<meta http-equiv="refresh" content="{interval:g}">')
+    return (PAGE_TEMPLATE
+            .replace('__REFRESH__', refresh)
+            .replace('__STATE__', json.dumps(state).replace('</', '<\\/'))
+            .replace('__POLL__', json.dumps(int(interval * 1000) 
+                                            if poll else 0)))
+
+def write_page(state, path, interval=5):
+    """
+    Write a self-contained dashboard page, replacing the previous one
+    atomically so a browser never loads a half-written file.
+
+    Args:
+        state (dict): State to embed, as returned by RunState.to_dict.
+        path (str): Path of the page.
+        interval (float): Reload interval of the page (s).
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render_page(state, interval))
+    os.replace(tmp_path, path)
+
+def watch(output_dir, path=None, interval=5, tolerance=0.5, window=3):
+    """
+    Regenerate a static dashboard page until the experiment ends.
+
+    Args:
+        output_dir (str): Output directory of the running experiment.
+        path (str): Path of the page (default is dashboard.html in the
+            output directory).
+        interval (float): Regeneration interval (s).
+        tolerance (float): Distance below which answers agree.
+        window (int): Number of rounds a trend must last to be flagged.
+    """
+    path = path or os.path.join(output_dir, DASHBOARD_FILE)
+    tail = ProgressTail(output_dir)
+    state = RunState(tolerance, window)
+    while True:
+        state.update(tail.read())
+        write_page(state.to_dict(), path, interval)
+        if state.finished:
+            break
+        time.sleep(interval)
+    print(f"The experiment has ended, final dashboard: {path}")
+
+def serve(output_dir, port=8765, interval=2, tolerance=0.5, window=3):
+    """
+    Serve a live dashboard of a running experiment.
+
+    The page polls state.json, and every request reads only what was
+    appended to the progress log since the previous one.
+
+    Args:
+        output_dir (str): Output directory of the running experiment.
+        port (int): Local port to listen on.
+        interval (float): Polling interval of the page (s).
+        tolerance (float): Distance below which answers agree.
+        window (int): Number of rounds a trend must last to be flagged.
+    """
+    tail = ProgressTail(output_dir)
+    state = RunState(tolerance, window)
+    lock = threading.Lock()
+    page = render_page(interval=interval, poll=True).encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] == '/state.json':
+                with lock:
+                    state.update(tail.read())
+                    body = json.dumps(state.to_dict()).encode('utf-8')
+                content_type = 'application/json'
+            elif self.path in ('/', '/' + DASHBOARD_FILE):
+                body, content_type = page, 'text/html; charset=utf-8'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    print(f"Dashboard of {tail.path} at http://127.0.0.1:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8">__REFRESH__<title>Experiment dashboard</title>
+<style>
+    body { font-family: sans-serif; margin: 10px; }
+    #summary { color: #444; margin-bottom: 10px; }
+    table { border-collapse: collapse; margin-bottom: 15px; }
+    th, td { padding: 3px 10px; text-align: right; 
+             border-bottom: 1px solid #eee; }
+    .status { font-weight: bold; text-align: left; }
+    .converged { color: #2a2; } .stuck { color: #c80; }
+    .diverging { color: #d22; } .done, .running { color: #888; }
+    .sims { display: flex; flex-wrap: wrap; gap: 15px; }
+    .sim { border: 1px solid #ddd; border-radius: 5px; padding: 5px; }
+    .sim h4 { margin: 2px 5px; }
+    canvas { display: block; }
+</style></head>
+<body>
+<div id="summary">Waiting for the progress log...</div>
+<label>Dimension <select id="dim"><option value="0">0</option></select></label>
+<table id="table"></table>
+<div class="sims" id="sims"></div>
+<script>
+const POLL = __POLL__;
+const COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
+const ORDER = {diverging: 0, stuck: 1, running: 2, done: 3, converged: 4};
+const dimSelect = document.getElementById('dim');
+let current = __STATE__;
+
+function fmt(value, digits) {
+    return value === null || value === undefined ? '-' 
+        : Number(value).toFixed(digits);
+}
+
+function bounds(values) {
+    let lo = Infinity, hi = -Infinity;
+    for (const v of values) {
+        if (v !== null && isFinite(v)) { lo = Math.min(lo, v); hi = Math.max(hi, v); }
+    }
+    if (lo === Infinity) { return [0, 1]; }
+    if (lo === hi) { return [lo - 1, hi + 1]; }
+    return [lo, hi];
+}
+
+function axes(ctx, w, h) {
+    ctx.clearRect(0, 0, w, h);
+    ctx.strokeStyle = '#ccc';
+    ctx.strokeRect(0.5, 0.5, w - 1, h - 1);
+}
+
+// Answer of every agent over the rounds, one dimension at a time
+function drawCurves(canvas, sim, dim) {
+    const ctx = canvas.getContext('2d'), w = canvas.width, h = canvas.height;
+    axes(ctx, w, h);
+    const n = sim.state.length;
+    if (!n) { return; }
+    const values = sim.state.flatMap(s => s.map(a => a[dim]));
+    const [lo, hi] = bounds(values);
+    const x = i => 5 + (w - 10) * (n > 1 ? i / (n - 1) : 0.5);
+    const y = v => h - 5 - (h - 10) * (v - lo) / (hi - lo);
+    const agents = sim.state[n - 1].length;
+    for (let a = 0; a < agents; a++) {
+        ctx.strokeStyle = COLORS[a % COLORS.length];
+        ctx.beginPath();
+        let pen = false;
+        for (let i = 0; i < n; i++) {
+            const v = sim.state[i][a] ? sim.state[i][a][dim] : null;
+            if (v === null || v === undefined) { pen = false; continue; }
+            if (pen) { ctx.lineTo(x(i), y(v)); } else { ctx.moveTo(x(i), y(v)); }
+            pen = true;
+        }
+        ctx.stroke();
+    }
+    ctx.fillStyle = '#888';
+    ctx.fillText(fmt(hi, 2), 4, 12);
+    ctx.fillText(fmt(lo, 2), 4, h - 6);
+}
+
+// Robot positions in the plane of the first two dimensions, with trails
+function drawPlane(canvas, sim) {
+    const ctx = canvas.getContext('2d'), w = canvas.width, h = canvas.height;
+    axes(ctx, w, h);
+    const n = sim.position.length;
+    if (!n || sim.position[0][0].length < 2) { return; }
+    const xs = sim.position.flatMap(p => p.map(a => a[0]));
+    const ys = sim.position.flatMap(p => p.map(a => a[1]));
+    const [x0, x1] = bounds(xs), [y0, y1] = bounds(ys);
+    const x = v => 8 + (w - 16) * (v - x0) / (x1 - x0);
+    const y = v => h - 8 - (h - 16) * (v - y0) / (y1 - y0);
+    const agents = sim.position[n - 1].length;
+    for (let a = 0; a < agents; a++) {
+        ctx.strokeStyle = ctx.fillStyle = COLORS[a % COLORS.length];
+        ctx.globalAlpha = 0.4;
+        ctx.beginPath();
+        sim.position.forEach((p, i) => {
+            if (p[a][0] === null) { return; }
+            if (i) { ctx.lineTo(x(p[a][0]), y(p[a][1])); }
+            else { ctx.moveTo(x(p[a][0]), y(p[a][1])); }
+        });
+        ctx.stroke();
+        ctx.globalAlpha = 1;
+        const last = sim.position[n - 1][a];
+        if (last[0] !== null) {
+            ctx.beginPath();
+            ctx.arc(x(last[0]), y(last[1]), 4, 0, 2 * Math.PI);
+            ctx.fill();
+        }
+    }
+}
+
+function simCard(id) {
+    let card = document.getElementById('sim-' + id);
+    if (card) { return card; }
+    card = document.createElement('div');
+    card.className = 'sim';
+    card.id = 'sim-' + id;
+    card.innerHTML = '<h4></h4><canvas class="curves" width="320" height="160">' +
+        '</canvas><canvas class="plane" width="160" height="160"></canvas>';
+    document.getElementById('sims').appendChild(card);
+    return card;
+}
+
+function render(state) {
+    if (!state) { return; }
+    const meta = state.meta || {};
+    const total = meta.rounds === undefined ? '?' : meta.rounds;
+    const counts = {};
+    state.sims.forEach(s => { counts[s.status] = (counts[s.status] || 0) + 1; });
+    document.getElementById('summary').textContent =
+        (meta.type || 'Experiment') + ': ' + state.sims.length + '/' +
+        (meta.n_exp === undefined ? '?' : meta.n_exp) + ' simulations, ' +
+        Object.keys(counts).map(k => counts[k] + ' ' + k).join(', ') +
+        (state.finished ? ' (finished)' : '') +
+        ', updated ' + new Date(state.now * 1000).toLocaleTimeString();
+    // Dimensions of the answers
+    const dims = state.sims.length && state.sims[0].state.length 
+        ? state.sims[0].state[0][0].length : 1;
+    if (dimSelect.options.length !== dims) {
+        dimSelect.innerHTML = '';
+        for (let d = 0; d < dims; d++) { dimSelect.add(new Option(d, d)); }
+    }
+    const dim = Number(dimSelect.value) || 0;
+    // Flagged simulations first
+    const sims = state.sims.slice().sort((a, b) => 
+        ORDER[a.status] - ORDER[b.status] || a.id - b.id);
+    const rows = ['<tr><th>Simulation</th><th>Status</th><th>Rounds</th>' +
+                  '<th>Spread</th><th>Change</th><th>Elapsed (s)</th></tr>'];
+    for (const sim of sims) {
+        const last = sim.spread.length - 1;
+        rows.push('<tr><td>' + sim.id + '</td><td class="status ' + 
+            sim.status + '">' + sim.status + '</td><td>' + sim.rounds.length +
+            '/' + total + '</td><td>' + fmt(sim.spread[last], 3) + '</td><td>' +
+            fmt(sim.change[last], 3) + '</td><td>' + fmt(sim.elapsed, 0) + 
+            '</td></tr>');
+    }
+    document.getElementById('table').innerHTML = rows.join('');
+    for (const sim of sims) {
+        const card = simCard(sim.id);
+        card.querySelector('h4').innerHTML = 'Simulation ' + sim.id + 
+            ' <span class="' + sim.status + '">' + sim.status + '</span>';
+        drawCurves(card.querySelector('.curves'), sim, dim);
+        const plane = card.querySelector('.plane');
+        plane.style.display = sim.position.length ? '' : 'none';
+        drawPlane(plane, sim);
+    }
+}
+
+async function poll() {
+    try {
+        const response = await fetch('state.json', {cache: 'no-store'});
+        current = await response.json();
+        render(current);
+        if (current.finished) { return; }
+    } catch (e) {
+        document.getElementById('summary').textContent = 
+            'Dashboard server unreachable: ' + e;
+    }
+    setTimeout(poll, POLL);
+}
+
+dimSelect.addEventListener('change', () => render(current));
+render(current);
+if (POLL) { poll(); }
+</script>
+</body></html>
+'''
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Live dashboard of a running experiment')
+    parser.add_argument('output_dir', type=str,
+                        help='output directory (--out_file) of the run')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='local port of the live dashboard')
+    parser.add_argument('--static', type=str, default='',
+                        help='regenerate this HTML file instead of serving, '
+                             '"-" for dashboard.html in the output directory')
+    parser.add_argument('--interval', type=float, default=5,
+                        help='update interval (s)')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='distance below which answers agree')
+    parser.add_argument('--window', type=int, default=3,
+                        help='rounds a stuck or diverging trend must last')
+    args = parser.parse_args()
+    if args.static:
+        watch(args.output_dir, None if args.static == '-' else args.static,
+              args.interval, args.tolerance, args.window)
+    else:
+        serve(args.output_dir, args.port, args.interval, args.tolerance,
+              args.window)
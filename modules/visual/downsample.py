@@ -0,0 +1,159 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import numpy as np
+
+def minmax_indices(y, n_out):
+    """
+    Min/max decimation of a series.
+
+    The series is split into n_out // 2 equal buckets and the smallest and
+    largest sample of every bucket are kept, so the drawn envelope is the
+    same as that of the full series at that horizontal resolution.
+
+    Args:
+        y (numpy.ndarray): Series of shape (n,), NaN allowed.
+        n_out (int): Maximum number of samples to keep.
+
+    Returns:
+        numpy.ndarray: Sorted indices of the kept samples, always including
+        the first and the last one.
+    """
+    n = len(y)
+    n_buckets = max(1, n_out // 2)
+    if n <= max(n_out, 2):
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(n_buckets, size)
+    start = np.arange(n_buckets) * size
+    missing = np.isnan(padded)
+    low = np.argmin(np.where(missing, np.inf, padded), axis=1) + start
+    high = np.argmax(np.where(missing, -np.inf, padded), axis=1) + start
+    return np.unique(np.concatenate([[0, n - 1], np.minimum(low, n - 1), 
+                                     np.minimum(high, n - 1)]))
+
+def lttb_indices(y, n_out, x=None):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a series.
+
+    Args:
+        y (numpy.ndarray): Series of shape (n,).
+        n_out (int): Number of samples to keep (at least 3).
+        x (numpy.ndarray): Abscissae (default is the sample index).
+
+    Returns:
+        numpy.ndarray: Sorted indices of the kept samples, including the
+        first and the last one.
+    """
+    n = len(y)
+    if n <= max(n_out, 3):
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = np.empty(n_out, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], max(edges[i + 1], edges[i] + 1)
+        # Average of the next bucket (the last point for the last bucket)
+        next_start = stop
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        if next_start >= next_stop:
+            next_x, next_y = x[-1], y[-1]
+        else:
+            next_x = x[next_start:next_stop].mean()
+            next_y = y[next_start:next_stop].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+    return np.unique(kept)
+
+def downsample_indices(y, n_out, boundaries=None, method="minmax", x=None):
+    """
+    Choose the samples of a series to plot at a given resolution.
+
+    When round boundaries are given, the series is downsampled round by
+    round with a budget proportional to the length of the round, and the
+    first and last sample of every round are kept, so target jumps stay
+    sharp. If there are more rounds than the budget allows, only every
+    k-th boundary is kept.
+
+    Args:
+        y (numpy.ndarray): Series of shape (n,).
+        n_out (int): Approximate number of samples to keep, e.g. twice the
+            width of the axes in pixels.
+        boundaries (array-like): Indices at which rounds start (optional).
+        method (str): "minmax" or "lttb".
+        x (numpy.ndarray): Abscissae for "lttb" (optional).
+
+    Returns:
+        numpy.ndarray: Sorted indices of the kept samples.
+
+    Raises:
+        ValueError: If the method is unknown.
+    """
+    if method not in ("minmax", "lttb"):
+        raise ValueError(f"unknown downsampling method: {method}")
+    n = len(y)
+    n_out = max(int(n_out), 4)
+    if n <= n_out:
+        return np.arange(n)
+    cuts = np.array([], dtype=int)
+    if boundaries is not None:
+        cuts = np.unique(np.asarray(boundaries, dtype=int))
+        cuts = cuts[(cuts > 0) & (cuts < n)]
+        max_cuts = n_out // 4
+        if len(cuts) > max_cuts:
+            cuts = cuts[::-(-len(cuts) // max_cuts)]
+    starts = np.concatenate([[0], cuts])
+    stops = np.concatenate([cuts, [n]])
+    indices = []
+    for start, stop in zip(starts, stops):
+        budget = max(4, int(n_out * (stop - start) / n))
+        if method == "minmax":
+            kept = minmax_indices(y[start:stop], budget)
+        else:
+            kept = lttb_indices(y[start:stop], budget, 
+                                None if x is None else x[start:stop])
+        indices.append(kept + start)
+    return np.concatenate(indices)
+
+def pixel_budget(ax, per_pixel=2):
+    """
+    Get the number of samples worth plotting in an axes.
+
+    Args:
+        ax (matplotlib.axes.Axes): The axes.
+        per_pixel (int): Samples per horizontal pixel (default is 2, the
+            minimum and maximum of each pixel column).
+
+    Returns:
+        int: The sample budget.
+    """
+    return max(4, int(ax.bbox.width * per_pixel))
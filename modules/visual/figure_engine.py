@@ -0,0 +1,149 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import math
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait as wait_futures
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from ..profiling import profiler
+
+# The Agg figure shared by all plots drawn in this process
+_figure = None
+
+def figure(figsize):
+    """
+    Get the figure of this process, cleared and resized.
+
+    Plots are drawn on one reusable Agg figure per process instead of
+    pyplot figures, so nothing is ever shown and no GUI backend is needed.
+
+    Args:
+        figsize (tuple): (width, height) in inches.
+
+    Returns:
+        matplotlib.figure.Figure: The cleared figure.
+    """
+    global _figure
+    if _figure is None:
+        _figure = Figure(figsize=figsize)
+        FigureCanvasAgg(_figure)
+    else:
+        _figure.clear()
+        _figure.set_size_inches(figsize)
+    return _figure
+
+def grid_shape(n, min_cols=3):
+    """
+    Compute a subplot grid for n panels.
+
+    Args:
+        n (int): Number of panels.
+        min_cols (int): Columns used up to min_cols ** 2 panels; larger
+            grids are about square (default is 3).
+
+    Returns:
+        tuple: (rows, cols).
+    """
+    if n <= 0:
+        return 1, 1
+    cols = min(n, max(min_cols, math.ceil(math.sqrt(n))))
+    return math.ceil(n / cols), cols
+
+class FigureEngine:
+    """
+    Render figures in a pool of worker processes.
+
+    Jobs are plotting functions that draw on figure() and save their
+    output. submit returns at once, so plotting does not hold up the
+    caller; pending jobs complete before the interpreter exits, or when
+    wait is called.
+
+    Args:
+        max_workers (int): Number of worker processes (default is the 
+            number of CPUs).
+    """
+    def __init__(self, max_workers=None):
+        self._executor = ProcessPoolExecutor(max_workers)
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Schedule a plotting job.
+
+        Args:
+            fn: Module-level plotting function.
+            *args, **kwargs: Its arguments.
+
+        Returns:
+            concurrent.futures.Future: The job.
+        """
+        # Jobs are profiled in the workers while run.py --profile is on
+        fn, args = profiler.task_wrapper(fn, args)
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(_report_error)
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(future)
+        return future
+
+    def wait(self):
+        """Wait for all scheduled jobs."""
+        with self._lock:
+            futures = list(self._futures)
+        wait_futures(futures)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+def _report_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"A plotting job raised an exception: {future.exception()}")
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def submit(fn, *args, **kwargs):
+    """
+    Schedule a plotting job on the process-wide FigureEngine.
+
+    Args:
+        fn: Module-level plotting function.
+        *args, **kwargs: Its arguments.
+
+    Returns:
+        concurrent.futures.Future: The job.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FigureEngine()
+    return _engine.submit(fn, *args, **kwargs)
+
+def wait():
+    """Wait for all jobs scheduled with submit."""
+    if _engine is not None:
+        _engine.wait()
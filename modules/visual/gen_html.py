@@ -24,32 +24,86 @@ THE SOFTWARE.
 """
 
 from modules.visual.util import render_conversations_to_html
-from modules.visual.read_data import read_from_file, read_conversations
+from modules.visual.transcript_browser import (manifest_entry, write_index,
+                                               write_shard, SHARD_FILE)
+from modules.visual.read_data import (read_from_file, read_conversations,
+                                      iter_conversations)
+from concurrent.futures import ProcessPoolExecutor
 import os
 import sys
 
-def gen_html(data_path, html_dir):
+def _render(args):
+    """Render one simulation, returning the output file or None on error."""
+    res, output_file, ind = args
+    try:
+        render_conversations_to_html(res, output_file, ind)
+        return output_file
+    except Exception as e:
+        print(f"An exception occurred while rendering {output_file}: {e}")
+        return None
+
+def gen_html(data_path, html_dir, max_workers=None, standalone=False):
     """
     Generate HTML output for conversations.
 
     Args:
         data_path (str): The path to the data file.
         html_dir (str): The directory to save the generated HTML files.
+        max_workers (int): Number of worker processes for standalone pages
+            (default is the number of CPUs).
+        standalone (bool): Write one self-contained simulation_<ind>.html
+            per simulation instead of the transcript browser (default is 
+            False).
 
     Generates HTML output for the conversations and saves them in the 
-    specified directory.
+    specified directory: an index.html transcript browser, and one
+    simulation_<ind>.js data shard per simulation that the browser loads
+    when the simulation is opened. Shards that already exist are kept.
+    Simulations are decoded from the data file one at a time.
+    """
+    if standalone:
+        gen_standalone_html(read_conversations(data_path), html_dir, 
+                            max_workers)
+        return
+
+    manifest = []
+    for ind, res in enumerate(iter_conversations(data_path)):
+        if os.path.exists(os.path.join(html_dir, SHARD_FILE.format(ind))):
+            manifest.append(manifest_entry(res, ind))
+            continue
+        manifest.append(write_shard(res, html_dir, ind))
+    title = os.path.basename(os.path.abspath(html_dir))
+    output_file = write_index(manifest, html_dir, title)
+    print(f'HTML output has been written to {output_file}')
+
+def gen_standalone_html(results, html_dir, max_workers=None):
     """
-    results = read_conversations(data_path)
+    Render one self-contained HTML page per simulation.
 
+    Args:
+        results (list): Conversations of every simulation.
+        html_dir (str): The directory to save the generated HTML files.
+        max_workers (int): Number of worker processes (default is the 
+            number of CPUs).
+
+    Simulations are rendered in parallel in a process pool; existing pages
+    are kept.
+    """
+    tasks = []
     for ind, res in enumerate(results):
         output_file = os.path.join(html_dir, f'simulation_{ind}.html')
         if os.path.exists(output_file):
             continue
-        try:
-            render_conversations_to_html(res, output_file, ind)
+        tasks.append((res, output_file, ind))
+
+    if len(tasks) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers) as executor:
+            written = list(executor.map(_render, tasks))
+    else:
+        written = [_render(task) for task in tasks]
+    for output_file in written:
+        if output_file is not None:
             print(f'HTML output has been written to {output_file}')
-        except:
-            continue
 
 if __name__ == "__main__":
     log_directory = os.path.dirname(
@@ -24,15 +24,16 @@ THE SOFTWARE.
 """
 
 import re
-import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
 import numpy as np
 import sys
 import os
-from .read_data import read_from_file
+from .downsample import downsample_indices, pixel_budget
+from .figure_engine import figure, grid_shape
+from .read_data import read_from_file, read_simulation
 
 # Function to plot a single case
-def plot_single(data_path, pic_dir, name):
+def plot_single(data_path, pic_dir, name, method="minmax", rasterize=False):
     """
     Plot a single case's data.
 
@@ -40,8 +41,16 @@ def plot_single(data_path, pic_dir, name):
         data_path (str): Path to the data file.
         pic_dir (str): Directory to save the resulting plot.
         name (str): Name for the resulting plot file.
+        method (str): Downsampling of long runs, "minmax", "lttb", or None
+            to plot every round (default is "minmax").
+        rasterize (bool): Embed the lines as images in the SVG (default is
+            False).
+
+    The plot is drawn headless on the shared figure of the process and
+    saved; it is not shown. Runs with more rounds than the axes have 
+    pixels are downsampled, and markers and round lines are then left out.
     """
-    plt.figure(figsize=(6.4, 3.0))
+    fig = figure((6.4, 3.0))
 
     n_stubborn = 0
     n_suggestible = 0
@@ -51,13 +60,13 @@ def plot_single(data_path, pic_dir, name):
     if match:
         n_stubborn = int(match.group(1))
         n_suggestible = int(match.group(2))
-    results = read_from_file(data_path)
-    agent_count = len(results[0])
+    results = read_simulation(data_path, ind)
+    agent_count = len(results)
 
-    round_values = [res[0] for res in results[ind]]
+    round_values = [res[0] for res in results]
     average_round0 = np.mean(round_values)
 
-    ax = plt.gca()
+    ax = fig.add_subplot()
 
     # Customize axis properties
     ax.tick_params(axis='both', which='major', labelsize=11)
@@ -65,7 +74,8 @@ def plot_single(data_path, pic_dir, name):
         spine.set_linewidth(1.5)
 
     # Plot data
-    for agent_id, res in enumerate(results[ind]):
+    budget = pixel_budget(ax)
+    for agent_id, res in enumerate(results):
         if agent_id < n_stubborn:
             label = f'Agent {agent_id + 1}:stubborn'
         elif agent_id < n_stubborn + n_suggestible:
@@ -74,60 +84,97 @@ def plot_single(data_path, pic_dir, name):
             label = f'Agent {agent_id + 1}'
 
         alpha_value = 1 - (1 - 0.4) / (agent_count - 1) * agent_id
-        plt.plot(res, label=label, marker='o', markersize=3, 
-                 alpha=alpha_value, linewidth=1.5)
+        x, y, marker = _plot_samples(res, budget, method)
+        ax.plot(x, y, label=label, marker=marker, markersize=3, 
+                alpha=alpha_value, linewidth=1.5, rasterized=rasterize)
 
     # Plot aesthetics
-    plt.axhline(average_round0, color='red', linestyle='--', 
-                linewidth=0.5, label='Average value')
-    for round_num in range(1, len(results[0][0])):
-        plt.axvline(round_num, color='gray', linestyle='--', 
-                    linewidth=0.5)
-
-    plt.xlabel('Round')
-    plt.ylabel('Agent state')
-    plt.ylim(0, 100)
-    plt.xlim(0, len(res))
+    ax.axhline(average_round0, color='red', linestyle='--', 
+               linewidth=0.5, label='Average value')
+    if len(results[0]) <= budget:
+        for round_num in range(1, len(results[0])):
+            ax.axvline(round_num, color='gray', linestyle='--', 
+                       linewidth=0.5)
+
+    ax.set_xlabel('Round')
+    ax.set_ylabel('Agent state')
+    ax.set_ylim(0, 100)
+    ax.set_xlim(0, len(res))
     ax.xaxis.set_major_locator(MaxNLocator(integer=True))
     # plt.xticks(fontsize=20)
     # plt.yticks(fontsize=20)
     # Legend handling
     if agent_count >= 8:
-        legend = plt.legend(loc='center left', bbox_to_anchor=(1.05, 0.5), fontsize='small')
+        legend = ax.legend(loc='center left', bbox_to_anchor=(1.05, 0.5), fontsize='small')
     else:
         # legend = plt.legend(loc='upper right', )
         # legend = plt.legend(loc='lower right', )
         # legend = plt.legend(loc='center right', )
         # legend = plt.legend(fontsize='25')
-        legend = plt.legend()
+        legend = ax.legend()
 
-    plt.tight_layout()
+    fig.tight_layout()
     frame = legend.get_frame()
     frame.set_alpha(0.75)
     # frame.set_facecolor()
 
-    plt.savefig(pic_dir + f'/svg/result_{name}.svg')
-    plt.show()
+    fig.savefig(pic_dir + f'/svg/result_{name}.svg')
+
+
+def _plot_samples(res, budget, method):
+    """
+    Get the samples of one agent's states to plot.
 
+    Args:
+        res (list): States per round (None where unparsed).
+        budget (int): Sample budget of the axes.
+        method (str): Downsampling method, None to keep every round.
+
+    Returns:
+        tuple: (rounds, states, marker), with markers only when every
+        round is plotted.
+    """
+    y = np.array([np.nan if value is None else value for value in res], 
+                 dtype=float)
+    x = np.arange(len(y))
+    if method is None or len(y) <= budget:
+        return x, y, 'o'
+    kept = downsample_indices(y, budget, method=method)
+    return x[kept], y[kept], None
 
 # Create a data structure to store results
-def plot_result(data_path, pic_dir):
+def plot_result(data_path, pic_dir, method="minmax"):
+    """
+    Plot the agent states of every case in one grid of subplots.
+
+    Args:
+        data_path (str): Path to the data file.
+        pic_dir (str): Directory to save result.png to.
+        method (str): Downsampling of long runs, see plot_single.
+
+    The grid has 3 columns up to 9 cases and grows about square for more;
+    the plot is drawn headless on the shared figure of the process and
+    saved, not shown.
+    """
     results = read_from_file(data_path)
     E = len(results)
     N = len(results[0])  # Number of agents
     R = len(results[0][0])  # Number of rounds
     print(E, N, R)
 
-    fig, axes = plt.subplots(nrows=3, ncols=3, figsize=(12, 9))
+    nrows, ncols = grid_shape(E)
+    fig = figure((4 * ncols, 3 * nrows))
+    axes = fig.subplots(nrows=nrows, ncols=ncols, squeeze=False)
     for eval_id, agent_results in enumerate(results):
-        row = eval_id // 3  # Determine the row for the subplot
-        col = eval_id % 3  # Determine the co lumn for the subplot
+        row = eval_id // ncols  # Determine the row for the subplot
+        col = eval_id % ncols  # Determine the column for the subplot
         ax = axes[row, col]
         round0_values = [res[0] for res in agent_results]
         average_round0 = np.mean(round0_values)
         for agent_id, res in enumerate(agent_results):
-            ax.plot(range(0, len(res)), res, label=f'Agent {agent_id + 1}',
-                    marker='o', markersize=3,
+            x, y, marker = _plot_samples(res, pixel_budget(ax), method)
+            ax.plot(x, y, label=f'Agent {agent_id + 1}',
+                    marker=marker, markersize=3,
                     alpha=1 - (1-0.4)/(len(agent_results)-1)*agent_id)
             ax.axhline(average_round0, color='red', linestyle='--', 
                        linewidth=0.5, label='Average value')
@@ -140,16 +187,19 @@ def plot_result(data_path, pic_dir):
             ax.legend()
 
     # Add vertical dashed lines for each round to all subplots
-    for ax in axes.flatten():
+    for ax in axes.flatten()[:E]:
+        if R > pixel_budget(ax):
+            continue
         for round_num in range(1, R):
             ax.axvline(round_num, color='gray', linestyle='--', linewidth=0.5)
+    # Hide the unused cells of the grid
+    for ax in axes.flatten()[E:]:
+        ax.set_axis_off()
 
     # Adjust layout to prevent subplot overlap
-    plt.tight_layout()
-    # plt.savefig(pic_dir + '/result.svg', format='svg')
-    plt.savefig(pic_dir + '/result.png')
-    # Show the plot
-    plt.show()
+    fig.tight_layout()
+    # fig.savefig(pic_dir + '/result.svg', format='svg')
+    fig.savefig(pic_dir + '/result.png')
 
 if __name__ == '__main__':
     file = sys.argv[1]
@@ -24,12 +24,18 @@ THE SOFTWARE.
 """
 
 import os
-import pickle
+import shutil
+import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.animation import FuncAnimation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+from .downsample import downsample_indices, pixel_budget
+from .figure_engine import figure
+from ..physics.trajectory import load_trajectory
 
 # Define a color palette for plotting
 colors = np.array([
@@ -41,137 +47,352 @@ colors = np.array([
 
 def read_from_file(path):
     """
-    Read data from a binary file.
+    Read trajectory data.
 
     Args:
-        path (str): The path to the binary file.
+        path (str): The output directory of an experiment, one of its
+            trajectory .npy files, or a legacy trajectory.p file.
 
     Returns:
-        object: The data loaded from the file.
+        dict: Trajectory arrays, see load_trajectory.
     """
-    with open(path, 'rb') as f:
-        return pickle.load(f)
+    return load_trajectory(path)
 
-def plot_xy(data_path):
+def output_directory(path):
+    """
+    Get the directory figures for a trajectory path are written to.
+
+    Args:
+        path (str): Path given to read_from_file.
+
+    Returns:
+        str: The directory.
+    """
+    return path if os.path.isdir(path) else os.path.dirname(path)
+
+def active_targets(targets, target_steps, num_points):
+    """
+    Get the target each robot is heading to at every step.
+
+    Args:
+        targets (numpy.ndarray): Targets of shape (robots, requests, dim).
+        target_steps (numpy.ndarray): 
+            Step at which every target was set, shape (robots, requests),
+            -1 for targets that were never set.
+        num_points (int): Number of steps.
+
+    Returns:
+        numpy.ndarray: Targets of shape (robots, num_points, dim), the
+        first target before it was set.
+    """
+    steps = np.arange(num_points)
+    active = np.empty((len(targets), num_points, targets.shape[-1]))
+    for i, (target, target_step) in enumerate(zip(targets, target_steps)):
+        valid = target_step >= 0
+        if not valid.any():
+            active[i] = np.nan
+            continue
+        key = np.searchsorted(target_step[valid], steps, side='right') - 1
+        active[i] = target[valid][np.maximum(key, 0)]
+    return active
+
+def plot_xy(data_path, method="minmax", rasterize=False):
     """
     Plot the x and y coordinates of robots' trajectories.
 
     Args:
-        data_path (str): The path to the data file containing trajectory data.
+        data_path (str): The output directory or trajectory file containing
+            trajectory data.
+        method (str): Downsampling of long trajectories, "minmax", "lttb",
+            or None to plot every sample (default is "minmax").
+        rasterize (bool): Embed the lines as images in the SVG (default is
+            False).
+
+    The plot is drawn headless on the shared figure of the process and
+    saved as trajectory.svg; it is not shown. Trajectories are downsampled
+    to the resolution of the axes, keeping the first and last sample of
+    every round.
     """
     data = read_from_file(data_path)
     all_positions = np.array(data['pos'][0])
     all_targets = np.array(data['target'][0])
 
     num_robots, num_points, _ = all_positions.shape
-    num_targets = all_targets.shape[1]
+    replicated_targets = active_targets(all_targets, data['target_step'][0],
+                                        num_points)
 
-    multiple = num_points // num_targets
-    replicated_targets = np.repeat(all_targets, multiple, axis=1)
-
-    round_time = np.arange(0, num_points * 0.1, 0.1)
+    dt = data.get('dt', 0.1)
+    round_time = np.arange(num_points) * dt
 
     # Create subplots for each robot's trajectory
-    fig, axs = plt.subplots(2, num_robots, figsize=(9, 4))
+    fig = figure((9, 4))
+    axs = fig.subplots(2, num_robots, squeeze=False)
     coord_labels = ['x', 'y']
 
     for i in range(num_robots):
+        boundaries = data['target_step'][0][i]
         for j, coord in enumerate(coord_labels):
             axs[j, i].set_xlim(0, 40)
             axs[j, i].tick_params(axis='both', labelsize=7)
-            axs[j, i].plot(round_time, all_positions[i, :, j],
+            actual = np.arange(num_points)
+            planned = actual
+            if method is not None:
+                budget = pixel_budget(axs[j, i])
+                actual = downsample_indices(all_positions[i, :, j], budget,
+                                            boundaries, method, round_time)
+                planned = downsample_indices(replicated_targets[i, :, j], 
+                                             budget, boundaries, method,
+                                             round_time)
+            axs[j, i].plot(round_time[actual], all_positions[i, actual, j],
                            color=colors[i], linestyle='-', linewidth=1,
-                           label="Actual")
-            axs[j, i].plot(round_time, replicated_targets[i, :, j], 
+                           label="Actual", rasterized=rasterize)
+            axs[j, i].plot(round_time[planned], 
+                           replicated_targets[i, planned, j], 
                            color=colors[i], linestyle='--', linewidth=1,
-                           label="Planned")
+                           label="Planned", rasterized=rasterize)
             axs[j, i].set_title(f"Robot {i + 1}", fontsize=9)
             if i == 0:
                 axs[j, i].set_ylabel(coord + ' (m)', fontsize=9)
             if coord == 'x':
                 axs[j, i].legend(fontsize=7)
 
-    plt.tight_layout()
-    plt.savefig(os.path.join(os.path.dirname(data_path), 'trajectory.svg'))
-    plt.show()
+    fig.tight_layout()
+    fig.savefig(os.path.join(output_directory(data_path), 'trajectory.svg'))
 
-def video(data_path):
+class FrameRenderer:
     """
-    Create an animation of robot trajectories.
+    Draw the frames of a trajectory animation incrementally.
+
+    The figure is drawn on an Agg canvas without pyplot. Static artists
+    (axes, initial positions, legend) are drawn once; the trails are drawn
+    one segment per frame on top of a saved background (blitting), with
+    the saved legend restored over them, so
+    every frame costs the same whatever its index and an animation renders
+    in time linear in its length.
 
     Args:
-        data_path (str): The path to the data file containing trajectory data.
+        positions (numpy.ndarray): Positions of shape (robots, steps, 2).
+        targets (numpy.ndarray): Active targets of shape (robots, steps, 2).
     """
-    data = read_from_file(data_path)
-    fig, ax = plt.subplots(figsize=(8, 4))
-    lines = []
-    dashed_lines = []
-    scatters = []
-    start_scatters = []
-
-    for idx in range(len(data['pos'][0])):
-        line, = ax.plot([], [], lw=2, color=colors[idx], 
-                        label=f'Robot {idx + 1} trajectory')
-        dashed_line, = ax.plot([], [], lw=2, linestyle='--', 
-                               alpha=0.5, color=colors[idx])
-        scatter = ax.scatter([], [], marker='o', 
-                             c=colors[idx].reshape(1, -1), s=50)
-        start_pos = data['pos'][0][idx][0]
-        start_scatter = ax.scatter(start_pos[0], start_pos[1], alpha=0.5, 
-                                   c=colors[idx].reshape(1, -1), s=100,
-                                   marker='o', 
-                                   label=f'Robot {idx + 1} initial position')
-        lines.append(line)
-        dashed_lines.append(dashed_line)
-        scatters.append(scatter)
-        start_scatters.append(start_scatter)
-    mean_start_x = np.array([data['pos'][0][idx][0][0]
-                             for idx in range(len(data['pos'][0]))]).mean()
-    mean_start_y = np.array([data['pos'][0][idx][0][1] 
-                             for idx in range(len(data['pos'][0]))]).mean()
-    mean_start_scatter = ax.scatter([], [], c=colors[-1].reshape(1, -1), 
-                                    marker='$*$', s=100, 
-                                    label="Average initial position")
-    mean_start_scatter.set_offsets([mean_start_x, mean_start_y])
-
-    def init():
+    def __init__(self, positions, targets):
+        self._positions = positions
+        self._targets = targets
+        self._fig = Figure(figsize=(8, 4))
+        self._canvas = FigureCanvasAgg(self._fig)
+        ax = self._ax = self._fig.add_subplot()
+        self._trails, self._dashed_lines, self._scatters = [], [], []
+        for idx in range(len(positions)):
+            # Labelled stand-in for the trail in the legend
+            ax.plot([], [], lw=2, color=colors[idx], 
+                    label=f'Robot {idx + 1} trajectory')
+            trail, = ax.plot([], [], lw=2, color=colors[idx], animated=True)
+            dashed_line, = ax.plot([], [], lw=2, linestyle='--', alpha=0.5,
+                                   color=colors[idx], animated=True)
+            scatter = ax.scatter([], [], marker='o', 
+                                 c=colors[idx].reshape(1, -1), s=50, 
+                                 animated=True)
+            start_pos = positions[idx][0]
+            ax.scatter(start_pos[0], start_pos[1], alpha=0.5, 
+                       c=colors[idx].reshape(1, -1), s=100, marker='o', 
+                       label=f'Robot {idx + 1} initial position')
+            self._trails.append(trail)
+            self._dashed_lines.append(dashed_line)
+            self._scatters.append(scatter)
+        mean_start = positions[:, 0].mean(axis=0)
+        mean_start_scatter = ax.scatter([], [], c=colors[-1].reshape(1, -1), 
+                                        marker='$*$', s=100, 
+                                        label="Average initial position")
+        mean_start_scatter.set_offsets([mean_start])
         ax.set_xlabel('x (m)')
         ax.set_ylabel('y (m)')
         ax.set_ylim(0, 80)
         ax.set_xticks(range(-20, 130, 10))
-        for line, dashed_line, scatter in zip(lines, dashed_lines, scatters):
-            line.set_data([], [])
-            dashed_line.set_data([], [])
-            scatter.set_offsets(np.empty((0, 2)))
         handles, labels = ax.get_legend_handles_labels()
-        ax.legend(handles=handles, labels=labels, loc="upper left", 
-                  labelspacing=0.6, fontsize=10)
-        return lines + dashed_lines + scatters + start_scatters
-
-    def animate(i):
-        for idx, (line, dashed_line, scatter) in enumerate(zip(lines, dashed_lines, scatters)):
-            all_positions = []
-            for key in data['pos']:
-                all_positions.extend(data['pos'][key][idx])
-            line.set_data([x for x, y in all_positions[:i + 1]], 
-                          [y for x, y in all_positions[:i + 1]])
-            target_key = max(0, i - 20) // 20
-            start_x, start_y = all_positions[i]
-            target_x, target_y = data['target'][0][idx][target_key]
+        self._legend = ax.legend(handles=handles, labels=labels, 
+                                 loc="upper left", labelspacing=0.6, 
+                                 fontsize=10)
+        self._canvas.draw()
+        self._background = self._canvas.copy_from_bbox(self._fig.bbox)
+        # Restored after the trails so that they pass under the legend
+        self._legend_region = self._canvas.copy_from_bbox(
+            self._legend.get_window_extent())
+
+    @property
+    def size(self):
+        """(width, height) of the frames in pixels."""
+        width, height = self._canvas.get_width_height()
+        return width, height
+
+    def _set_frame(self, i):
+        for idx, (dashed_line, scatter) in enumerate(
+                zip(self._dashed_lines, self._scatters)):
+            start_x, start_y = self._positions[idx, i]
+            target_x, target_y = self._targets[idx, i]
             dashed_line.set_data([start_x, target_x], [start_y, target_y])
-            scatter.set_offsets([start_x, start_y])
-
-        if i == len(data['pos'][0][0]) - 1:
-            img_output_path = os.path.join(os.path.dirname(data_path), 
-                                           'last_frame.svg')
-            plt.savefig(img_output_path, bbox_inches='tight')
-        return lines + dashed_lines + scatters
-
-    output_path = os.path.join(os.path.dirname(data_path), 'animation.gif')
-    ani = FuncAnimation(fig, animate, frames=len(data['pos'][0][0]), 
-                        init_func=init, blit=False)
-    ani.save(output_path, fps=20)
-    plt.show()
+            scatter.set_offsets([[start_x, start_y]])
+
+    def frames(self, start=0, stop=None):
+        """
+        Render a range of frames.
+
+        Args:
+            start (int): First frame.
+            stop (int): End of the range (default is the last frame).
+
+        Yields:
+            bytes: RGBA pixels of every frame.
+        """
+        canvas, ax = self._canvas, self._ax
+        stop = self._positions.shape[1] if stop is None else stop
+        # The trails up to the first frame are drawn in one go
+        canvas.restore_region(self._background)
+        for idx, trail in enumerate(self._trails):
+            trail.set_data(self._positions[idx, :start, 0], 
+                           self._positions[idx, :start, 1])
+            ax.draw_artist(trail)
+        for i in range(start, stop):
+            # Extend the trails by one segment and keep them as background
+            for idx, trail in enumerate(self._trails):
+                segment = self._positions[idx, max(0, i - 1):i + 1]
+                trail.set_data(segment[:, 0], segment[:, 1])
+                ax.draw_artist(trail)
+            trails = canvas.copy_from_bbox(self._fig.bbox)
+            canvas.restore_region(self._legend_region)
+            self._set_frame(i)
+            for artist in self._dashed_lines + self._scatters:
+                ax.draw_artist(artist)
+            yield bytes(canvas.buffer_rgba())
+            canvas.restore_region(trails)
+
+    def save_last_frame(self, output_path):
+        """
+        Save the last frame as a (vector) image.
+
+        Args:
+            output_path (str): Path of the image.
+        """
+        last = self._positions.shape[1] - 1
+        for idx, trail in enumerate(self._trails):
+            trail.set_data(self._positions[idx, :, 0], 
+                           self._positions[idx, :, 1])
+        self._set_frame(last)
+        animated = self._trails + self._dashed_lines + self._scatters
+        for artist in animated:
+            artist.set_animated(False)
+        self._fig.savefig(output_path, bbox_inches='tight')
+        for artist in animated:
+            artist.set_animated(True)
+
+class FrameWriter:
+    """
+    Encode RGBA frames into an animation file as they are produced.
+
+    Frames are piped to ffmpeg when it is available; otherwise they are
+    quantized to palette images and written as a GIF with Pillow.
+
+    Args:
+        output_path (str): Path of the animation.
+        size (tuple): (width, height) of the frames in pixels.
+        fps (int): Frames per second.
+    """
+    def __init__(self, output_path, size, fps):
+        self._output_path = output_path
+        self._size = size
+        self._fps = fps
+        self._images = []
+        self._process = None
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg:
+            self._process = subprocess.Popen(
+                [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', 
+                 '-pix_fmt', 'rgba', '-s', f'{size[0]}x{size[1]}', 
+                 '-r', str(fps), '-i', '-', output_path], 
+                stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        if self._process is not None:
+            self._process.stdin.write(frame)
+        else:
+            image = Image.frombuffer('RGBA', self._size, frame, 'raw', 
+                                     'RGBA', 0, 1)
+            self._images.append(
+                image.quantize(method=Image.Quantize.FASTOCTREE))
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+        elif self._images:
+            self._images[0].save(self._output_path, save_all=True, 
+                                 append_images=self._images[1:], 
+                                 duration=1000 / self._fps, loop=0)
+
+# Renderer of a worker process, built once by _init_worker
+_worker_renderer = None
+
+def _init_worker(positions, targets):
+    global _worker_renderer
+    _worker_renderer = FrameRenderer(positions, targets)
+
+def _render_chunk(bounds):
+    return list(_worker_renderer.frames(*bounds))
+
+def video(data_path, simulation_ind=0, output_path=None, fps=20, workers=0,
+          chunk_size=50):
+    """
+    Create an animation of robot trajectories.
+
+    The trajectory arrays are prepared once and every frame is drawn
+    incrementally, headless on the Agg backend. Frames can be rendered in
+    worker processes, each one drawing chunks of consecutive frames; the
+    chunks are written to the encoder in order as they complete.
+
+    Args:
+        data_path (str): The output directory or trajectory file containing
+            trajectory data.
+        simulation_ind (int): Simulation to animate (default is 0).
+        output_path (str): Path of the animation (default is animation.gif
+            in the output directory).
+        fps (int): Frames per second (default is 20).
+        workers (int): Number of worker processes, 0 to render in this 
+            process (default is 0).
+        chunk_size (int): Number of frames per worker task.
+    """
+    data = read_from_file(data_path)
+    positions = np.array(data['pos'][simulation_ind][..., :2], dtype=float)
+    n_frames = positions.shape[1]
+    targets = active_targets(np.array(data['target'][simulation_ind]), 
+                             data['target_step'][simulation_ind], n_frames)
+    if output_path is None:
+        output_path = os.path.join(output_directory(data_path), 
+                                   'animation.gif')
+
+    renderer = FrameRenderer(positions, targets)
+    writer = FrameWriter(output_path, renderer.size, fps)
+    try:
+        if workers > 0 and n_frames > chunk_size:
+            chunks = [(start, min(start + chunk_size, n_frames)) 
+                      for start in range(0, n_frames, chunk_size)]
+            with ProcessPoolExecutor(workers, initializer=_init_worker, 
+                                     initargs=(positions, targets)) as executor:
+                # Keep a bounded number of chunks in flight
+                pending = [executor.submit(_render_chunk, chunk) 
+                           for chunk in chunks[:2 * workers]]
+                for next_ind in range(2 * workers, len(chunks) + 2 * workers):
+                    for frame in pending.pop(0).result():
+                        writer.write(frame)
+                    if next_ind < len(chunks):
+                        pending.append(executor.submit(_render_chunk, 
+                                                       chunks[next_ind]))
+                    if not pending:
+                        break
+        else:
+            for frame in renderer.frames():
+                writer.write(frame)
+    finally:
+        writer.close()
+    renderer.save_last_frame(os.path.join(os.path.dirname(output_path) 
+                                          or '.', 'last_frame.svg'))
 
 if __name__ == '__main__':
     data_path = sys.argv[1]
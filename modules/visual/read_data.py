@@ -23,24 +23,35 @@ OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-import pickle
-import re
+import os
+
+import numpy as np
+from ..llm.message import round_answers
+from ..llm.output_parser import parse_scalar
+from ..llm.record_file import RecordFile
+
+INDEX_SUFFIX = '_index.npz'  # data.p -> data_index.npz
+# Bumped whenever the parsing of the answers changes, to rebuild old indexes
+INDEX_VERSION = 2
 
 def parse_answer(sentence):
     """
     Parses a sentence to extract a floating-point number.
 
+    The answer is parsed as the agents parse it (see parse_scalar), so the
+    positions read back are the ones the agents moved to.
+
     Args:
         sentence (str): The input sentence to parse.
 
     Returns:
-        float or None: The last floating-point number found in the sentence, 
-        or None if none is found.
+        float or None: The parsed position, or None if none is found.
     """
-    floats = re.findall(r'[-+]?\d*\.\d+|\d+', sentence)
-    if floats:
-        return float(floats[-1])
-    else:
+    if sentence is None:
+        return None
+    try:
+        return parse_scalar(sentence)
+    except ValueError:
         return None
 
 def parse_p_file(filename):
@@ -51,16 +62,29 @@ def parse_p_file(filename):
         filename (str): The name of the Pickle file to parse.
 
     Returns:
-        object: The content of the Pickle file.
+        object: The content of the Pickle file. Records saved with an
+        interned string table are decoded into lists of Message.
+
+    To read only some simulations of a large file, use RecordFile or
+    read_simulation instead.
+    """
+    with RecordFile(filename) as record_file:
+        return record_file.to_dict()
+
+def iter_conversations(filename):
+    """
+    Iterates over the conversations of a Pickle file, one simulation at a
+    time.
+
+    Args:
+        filename (str): The name of the Pickle file containing conversations.
+
+    Yields:
+        list: The agent histories of every simulation, in file order.
     """
-    objects = []
-    with open(filename, "rb") as openfile:
-        while True:
-            try:
-                objects.append(pickle.load(openfile))
-            except EOFError:
-                break
-    return objects[0]
+    with RecordFile(filename) as record_file:
+        for key, conversations in record_file.iter_simulations():
+            yield conversations
 
 def read_conversations(filename):
     """
@@ -76,10 +100,170 @@ def read_conversations(filename):
     conversations = [value for key, value in object.items()]
     return conversations
 
+def index_path(filename):
+    """
+    Get the path of the numeric index of a Pickle file.
+
+    Args:
+        filename (str): The name of the Pickle file.
+
+    Returns:
+        str: The path of the .npz index next to it.
+    """
+    return os.path.splitext(filename)[0] + INDEX_SUFFIX
+
+def _parse_simulation(key, agent_contexts):
+    """
+    Extract the numeric answers of every agent of one simulation.
+
+    Args:
+        key (tuple): Key of the simulation (the initial positions).
+        agent_contexts (list): Agent histories of the simulation.
+
+    Returns:
+        list: Per agent, the initial position followed by the parsed 
+        answer of every round (None when no number was found).
+    """
+    text_answers = []
+    for agent_id, agent_context in enumerate(agent_contexts):
+        ans = [key[agent_id]]
+        ans.extend(parse_answer(answer) 
+                   for answer in round_answers(agent_context))
+        text_answers.append(ans)
+    return text_answers
+
+def _parse_answers(filename):
+    """
+    Extract the numeric answers of every agent from a record, decoding one
+    simulation at a time.
+
+    Args:
+        filename (str): The name of the Pickle file.
+
+    Returns:
+        list: Per simulation, see _parse_simulation.
+    """
+    with RecordFile(filename) as record_file:
+        return [_parse_simulation(key, agent_contexts) for key, agent_contexts
+                in record_file.iter_simulations()]
+
+def _stat(filename):
+    """Get the (mtime_ns, size) signature of a file."""
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+def load_index(filename):
+    """
+    Load the numeric index of a Pickle file if it is up to date.
+
+    Args:
+        filename (str): The name of the Pickle file.
+
+    Returns:
+        dict or None: {"values": (sims, agents, length) float array of the
+        initial positions and answers, NaN where missing, "parsed": bool
+        array of the same shape, True where a number was found, "lengths":
+        (sims, agents) int array of the number of entries}, or None if
+        there is no index or the Pickle file changed since it was written.
+    """
+    path = index_path(filename)
+    try:
+        with np.load(path) as index:
+            if (int(index["version"]) != INDEX_VERSION 
+                    or (int(index["mtime_ns"]), int(index["size"])) 
+                    != _stat(filename)):
+                return None
+            return {"values": index["values"], "parsed": index["parsed"],
+                    "lengths": index["lengths"]}
+    except (OSError, KeyError, ValueError):
+        return None
+
+def write_index(filename, final_ans):
+    """
+    Write the numeric index of a Pickle file.
+
+    Only records whose positions are numbers (scalar debates) are indexed.
+    Failing to write the index (e.g. in a read-only directory) is not an
+    error.
+
+    Args:
+        filename (str): The name of the Pickle file.
+        final_ans (list): Its parsed answers, see read_from_file.
+
+    Returns:
+        dict or None: The index (see load_index), None if the record cannot
+        be indexed.
+    """
+    n_sims = len(final_ans)
+    n_agents = max((len(sim) for sim in final_ans), default=0)
+    lengths = np.zeros((n_sims, n_agents), dtype=np.int64)
+    for sim_ind, sim in enumerate(final_ans):
+        lengths[sim_ind, :len(sim)] = [len(ans) for ans in sim]
+    values = np.full((n_sims, n_agents, lengths.max(initial=0)), np.nan)
+    parsed = np.zeros(values.shape, dtype=bool)
+    try:
+        for sim_ind, sim in enumerate(final_ans):
+            for agent_id, ans in enumerate(sim):
+                for i, value in enumerate(ans):
+                    if value is not None:
+                        values[sim_ind, agent_id, i] = value
+                        parsed[sim_ind, agent_id, i] = True
+    except (TypeError, ValueError):
+        return None
+    index = {"values": values, "parsed": parsed, "lengths": lengths}
+    mtime_ns, size = _stat(filename)
+    path = index_path(filename)
+    try:
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, version=INDEX_VERSION, mtime_ns=mtime_ns, size=size,
+                     **index)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"Could not write index {path}: {e}")
+    return index
+
+def read_index(filename):
+    """
+    Get the numeric index of a Pickle file, building it if needed.
+
+    Args:
+        filename (str): The name of the Pickle file.
+
+    Returns:
+        dict or None: The index (see load_index), None if the record cannot
+        be indexed.
+    """
+    index = load_index(filename)
+    if index is None:
+        index = write_index(filename, _parse_answers(filename))
+    return index
+
+def _index_answers(index, sim_ind):
+    """
+    Get the answers of one simulation from a numeric index.
+
+    Args:
+        index (dict): The index, see load_index.
+        sim_ind (int): Index of the simulation.
+
+    Returns:
+        list: Per agent, see _parse_simulation.
+    """
+    values, parsed = index["values"][sim_ind], index["parsed"][sim_ind]
+    return [[value if is_parsed else None for value, is_parsed 
+             in zip(values[agent_id, :length].tolist(), 
+                    parsed[agent_id, :length])]
+            for agent_id, length in enumerate(index["lengths"][sim_ind]) 
+            if length]
+
 def read_from_file(filename):
     """
     Reads and extracts data from a Pickle file containing text conversations.
 
+    The answers are parsed once and cached in a numeric index next to the
+    file (see read_index); later calls read the index as long as the file
+    is unchanged.
+
     Args:
         filename (str): The name of the Pickle file containing text 
         conversations.
@@ -87,24 +271,35 @@ def read_from_file(filename):
     Returns:
         list: A list of text answers extracted from the file.
     """
-    object = parse_p_file(filename)
-    final_ans = []
-    count = 0
-    for key, value in object.items():
-        text_answers = []
-        agent_contexts = value
-        count += 1
-        for agent_id, agent_context in enumerate(agent_contexts):
-            ans = [key[agent_id]]
-            for i, msg in enumerate(agent_context):
-                if i > 0 and i % 2 == 0:
-                    text_answer = agent_context[i]['content']
-                    text_answer = text_answer.replace(",", ".")
-                    text_answer = parse_answer(text_answer)
-                    ans.append(text_answer)
-            text_answers.append(ans)
-        final_ans.append(text_answers)
-    return final_ans
+    index = load_index(filename)
+    if index is None:
+        final_ans = _parse_answers(filename)
+        write_index(filename, final_ans)
+        return final_ans
+    return [_index_answers(index, sim_ind) 
+            for sim_ind in range(len(index["lengths"]))]
+
+def read_simulation(filename, sim_ind):
+    """
+    Reads the answers of a single simulation.
+
+    The numeric index is used if it is up to date; otherwise only the
+    requested simulation is decoded from the file.
+
+    Args:
+        filename (str): The name of the Pickle file containing text 
+        conversations.
+        sim_ind (int): Index of the simulation, in file order.
+
+    Returns:
+        list: Per agent, the initial position followed by the parsed 
+        answers, as in read_from_file(filename)[sim_ind].
+    """
+    index = load_index(filename)
+    if index is not None:
+        return _index_answers(index, sim_ind)
+    with RecordFile(filename) as record_file:
+        return _parse_simulation(*record_file.get_simulation(sim_ind))
 
 if __name__ == "__main__":
     res = """Based on the advice of your two friends, the position to meet your 
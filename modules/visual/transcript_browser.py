@@ -0,0 +1,288 @@
+"""
+MIT License
+
+Copyright (c) [2023] [Intelligent Unmanned Systems Laboratory at 
+Westlake University]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS," WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE, AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES, OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT, OR OTHERWISE, ARISING FROM,
+OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+import json
+import os
+
+from ..llm.message import split_rounds
+
+INDEX_FILE = 'index.html'
+SHARD_FILE = 'simulation_{}.js'
+SHARD_CALLBACK = 'loadSimulation'
+
+def shard_data(conversations):
+    """
+    Encode the transcripts of one simulation for the browser.
+
+    Texts are stored once in a string table (the system prompts of all
+    agents are usually identical) and every message is a [role, text
+    index] pair. The messages of every agent are grouped into rounds by
+    user message (see split_rounds): round 0 holds the messages before the
+    first question (the system prompt) and round r the messages
+    agents[a][rounds[a][r]:rounds[a][r + 1]].
+
+    Args:
+        conversations (list): One list of messages per agent.
+
+    Returns:
+        dict: {"strings": [...], "agents": [[[role, index], ...], ...],
+        "rounds": [[0, ..., n_messages], ...]}.
+    """
+    strings, ids = [], {}
+    agents, rounds = [], []
+    for conversation in conversations:
+        starts = [start for start, end in split_rounds(conversation)]
+        first = starts[0] if starts else len(conversation)
+        rounds.append([0, first] + starts[1:] 
+                      + ([len(conversation)] if starts else []))
+        messages = []
+        for message in conversation:
+            content = str(message["content"])
+            ind = ids.get(content)
+            if ind is None:
+                ind = ids[content] = len(strings)
+                strings.append(content)
+            messages.append([message["role"], ind])
+        agents.append(messages)
+    return {"strings": strings, "agents": agents, "rounds": rounds}
+
+def write_shard(conversations, html_dir, simulation_ind):
+    """
+    Write the transcript shard of one simulation.
+
+    The shard is a script calling loadSimulation(index, data), so the index
+    page can load it on demand from file:// without a server.
+
+    Args:
+        conversations (list): One list of messages per agent.
+        html_dir (str): Output directory.
+        simulation_ind (int): Index of the simulation.
+
+    Returns:
+        dict: Manifest entry of the simulation.
+    """
+    file_name = SHARD_FILE.format(simulation_ind)
+    data = shard_data(conversations)
+    # Existing shards are kept by gen_html, so only complete ones may appear
+    path = os.path.join(html_dir, file_name)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(f'{SHARD_CALLBACK}({simulation_ind}, ')
+        json.dump(data, f, separators=(',', ':'))
+        f.write(');\n')
+    os.replace(path + '.tmp', path)
+    return manifest_entry(conversations, simulation_ind)
+
+def manifest_entry(conversations, simulation_ind):
+    """
+    Describe one simulation for the index page.
+
+    Args:
+        conversations (list): One list of messages per agent.
+        simulation_ind (int): Index of the simulation.
+
+    Returns:
+        dict: {"id", "file", "agents", "rounds"}.
+    """
+    n_rounds = max((len(split_rounds(conversation)) 
+                    for conversation in conversations), default=0)
+    return {"id": simulation_ind, "file": SHARD_FILE.format(simulation_ind),
+            "agents": len(conversations), "rounds": n_rounds}
+
+def write_index(manifest, html_dir, title='Transcripts'):
+    """
+    Write the index page of the transcript browser.
+
+    Args:
+        manifest (list): Manifest entries of all simulations.
+        html_dir (str): Output directory.
+        title (str): Page title.
+
+    Returns:
+        str: Path of the index page.
+    """
+    path = os.path.join(html_dir, INDEX_FILE)
+    page = (INDEX_TEMPLATE
+            .replace('__TITLE__', json.dumps(title)[1:-1].replace('<', '&lt;'))
+            .replace('__MANIFEST__', 
+                     json.dumps(manifest).replace('</', '<\\/')))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(page)
+    return path
+
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>__TITLE__</title>
+<style>
+    body { font-family: sans-serif; margin: 0; }
+    .controls {
+        position: sticky; top: 0; background-color: #fff; z-index: 1;
+        padding: 10px; border-bottom: 1px solid #ddd;
+    }
+    .controls label { margin-right: 15px; }
+    .controls input[type=number] { width: 5em; }
+    #status { color: #888; margin-left: 10px; }
+    table { border-collapse: separate; border-spacing: 10px; }
+    th { position: sticky; top: 52px; background-color: #fff; }
+    td { vertical-align: top; min-width: 250px; max-width: 450px; }
+    .round { font-weight: bold; white-space: nowrap; color: #888; }
+    .chat-box {
+        background-color: #f1f0f0; padding: 10px; margin: 5px 0;
+        border-radius: 10px; word-wrap: break-word; white-space: pre-wrap;
+    }
+    .user, .system { background-color: #f0f0f0; color: #222; }
+    .assistant { background-color: #3498db; color: #fff; }
+</style></head>
+<body>
+<div class="controls">
+    <label>Simulation <select id="simulation"></select></label>
+    <label>Agents <input id="agents" placeholder="all, e.g. 1,3,5-8"></label>
+    <label>Rounds <input id="first" type="number" min="0"> to
+        <input id="last" type="number" min="0"></label>
+    <label>Jump to round <input id="jump" type="number" min="0"></label>
+    <span id="status"></span>
+</div>
+<table id="transcripts"></table>
+<script>
+var manifest = __MANIFEST__;
+var simulations = {};
+var current = null;
+
+function $(id) { return document.getElementById(id); }
+
+// Called by the simulation_<index>.js shards
+function loadSimulation(index, data) {
+    simulations[index] = data;
+    if (current === index) { render(); }
+}
+
+function select(index) {
+    current = index;
+    if (simulations[index]) { render(); return; }
+    $('status').textContent = 'Loading...';
+    var script = document.createElement('script');
+    script.src = manifest[index].file;
+    script.onerror = function () {
+        $('status').textContent = 'Could not load ' + manifest[index].file;
+    };
+    document.head.appendChild(script);
+}
+
+function parseAgents(text, count) {
+    var agents = [];
+    text.split(',').forEach(function (part) {
+        var range = part.trim().split('-');
+        if (!range[0]) { return; }
+        var first = parseInt(range[0], 10);
+        var last = range.length > 1 ? parseInt(range[1], 10) : first;
+        for (var i = first; i <= last; i++) {
+            if (i >= 1 && i <= count && agents.indexOf(i - 1) < 0) {
+                agents.push(i - 1);
+            }
+        }
+    });
+    if (!agents.length) {
+        for (var i = 0; i < count; i++) { agents.push(i); }
+    }
+    return agents;
+}
+
+function chatBox(message, strings) {
+    var box = document.createElement('div');
+    box.className = 'chat-box ' + message[0];
+    box.textContent = strings[message[1]];
+    return box;
+}
+
+// Messages of one agent in a round, from the round boundaries of the shard
+// (shards written without them alternate questions and answers)
+function roundMessages(data, agent, round) {
+    var messages = data.agents[agent];
+    if (!data.rounds) {
+        return round === 0 ? messages.slice(0, 1) 
+                           : messages.slice(2 * round - 1, 2 * round + 1);
+    }
+    var bounds = data.rounds[agent];
+    return round + 1 < bounds.length 
+        ? messages.slice(bounds[round], bounds[round + 1]) : [];
+}
+
+// Row 0 holds the system prompts, row r >= 1 the question and answers of
+// round r
+function render() {
+    var data = simulations[current];
+    var info = manifest[current];
+    var agents = parseAgents($('agents').value, data.agents.length);
+    var first = $('first').value === '' ? 0 : parseInt($('first').value, 10);
+    var last = $('last').value === '' ? info.rounds 
+                                      : parseInt($('last').value, 10);
+    var table = document.createElement('table');
+    table.id = 'transcripts';
+    var head = table.insertRow();
+    head.appendChild(document.createElement('th'));
+    agents.forEach(function (agent) {
+        var th = document.createElement('th');
+        th.textContent = 'Agent ' + (agent + 1) + ' of Case ' + (current + 1);
+        head.appendChild(th);
+    });
+    for (var round = first; round <= last; round++) {
+        var row = table.insertRow();
+        row.id = 'round-' + round;
+        var label = row.insertCell();
+        label.className = 'round';
+        label.textContent = round === 0 ? 'System' : 'Round ' + round;
+        agents.forEach(function (agent) {
+            var td = document.createElement('td');
+            roundMessages(data, agent, round).forEach(function (message) {
+                td.appendChild(chatBox(message, data.strings));
+            });
+            row.appendChild(td);
+        });
+    }
+    $('transcripts').replaceWith(table);
+    $('status').textContent = info.agents + ' agents, ' + info.rounds 
+        + ' rounds';
+}
+
+manifest.forEach(function (info, index) {
+    var option = document.createElement('option');
+    option.value = index;
+    option.textContent = 'Case ' + (info.id + 1);
+    $('simulation').appendChild(option);
+});
+$('simulation').onchange = function () { select(parseInt(this.value, 10)); };
+['agents', 'first', 'last'].forEach(function (id) {
+    $(id).onchange = function () { if (simulations[current]) { render(); } };
+});
+$('jump').onchange = function () {
+    var row = $('round-' + this.value);
+    if (row) { row.scrollIntoView(); }
+};
+var initial = parseInt(location.hash.slice(1), 10);
+if (manifest.length) {
+    var index = initial >= 0 && initial < manifest.length ? initial : 0;
+    $('simulation').value = index;
+    select(index);
+}
+</script>
+</body></html>
+'''
@@ -23,25 +23,18 @@ OUT OF, OR IN CONNECTION WITH THE SOFTWARE OR THE USE, OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-def render_conversations_to_html(conversations, output_file, simulation_ind):
-    """
-    Render conversations to an HTML file.
-
-    Args:
-        conversations (list): List of conversation data.
-        output_file (str): The path to the output HTML file.
-        simulation_ind (int): Index of the simulation.
+import html
+import os
+from itertools import zip_longest
 
-    The function takes conversation data and generates an HTML file displaying the conversations.
-    """
-    # Number of agents
-    num_agents = len(conversations)
+AGENTS_PER_PAGE = 10  # Agents shown side by side on one page
 
-    # Determine if scrolling is needed
-    enable_scroll = num_agents > 1
+# Define avatars for user and assistant
+USER_AVATAR = '../images/user.png'  # Replace with the actual path or URL
+ASSISTANT_AVATAR = '../images/robot.jpg'
 
-    # Define CSS styles for avatars and chat boxes
-    css_styles = '''
+# Define CSS styles for avatars and chat boxes
+CSS_STYLES = '''
     .avatar {{
         width: 50px;
         height: 50px;
@@ -57,6 +50,7 @@ def render_conversations_to_html(conversations, output_file, simulation_ind):
         display: block;
         clear: both; /* Clear the float to prevent overlapping */
         word-wrap: break-word; /* This property wraps long words and text to the next line */
+        white-space: pre-wrap; /* Keep the line breaks of the model output */
     }}
 
     .user {{
@@ -71,13 +65,13 @@ def render_conversations_to_html(conversations, output_file, simulation_ind):
 
     .conversation-container {{
         display: grid;
-        grid-template-columns: repeat({num_agents}, 1fr); /* Create columns for each agent */
+        grid-template-columns: repeat({num_columns}, 1fr); /* Create columns for each agent */
         grid-gap: 20px; /* Gap between columns */
         margin-bottom: 20px; /* Add margin between conversation groups */
     }}
 
     .conversation-title {{
-        grid-column: span {num_agents};
+        grid-column: span {num_columns};
         font-weight: bold;
         text-align: center;
         padding-bottom: 20px;
@@ -92,65 +86,108 @@ def render_conversations_to_html(conversations, output_file, simulation_ind):
         display: flex;
         flex-direction: row; /* Chat boxes displayed vertically */
     }}
-    '''.format(num_agents=num_agents)
-
-    messages_in_line = [[row[i] for row in conversations] for i in range(len(conversations[0]))]
-    agent_tiles = ["Agent {} of Case {}".format(ind + 1, simulation_ind + 1) for ind in
-                   range(len(conversations))]
-    messages_in_line = [agent_tiles] + messages_in_line
-    # Initialize the HTML string
-    html = '<html><head><style>{}</style></head><body>'.format(css_styles)
-
-    # Create a container for all agents' conversations
-    if enable_scroll:
-        html += '<div class="scrollable">'
-    else:
-        html += '<div>'
-
-    for ind, msgs_in_row in enumerate(messages_in_line):
-        html += '<div class="row-messages">'
-        html += '<div class="conversation-container"> '
-        # Create a container for agent's conversation
-        for message in msgs_in_row:
-            html += '<div class="agent-conversation">'
-
-            if (ind == 0):
-                html += '<div class="conversation-title"> {} </div>'.format(message)
-            else:
-                role = message["role"]
-                content = message["content"]
-
-                # Define avatars for user and assistant
-                user_avatar = '../images/user.png'  # Replace with the actual path or URL
-                assistant_avatar = '../images/robot.jpg'
-                # print(ind % 3, role, assistant_avatar)
-                # Determine the current avatar based on the role
-
-                current_avatar = user_avatar if role in ["system", "user"] else assistant_avatar
-
-                # Add the avatar image element
-                avatar_element = '<img src="{}" class="avatar">'.format(current_avatar)
-
-                # Add the chat box with the avatar and content
-                chat_box = '<div class="chat-box {}">{}</div>'.format(role, content)
-
-                # Create a container for agent's messages
-                agent_messages = '<div class="agent-messages">{}</div>'.format(avatar_element + chat_box)
-
-                # Add the agent's messages to the agent's conversation
-                html += agent_messages
-            # Close the agent's conversation container
-            html += '</div>'
-
-        # Close the conversation container
-        html += '</div>'
-        html += '</div>'
-    # Close the container for all agents' conversations
-
-    html += '</div>'
-    # Close the body and HTML document
-    html += '</body></html>'
-
-    # Write the HTML to the specified output file
-    with open(output_file, 'w', encoding='utf-8') as file:
-        file.write(html)
+
+    .page-nav {{
+        position: sticky;
+        top: 0;
+        background-color: #fff;
+        padding: 10px;
+        margin-bottom: 20px;
+        border-bottom: 1px solid #ddd;
+    }}
+
+    .page-nav a {{
+        margin-right: 10px;
+    }}
+    '''
+
+def render_message(message):
+    """
+    Render one chat message as HTML.
+
+    Args:
+        message: Message (or message dict) with "role" and "content".
+
+    Returns:
+        str: The avatar and the chat box, with the content escaped.
+    """
+    role = message["role"]
+    # Determine the current avatar based on the role
+    current_avatar = (USER_AVATAR if role in ["system", "user"] 
+                      else ASSISTANT_AVATAR)
+    return ('<div class="agent-messages"><img src="{}" class="avatar">'
+            '<div class="chat-box {}">{}</div></div>'.format(
+                current_avatar, html.escape(role), 
+                html.escape(str(message["content"]))))
+
+def render_conversations_to_html(conversations, output_file, simulation_ind, 
+                                 agents_per_page=AGENTS_PER_PAGE):
+    """
+    Render conversations to an HTML file.
+
+    Args:
+        conversations (list): List of conversation data.
+        output_file (str): The path to the output HTML file.
+        simulation_ind (int): Index of the simulation.
+        agents_per_page (int): Number of agents laid out side by side; 
+            larger simulations are split into pages of this many agents 
+            (default is 10).
+
+    The function takes conversation data and generates an HTML file displaying
+    the conversations. The page is written row by row as it is generated,
+    so memory does not grow with the size of the output, and the message
+    content is HTML-escaped. The file only appears once it is complete.
+    """
+    # Number of agents
+    num_agents = len(conversations)
+    agents_per_page = max(1, agents_per_page)
+    num_columns = min(num_agents, agents_per_page)
+    pages = [range(start, min(start + agents_per_page, num_agents)) 
+             for start in range(0, num_agents, agents_per_page)]
+
+    # Write to a temporary file, so a failed render leaves no truncated
+    # page behind
+    tmp_file = output_file + '.tmp'
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            file.write('<html><head><meta charset="utf-8"><style>{}</style>'
+                       '</head><body>'.format(
+                           CSS_STYLES.format(num_columns=num_columns)))
+            if len(pages) > 1:
+                file.write('<div class="page-nav">')
+                for page_ind, page in enumerate(pages):
+                    file.write('<a href="#page-{}">Agents {}-{}</a>'.format(
+                        page_ind + 1, page.start + 1, page.stop))
+                file.write('</div>')
+
+            # Create a container for all agents' conversations
+            for page_ind, page in enumerate(pages):
+                file.write('<div class="scrollable" id="page-{}">'.format(
+                    page_ind + 1))
+                # Title row, then one row per message index
+                file.write('<div class="row-messages">'
+                           '<div class="conversation-container"> ')
+                for ind in page:
+                    file.write('<div class="agent-conversation">'
+                               '<div class="conversation-title"> Agent {} '
+                               'of Case {} </div></div>'.format(
+                                   ind + 1, simulation_ind + 1))
+                file.write('</div></div>')
+                for msgs_in_row in zip_longest(*(conversations[ind] 
+                                                 for ind in page)):
+                    file.write('<div class="row-messages">'
+                               '<div class="conversation-container"> ')
+                    file.write(''.join(
+                        '<div class="agent-conversation">{}</div>'.format(
+                            render_message(message) if message is not None 
+                            else '') 
+                        for message in msgs_in_row))
+                    file.write('</div></div>')
+                file.write('</div>')
+            # Close the body and HTML document
+            file.write('</body></html>')
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    os.replace(tmp_file, output_file)
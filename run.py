@@ -1,9 +1,22 @@
 import argparse
 import numpy as np
 from modules.experiment.debate_factory import debate_factory
+from modules.visual import figure_engine
+from modules.profiling import profiler, trace
 
-if __name__ == "__main__":
+def build_parser():
+  """
+  Build the command-line parser of the experiments.
+
+  Returns:
+    argparse.ArgumentParser: The parser. parse_args([]) gives the default
+    arguments, e.g. for benchmarks that build experiments directly.
+  """
   parser = argparse.ArgumentParser()
+  parser.add_argument('--experiment', type=str, default="2d",
+                      choices=["scalar", "2d", "nd"],
+                      help='scalar, 2d or nd (in --dim dimensions): type of '
+                           'debate')
   parser.add_argument('--agents', type=int, default=2,
                       help='number of agents')
   parser.add_argument('--n_stubborn', type=int, default=0,
@@ -14,14 +27,76 @@ if __name__ == "__main__":
                       help='number of rounds')
   parser.add_argument('--n_exp', type=int, default=3,
                       help='number of independent experiments')
+  parser.add_argument('--dim', type=int, default=3,
+                      help='number of spatial dimensions (nd debate only)')
+  parser.add_argument('--dt', type=float, default=0.1,
+                      help='physics time step of the vector debates (s)')
+  parser.add_argument('--horizon', type=float, default=2.0,
+                      help='motion time per round of the vector debates (s)')
+  parser.add_argument('--integrator', type=str, default="fixed",
+                      help='fixed, semi_implicit or rk: motion integrator')
+  parser.add_argument('--settle_tol', type=float, default=1e-3,
+                      help='stop the motion of a round once all robots are '
+                           'within this distance and speed of rest, 0 to disable')
+  parser.add_argument('--collision_radius', type=float, default=0,
+                      help='radius of the repulsion between robots (m), '
+                           '0 disables collision avoidance')
+  parser.add_argument('--collision_gain', type=float, default=50,
+                      help='repulsive force between touching robots (N)')
+  parser.add_argument('--connectivity', type=str, default="static",
+                      help='static, radius or knn: communication graph of the '
+                           'vector debates, radius/knn follow the positions')
+  parser.add_argument('--comm_radius', type=float, default=30,
+                      help='communication range for --connectivity radius (m)')
+  parser.add_argument('--comm_k', type=int, default=2,
+                      help='number of neighbors for --connectivity knn')
+  parser.add_argument('--async_mode', action="store_true",
+                      help='vector debates without a round barrier: robots '
+                           'replan on their own while physics keeps running')
+  parser.add_argument('--replan', type=str, default="reply",
+                      help='reply or arrival: when a robot sends its next '
+                           'request in --async_mode')
+  parser.add_argument('--time_scale', type=float, default=1.0,
+                      help='simulated seconds per wall-clock second in '
+                           '--async_mode')
+  parser.add_argument('--max_time', type=float, default=0,
+                      help='simulated time limit of --async_mode (s), '
+                           '0 for 2 * rounds * horizon; requests not sent '
+                           'by then are dropped and reported')
+  parser.add_argument('--arrive_tol', type=float, default=0.5,
+                      help='distance and speed below which a robot has '
+                           'arrived, for --replan arrival')
+  parser.add_argument('--trajectory_dtype', type=str, default="float64",
+                      help='float32 or float64: dtype of the saved trajectories')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='random seed of the initial positions, recorded '
+                           'in the catalog')
+  parser.add_argument('--catalog', type=str, default='',
+                      help='results catalog to register the run in, default '
+                           'is catalog.db next to the output directory')
   parser.add_argument('--out_file', type=str, default='',
                       help='path to save the output')
   parser.add_argument('--summarize_mode', type=str, default="last_round",
                       help='all_rounds or last_round: summarize all rounds memories or last round memories')
   parser.add_argument('--not_full_connected', action="store_true",
                       help='True if each agent knows all the position of other agents')
+  parser.add_argument('--structured_output', action="store_true",
+                      help='request answers as function-call arguments')
+  parser.add_argument('--profile', type=str, default='',
+                      help='profile all threads and plotting jobs, writing '
+                           'pstats, a report and collapsed stacks to this '
+                           'directory')
+  parser.add_argument('--profile_memory', action="store_true",
+                      help='with --profile, take a tracemalloc snapshot '
+                           'per round')
+  parser.add_argument('--trace', type=str, default='',
+                      help='write a timeline of the simulations, rounds and '
+                           'LLM calls to this Chrome trace (Perfetto) file')
+  return parser
+
+if __name__ == "__main__":
   # parse and set arguments
-  args = parser.parse_args()
+  args = build_parser().parse_args()
   # define connectivity matrix
   N = args.agents
   m = np.ones((N, N), dtype=bool)
@@ -40,5 +115,14 @@ if __name__ == "__main__":
         [True, False, False],
       ]
     )
-  exp = debate_factory("2d", args, connectivity_matrix=m)
-  exp.run()
+  if args.trace:
+    trace.enable()
+  if args.profile:
+    profiler.start(args.profile, memory=args.profile_memory)
+  exp = debate_factory(args.experiment, args, connectivity_matrix=m)
+  try:
+    exp.run()
+    figure_engine.wait()
+  finally:
+    profiler.stop()
+  trace.save(args.trace)